@@ -0,0 +1,487 @@
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sqlite3
+
+from binario import CatalogoBinario, gravar_catalogo, recuperar_catalogo
+from diario import Diario, crc_conteudo
+from snapshot import GravadorSnapshot, LeitorJSON, nomes_geracoes
+from travas import TravaArquivo
+
+# ---------------- ARMAZENAMENTO ---------------- #
+# A Biblioteca guarda o catálogo em memória e conversa com o disco só por esta
+# interface. Cada alteração chega como um registro do diário:
+#   {"op": "adicionar", "livro": {...}}
+#   {"op": "remover", "id": 3}
+#   {"op": "disponivel", "id": 3, "valor": False}
+
+
+class Armazenamento:
+    def carregar(self, progresso=None, recomecar=None):
+        # gera os livros do último salvamento, um dict por vez. progresso(feito,
+        # total) é chamado durante a leitura; recomecar() avisa que os livros já
+        # entregues devem ser descartados (a leitura recomeçou de outra fonte)
+        raise NotImplementedError
+
+    def pendentes(self):
+        # registros a reaplicar por cima do que carregar() entregou
+        return []
+
+    def registrar(self, registro):
+        # grava uma alteração; devolve True se é hora de salvar o catálogo inteiro
+        raise NotImplementedError
+
+    def registrar_varios(self, registros):
+        # grava um lote de alterações, na ordem; as implementações juntam a escrita
+        salvar_tudo = False
+        for registro in registros:
+            salvar_tudo = self.registrar(registro) or salvar_tudo
+        return salvar_tudo
+
+    def salvar_tudo_compensa(self, alteracoes):
+        # True se gravar o catálogo inteiro sai mais barato que registrar
+        # `alteracoes` alterações de uma vez (uma importação grande)
+        return False
+
+    def salvar(self, livros, proximo_id=0):
+        # livros: lista de dicts (Livro.to_dict) com o catálogo inteiro;
+        # proximo_id: o maior id já entregue + 1 (removidos incluídos)
+        raise NotImplementedError
+
+    def proximo_id(self):
+        # próximo id gravado pelo armazenamento (0 se ele não guarda): ids de
+        # livros removidos não voltam a ser usados
+        return 0
+
+    def aguardar(self):
+        # espera gravações em andamento; repassa o erro delas
+        pass
+
+    def fechar(self):
+        self.aguardar()
+
+    # Vários processos no mesmo catálogo
+    def travar(self):
+        # context manager: enquanto aberto, nenhum outro processo grava
+        return contextlib.nullcontext()
+
+    def novidades(self):
+        # registros gravados por outros processos desde a última leitura ou
+        # gravação deste; None se é preciso carregar tudo de novo
+        return []
+
+
+class ArmazenamentoJSON(Armazenamento):
+    # biblioteca.json + diário (biblioteca.json.log) + gerações anteriores
+    def __init__(self, arquivo="biblioteca.json", usar_diario=True, limite_compactacao=1000,
+                 geracoes=3, gravar_em_segundo_plano=True, sincronizar=False, compartilhado=False):
+        self.arquivo = arquivo
+        self.geracoes = geracoes
+        # compartilhado: outros processos usam o mesmo arquivo. Toda gravação
+        # acontece com "<arquivo>.trava" e termina antes de soltá-la, então o
+        # snapshot não pode ficar para uma thread; as novidades vêm do diário
+        self.trava = None
+        if compartilhado:
+            if not usar_diario:
+                raise ValueError("o catálogo compartilhado precisa do diário")
+            self.trava = TravaArquivo(arquivo + ".trava")
+            gravar_em_segundo_plano = False
+        # com o diário cada alteração custa uma linha no log, não o catálogo inteiro
+        self.diario = Diario(arquivo, limite_compactacao, sincronizar) if usar_diario else None
+        self.gravador = GravadorSnapshot(arquivo, geracoes, gravar_em_segundo_plano,
+                                         self.diario.confirmar if self.diario else None)
+
+    def carregar(self, progresso=None, recomecar=None):
+        # lê o snapshot aos pedaços; cai para a geração anterior se o arquivo
+        # principal estiver corrompido
+        self.__pendentes = []
+        crc = crc_conteudo("")
+        erro = None
+        for nome in nomes_geracoes(self.arquivo, self.geracoes):
+            if not os.path.exists(nome):
+                continue
+            leitor = LeitorJSON(nome, progresso)
+            entregues = 0
+            try:
+                for item in leitor:
+                    if not isinstance(item, dict):
+                        raise ValueError(f"'{nome}' não contém uma lista de livros")
+                    entregues += 1
+                    yield item
+            except (OSError, ValueError) as e:
+                erro = erro or e
+                if entregues and recomecar is not None:
+                    recomecar()
+                continue
+            crc = leitor.crc
+            break
+        else:
+            if erro is not None:
+                raise erro
+        if self.diario is not None:
+            self.__pendentes = self.diario.reproduzir(crc)
+
+    def pendentes(self):
+        return self.__pendentes
+
+    def registrar(self, registro):
+        if self.diario is None:
+            return True
+        self.diario.registrar(registro)
+        return self.diario.precisa_compactar()
+
+    def registrar_varios(self, registros):
+        if self.diario is None:
+            return True
+        self.diario.registrar_varios(registros)
+        return self.diario.precisa_compactar()
+
+    def salvar_tudo_compensa(self, alteracoes):
+        # se o diário ia passar do limite, a compactação regravaria tudo logo
+        # depois: melhor gravar o snapshot direto, sem as linhas no log
+        return self.diario is None or self.diario.registros + alteracoes >= self.diario.limite_compactacao
+
+    def salvar(self, livros, proximo_id=0):
+        self.aguardar()
+        conteudo = json.dumps(livros, indent=4, ensure_ascii=False)
+        if self.diario is not None:
+            # o snapshot é só a lista: o próximo id vai no cabeçalho do log novo
+            self.diario.rotacionar(crc_conteudo(conteudo), proximo_id)
+        self.gravador.gravar(conteudo)
+
+    def proximo_id(self):
+        return self.diario.proximo_id if self.diario is not None else 0
+
+    def aguardar(self):
+        self.gravador.aguardar()
+
+    def travar(self):
+        return self.trava if self.trava is not None else contextlib.nullcontext()
+
+    def novidades(self):
+        if self.trava is None:
+            return []
+        return self.diario.novidades()
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    # uma linha por livro; emprestar/devolver viram um UPDATE de uma linha.
+    # Cada lote gravado vai também para a tabela alteracoes, com um número de
+    # sequência que só cresce: quem divide o banco com outros processos lê só
+    # as alterações depois da última que viu, em vez de recarregar tudo. A
+    # tabela guarda as últimas ALTERACOES_GUARDADAS; quem ficou para trás
+    # disso (ou viu o banco mudar sem alteração registrada) recarrega
+    ALTERACOES_GUARDADAS = 10000
+
+    def __init__(self, arquivo="biblioteca.db", sincronizar=False):
+        self.arquivo = arquivo
+        # a conexão é usada também pela thread do executor; a Biblioteca faz
+        # uma gravação por vez
+        self.conexao = sqlite3.connect(arquivo, isolation_level=None, check_same_thread=False)
+        self.__versao = None
+        self.__sequencia = None  # última alteração já aplicada (lida ou gravada aqui)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        # FULL também sobrevive a queda de energia; NORMAL só a queda do programa
+        self.conexao.execute("PRAGMA synchronous=" + ("FULL" if sincronizar else "NORMAL"))
+        self.conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS livros (
+                id INTEGER PRIMARY KEY,
+                titulo TEXT NOT NULL,
+                autor TEXT NOT NULL,
+                disponivel INTEGER NOT NULL DEFAULT 1,
+                tipo TEXT NOT NULL DEFAULT 'Livro'
+            );
+            CREATE INDEX IF NOT EXISTS livros_titulo ON livros (titulo);
+            CREATE INDEX IF NOT EXISTS livros_autor ON livros (autor);
+            CREATE INDEX IF NOT EXISTS livros_disponivel ON livros (disponivel);
+            CREATE INDEX IF NOT EXISTS livros_tipo ON livros (tipo);
+            CREATE TABLE IF NOT EXISTS meta (
+                chave TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS alteracoes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                registro TEXT NOT NULL
+            );
+        """)
+
+    @staticmethod
+    def __linha(livro):
+        return (livro.get("id"), livro["titulo"], livro["autor"],
+                int(livro.get("disponivel", True)), livro.get("tipo", "Livro"))
+
+    @staticmethod
+    def __dict(linha):
+        id, titulo, autor, disponivel, tipo = linha
+        return {"titulo": titulo, "autor": autor, "disponivel": bool(disponivel), "tipo": tipo, "id": id}
+
+    def carregar(self, progresso=None, recomecar=None):
+        self.__versao = self.__versao_dados()
+        self.__sequencia = self.__ultima_sequencia()
+        total = self.contar() if progresso is not None else 0
+        cursor = self.conexao.execute("SELECT id, titulo, autor, disponivel, tipo FROM livros ORDER BY id")
+        for n, linha in enumerate(cursor, 1):
+            yield self.__dict(linha)
+            if progresso is not None and n % 10000 == 0:
+                progresso(n, total)
+        if progresso is not None:
+            progresso(total, total)
+
+    def __guardar_proximo(self, proximo_id):
+        # só sobe: o id de um livro removido continua contando
+        self.conexao.execute("INSERT INTO meta (chave, valor) VALUES ('proximo_id', ?) "
+                             "ON CONFLICT (chave) DO UPDATE SET valor = max(valor, excluded.valor)",
+                             (proximo_id,))
+
+    def proximo_id(self):
+        linha = self.conexao.execute("SELECT valor FROM meta WHERE chave = 'proximo_id'").fetchone()
+        return linha[0] if linha is not None else 0
+
+    def __executar(self, registro):
+        op = registro["op"]
+        if op == "adicionar":
+            self.conexao.execute("INSERT OR REPLACE INTO livros (id, titulo, autor, disponivel, tipo) "
+                                 "VALUES (?, ?, ?, ?, ?)", self.__linha(registro["livro"]))
+            if registro["livro"].get("id") is not None:
+                self.__guardar_proximo(registro["livro"]["id"] + 1)
+        elif op == "remover":
+            self.conexao.execute("DELETE FROM livros WHERE id = ?", (registro["id"],))
+        elif op == "disponivel":
+            self.conexao.execute("UPDATE livros SET disponivel = ? WHERE id = ?",
+                                 (int(registro["valor"]), registro["id"]))
+
+    def registrar(self, registro):
+        return self.registrar_varios([registro])
+
+    def registrar_varios(self, registros):
+        # um lote é uma transação: um commit só no disco. Livros novos em
+        # sequência (uma importação) vão num executemany só
+        with self.travar():
+            novos = []
+            for registro in registros:
+                if registro["op"] == "adicionar" and registro["livro"].get("id") is not None:
+                    novos.append(registro["livro"])
+                    continue
+                self.__inserir(novos)
+                self.__executar(registro)
+            self.__inserir(novos)
+            self.__anotar(registros)
+        return False
+
+    def __anotar(self, registros):
+        # registra o lote em alteracoes e descarta as mais antigas. Quem grava
+        # já leu as novidades dos outros (a Biblioteca faz isso com o banco
+        # travado), então a sequência deste processo pode avançar junto
+        if not registros:
+            return
+        self.conexao.executemany("INSERT INTO alteracoes (registro) VALUES (?)",
+                                 ((json.dumps(r, ensure_ascii=False, separators=(",", ":")),) for r in registros))
+        ultima = self.__ultima_sequencia()
+        self.conexao.execute("DELETE FROM alteracoes WHERE seq <= ?", (ultima - self.ALTERACOES_GUARDADAS,))
+        if self.__sequencia is not None:
+            self.__sequencia = ultima
+
+    def __inserir(self, livros):
+        if not livros:
+            return
+        self.conexao.executemany("INSERT OR REPLACE INTO livros (id, titulo, autor, disponivel, tipo) "
+                                 "VALUES (?, ?, ?, ?, ?)", (self.__linha(l) for l in livros))
+        self.__guardar_proximo(max(l["id"] for l in livros) + 1)
+        livros.clear()
+
+    def salvar(self, livros, proximo_id=0):
+        # sincroniza a tabela com o catálogo inteiro numa transação só
+        with self.travar():
+            self.conexao.execute("DELETE FROM livros")
+            self.conexao.executemany("INSERT INTO livros (id, titulo, autor, disponivel, tipo) "
+                                     "VALUES (?, ?, ?, ?, ?)", (self.__linha(l) for l in livros))
+            maior = self.conexao.execute("SELECT max(id) FROM livros").fetchone()[0] or 0
+            self.__guardar_proximo(max(proximo_id, maior + 1))
+            # a tabela foi trocada inteira: gasta um número da sequência e
+            # apaga as alterações, e quem estava seguindo encontra o buraco e
+            # recarrega
+            self.conexao.execute("""INSERT INTO alteracoes (registro) VALUES ('{"op":"recarregar"}')""")
+            self.conexao.execute("DELETE FROM alteracoes")
+            if self.__sequencia is not None:
+                self.__sequencia = self.__ultima_sequencia()
+
+    def contar(self):
+        return self.conexao.execute("SELECT COUNT(*) FROM livros").fetchone()[0]
+
+    def fechar(self):
+        self.conexao.close()
+
+    @contextlib.contextmanager
+    def travar(self):
+        # BEGIN IMMEDIATE: os outros processos só gravam depois do COMMIT.
+        # Dentro de uma transação já aberta, só participa dela
+        if self.conexao.in_transaction:
+            yield
+            return
+        self.conexao.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conexao.execute("ROLLBACK")
+            raise
+        self.conexao.execute("COMMIT")
+
+    def __versao_dados(self):
+        # muda quando outra conexão grava no banco
+        return self.conexao.execute("PRAGMA data_version").fetchone()[0]
+
+    def __ultima_sequencia(self):
+        # maior seq já entregue, mesmo que a linha tenha sido descartada
+        linha = self.conexao.execute("SELECT seq FROM sqlite_sequence WHERE name = 'alteracoes'").fetchone()
+        return linha[0] if linha is not None else 0
+
+    def novidades(self):
+        # data_version só muda quando outra conexão grava: sem mudança, nem
+        # consulta a tabela de alterações
+        versao = self.__versao_dados()
+        mudou = self.__versao is not None and versao != self.__versao
+        self.__versao = versao
+        if not mudou or self.__sequencia is None:
+            return []
+        linhas = self.conexao.execute("SELECT seq, registro FROM alteracoes WHERE seq > ? ORDER BY seq",
+                                      (self.__sequencia,)).fetchall()
+        # sequência com buraco (alterações descartadas, tabela regravada) ou
+        # banco mudado sem alteração registrada: não dá para seguir
+        if not linhas or linhas[0][0] != self.__sequencia + 1:
+            return None
+        self.__sequencia = linhas[-1][0]
+        return [json.loads(registro) for _, registro in linhas]
+
+
+class ArmazenamentoBinario(Armazenamento):
+    # biblioteca.bib (binario.py): cada alteração é uma escrita pequena no
+    # lugar (flags) ou no fim do arquivo (livro novo), sem diário
+    def __init__(self, arquivo="biblioteca.bib", sincronizar=False):
+        self.arquivo = arquivo
+        self.sincronizar = sincronizar
+        if not os.path.exists(arquivo) and not os.path.exists(arquivo + ".1"):
+            gravar_catalogo(arquivo, [])
+        self.catalogo = recuperar_catalogo(arquivo)
+        self.posicoes = {}  # id -> registro no arquivo
+        self.removidos = 0  # registros marcados desde a última regravação
+
+    def carregar(self, progresso=None, recomecar=None):
+        self.posicoes = {}
+        self.removidos = 0
+        total = len(self.catalogo)
+        for posicao, livro in self.catalogo:
+            self.posicoes[livro["id"]] = posicao
+            yield livro
+            if progresso is not None and posicao % 10000 == 0:
+                progresso(posicao, total)
+        self.removidos = total - len(self.posicoes)
+        if progresso is not None:
+            progresso(total, total)
+
+    def __remover(self, id):
+        posicao = self.posicoes.pop(id, None)
+        if posicao is not None:
+            self.catalogo.remover(posicao)
+            self.removidos += 1
+
+    def registrar(self, registro):
+        op = registro["op"]
+        if op == "adicionar":
+            livro = registro["livro"]
+            self.__remover(livro["id"])  # mesmo id de novo: vale o último, como no SQLite
+            self.posicoes[livro["id"]] = self.catalogo.acrescentar(livro)
+        elif op == "remover":
+            self.__remover(registro["id"])
+        elif op == "disponivel" and registro["id"] in self.posicoes:
+            self.catalogo.mudar_status(self.posicoes[registro["id"]], registro["valor"])
+        # muitos removidos ocupando espaço: hora de regravar sem eles
+        return self.removidos > max(1000, len(self.posicoes) // 4)
+
+    def registrar_varios(self, registros):
+        salvar_tudo = super().registrar_varios(registros)
+        if self.sincronizar:
+            self.catalogo.sincronizar()
+        return salvar_tudo
+
+    def salvar(self, livros, proximo_id=0):
+        self.catalogo.fechar()  # no Windows, um arquivo mapeado não pode ser trocado
+        try:
+            ids = gravar_catalogo(self.arquivo, livros, proximo_id)
+        finally:
+            self.catalogo = CatalogoBinario(self.arquivo, escrita=True)
+        self.posicoes = {id: posicao for posicao, id in enumerate(ids)}
+        self.removidos = 0
+
+    def proximo_id(self):
+        return self.catalogo.proximo_id
+
+    def fechar(self):
+        self.catalogo.fechar()
+
+
+def abrir_armazenamento(arquivo, **opcoes):
+    # escolhe a implementação pela extensão: .db/.sqlite/.sqlite3 usam SQLite,
+    # .bib o formato binário; as opções (diário, gerações, thread de gravação,
+    # compartilhado) valem só para o JSON, menos sincronizar, que vale para
+    # todos; o SQLite já trava o banco entre processos
+    extensao = os.path.splitext(arquivo)[1].lower()
+    if extensao in (".db", ".sqlite", ".sqlite3"):
+        return ArmazenamentoSQLite(arquivo, opcoes.get("sincronizar", False))
+    if extensao == ".bib":
+        if opcoes.get("compartilhado"):
+            raise ValueError("o catálogo binário (.bib) não pode ser compartilhado; use o JSON ou o SQLite")
+        return ArmazenamentoBinario(arquivo, opcoes.get("sincronizar", False))
+    return ArmazenamentoJSON(arquivo, **opcoes)
+
+
+def aplicar_registros(livros, registros):
+    # reaplica o diário sobre a lista de dicts do snapshot, sem criar objetos Livro
+    por_id = {}
+    proximo = 1
+    for livro in livros:
+        id = livro.get("id")
+        if id is None or id in por_id:
+            id = proximo
+        livro = dict(livro, id=id)
+        por_id[id] = livro
+        proximo = max(proximo, id + 1)
+    for registro in registros:
+        op = registro.get("op")
+        if op == "adicionar":
+            livro = dict(registro["livro"])
+            if livro.get("id") is None or livro["id"] in por_id:
+                livro["id"] = proximo
+            por_id[livro["id"]] = livro
+            proximo = max(proximo, livro["id"] + 1)
+            continue
+        id = list(por_id)[registro["idx"]] if "idx" in registro else registro["id"]
+        if op == "remover":
+            por_id.pop(id, None)
+        elif op == "disponivel" and id in por_id:
+            por_id[id]["disponivel"] = registro["valor"]
+    return list(por_id.values())
+
+
+def migrar(origem, destino):
+    # copia um catálogo (snapshot + diário) para outro armazenamento, com o
+    # histórico de empréstimos ("<catálogo>.historico") junto
+    fonte = abrir_armazenamento(origem)
+    livros = aplicar_registros(list(fonte.carregar()), fonte.pendentes())
+    proximo_id = fonte.proximo_id()
+    fonte.fechar()
+    alvo = abrir_armazenamento(destino)
+    alvo.salvar(livros, proximo_id)
+    alvo.fechar()
+    if os.path.exists(origem + ".historico"):
+        shutil.copyfile(origem + ".historico", destino + ".historico")
+    return len(livros)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra o catálogo entre biblioteca.json, SQLite (.db) e binário (.bib)")
+    parser.add_argument("origem", help="ex.: biblioteca.json")
+    parser.add_argument("destino", help="ex.: biblioteca.db ou biblioteca.bib")
+    args = parser.parse_args()
+    print(f"{migrar(args.origem, args.destino)} livros copiados para {args.destino}")
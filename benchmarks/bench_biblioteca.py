@@ -0,0 +1,234 @@
+# Mede carregar_dados, salvar_dados, adicionar_livro, remover_livro e a
+# atualização da lista (Tk) em catálogos sintéticos de vários tamanhos.
+# Uso: python benchmarks/bench_biblioteca.py [-n 1000 10000 100000] [--formato json db bib]
+#                                            [--saida resultados.json] [--comparar anterior.json]
+# O tempo é medido sem tracemalloc; o pico de memória, numa segunda rodada com
+# ele ligado (--sem-memoria pula essa rodada). A parte Tk roda no DISPLAY atual
+# ou num Xvfb temporário, se houver; sem nenhum dos dois, é pulada.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from armazenamento import ArmazenamentoSQLite
+from binario import gravar_catalogo
+from modelo import Biblioteca, LivroDigital, LivroFisico
+
+TIPOS = ("Livro", "Físico", "Digital")
+
+
+def gerar_catalogo(arquivo, n):
+    autores = max(1, n // 20)
+    livros = ({"titulo": f"Livro Numero {i}", "autor": f"Autor {i % autores}", "disponivel": i % 7 != 0,
+               "tipo": TIPOS[i % 3], "id": i} for i in range(1, n + 1))
+    if arquivo.endswith(".db"):
+        armazenamento = ArmazenamentoSQLite(arquivo)
+        armazenamento.salvar(list(livros))
+        armazenamento.fechar()
+        return
+    if arquivo.endswith(".bib"):
+        gravar_catalogo(arquivo, livros)
+        return
+    with open(arquivo, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, livro in enumerate(livros):
+            f.write(("," if i else "") + json.dumps(livro, ensure_ascii=False))
+        f.write("]")
+
+
+def medir(funcao, memoria):
+    # devolve (segundos, pico em bytes ou None); a funcao é chamada uma vez
+    # por rodada e precisa poder repetir
+    inicio = time.perf_counter()
+    funcao()
+    segundos = time.perf_counter() - inicio
+    if not memoria:
+        return segundos, None
+    tracemalloc.start()
+    try:
+        funcao()
+        return segundos, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def abrir(arquivo):
+    # atraso 0: cada alteração vai para o disco na hora, como no uso comum
+    return Biblioteca(arquivo, gravar_em_segundo_plano=False)
+
+
+def bench_modelo(arquivo, n, operacoes, memoria):
+    resultados = {}
+    # o catálogo gerado ainda não tem o índice de busca gravado; o primeiro
+    # salvamento cria, como numa biblioteca já em uso
+    biblioteca = abrir(arquivo)
+    biblioteca.salvar_dados()
+    biblioteca.fechar()
+
+    estado = {}
+
+    def carregar():
+        if "biblioteca" in estado:
+            estado["biblioteca"].fechar()
+        estado["biblioteca"] = abrir(arquivo)
+
+    resultados["carregar_dados"] = medir(carregar, memoria)
+    biblioteca = estado["biblioteca"]
+    resultados["salvar_dados"] = medir(biblioteca.salvar_dados, memoria)
+
+    novos = []
+
+    def adicionar():
+        for i in range(operacoes):
+            livro = (LivroFisico if i % 2 else LivroDigital)(f"Novo {len(novos)}", "Autor Bench")
+            biblioteca.adicionar_livro(livro)
+            novos.append(livro.get_id())
+
+    def remover():
+        for id in random.sample(range(1, n + 1), operacoes):
+            if biblioteca.buscar_por_id(id) is not None:
+                biblioteca.remover_livro(id)
+
+    for nome, funcao in (("adicionar_livro", adicionar), ("remover_livro", remover)):
+        segundos, pico = medir(funcao, memoria)
+        resultados[nome] = (segundos / operacoes, pico)
+    biblioteca.fechar()
+    return resultados
+
+
+def abrir_display():
+    # devolve o processo Xvfb iniciado (ou None) e se há onde desenhar
+    if os.environ.get("DISPLAY"):
+        return None, True
+    if shutil.which("Xvfb") is None:
+        return None, False
+    for numero in range(99, 120):
+        if not os.path.exists(f"/tmp/.X11-unix/X{numero}"):
+            break
+    processo = subprocess.Popen(["Xvfb", f":{numero}", "-nolisten", "tcp", "-screen", "0", "1280x1024x24"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(50):
+        if os.path.exists(f"/tmp/.X11-unix/X{numero}"):
+            os.environ["DISPLAY"] = f":{numero}"
+            return processo, True
+        time.sleep(0.1)
+    processo.terminate()
+    return None, False
+
+
+def bench_tk(arquivo, operacoes, memoria):
+    import tkinter as tk
+    from lista_virtual import ListaVirtual
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return {}
+    biblioteca = abrir(arquivo)
+    try:
+        root.geometry("900x600")
+        # as mesmas colunas e funções da janela principal (projepoo1)
+        def valores(livro):
+            emprestimo = biblioteca.emprestimo_ativo(livro.get_id())
+            prazo = f"{emprestimo.prevista:%d/%m/%Y}" if emprestimo is not None else ""
+            return livro.exibir_informacoes() + (prazo,)
+
+        lista = ListaVirtual(root, ("Título", "Autor", "Disponível", "Tipo", "Devolver até"),
+                             biblioteca.total_livros, biblioteca.pagina, valores=valores,
+                             chave=lambda livro: str(livro.get_id()))
+        lista.pack(fill="both", expand=True)
+        root.update()
+        total = biblioteca.total_livros()
+
+        def atualizar():
+            # a lista vazia e redesenhada: o custo de atualizar_tree após uma pesquisa
+            for _ in range(operacoes):
+                lista.tree.delete(*lista.tree.get_children())
+                lista.atualizar()
+                root.update_idletasks()
+
+        def rolar():
+            for _ in range(operacoes):
+                lista.ir_para(random.randrange(max(1, total)))
+                root.update_idletasks()
+
+        resultados = {}
+        for nome, funcao in (("atualizar_tree", atualizar), ("rolar_lista", rolar)):
+            segundos, pico = medir(funcao, memoria)
+            resultados[nome] = (segundos / operacoes, pico)
+        return resultados
+    finally:
+        root.destroy()
+        biblioteca.fechar()
+
+
+def imprimir(linhas, anteriores):
+    print(f"{'formato':<8} {'livros':>9} {'operação':<16} {'tempo (ms)':>12} {'pico (MiB)':>11} {'vs anterior':>12}")
+    for linha in linhas:
+        pico = f"{linha['pico'] / 2**20:.1f}" if linha["pico"] is not None else "-"
+        anterior = anteriores.get((linha["formato"], linha["livros"], linha["operacao"]))
+        comparacao = f"{linha['segundos'] / anterior['segundos']:.2f}x" if anterior else ""
+        print(f"{linha['formato']:<8} {linha['livros']:>9} {linha['operacao']:<16} "
+              f"{linha['segundos'] * 1000:>12.3f} {pico:>11} {comparacao:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="tamanhos dos catálogos (até 1000000)")
+    parser.add_argument("--formato", nargs="+", choices=("json", "db", "bib"), default=["json"])
+    parser.add_argument("--operacoes", type=int, default=100, help="alterações/atualizações por medida")
+    parser.add_argument("--sem-memoria", action="store_true")
+    parser.add_argument("--sem-tk", action="store_true")
+    parser.add_argument("--saida", default=f"bench_biblioteca-{datetime.now():%Y%m%d-%H%M%S}.json")
+    parser.add_argument("--comparar", help="resultado de uma rodada anterior (--saida)")
+    args = parser.parse_args()
+    random.seed(0)
+
+    xvfb, desenhar = (None, False) if args.sem_tk else abrir_display()
+    if not args.sem_tk and not desenhar:
+        print("sem DISPLAY nem Xvfb: a atualização da lista (Tk) não será medida")
+    linhas = []
+    try:
+        for formato in args.formato:
+            for n in args.n:
+                with tempfile.TemporaryDirectory() as pasta:
+                    arquivo = os.path.join(pasta, f"biblioteca.{formato}")
+                    gerar_catalogo(arquivo, n)
+                    resultados = bench_modelo(arquivo, n, min(args.operacoes, n), not args.sem_memoria)
+                    if desenhar:
+                        resultados.update(bench_tk(arquivo, args.operacoes, not args.sem_memoria))
+                for operacao, (segundos, pico) in resultados.items():
+                    linhas.append({"formato": formato, "livros": n, "operacao": operacao,
+                                   "segundos": segundos, "pico": pico})
+                print(f"{formato} com {n} livros: ok", file=sys.stderr)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+
+    anteriores = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            for linha in json.load(f)["resultados"]:
+                anteriores[(linha["formato"], linha["livros"], linha["operacao"])] = linha
+    imprimir(linhas, anteriores)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump({"data": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                   "maquina": platform.platform(), "operacoes": args.operacoes, "resultados": linhas},
+                  f, ensure_ascii=False, indent=2)
+    print(f"resultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Compara busca linear na lista de livros com os índices da Biblioteca.
+# Uso: python benchmarks/bench_indices.py [-n 1000000]
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indices import IndiceLivros, normalizar
+from modelo import Livro, LivroDigital, LivroFisico
+
+
+def gerar(n):
+    autores = [f"Autor {i}" for i in range(max(1, n // 20))]
+    classes = (Livro, LivroFisico, LivroDigital)
+    return [classes[i % 3](f"Livro Numero {i}", autores[i % len(autores)], True, i) for i in range(1, n + 1)]
+
+
+def cronometrar(funcao, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=1_000_000)
+    parser.add_argument("--consultas", type=int, default=20)
+    args = parser.parse_args()
+
+    livros = gerar(args.n)
+    por_id = {}
+    indice = IndiceLivros()
+    inicio = time.perf_counter()
+    for livro in livros:
+        por_id[livro.get_id()] = livro
+        indice.adicionar(livro)
+    print(f"{args.n} livros indexados em {time.perf_counter() - inicio:.2f}s")
+
+    alvo = random.choice(livros)
+    titulo, autor = alvo.get_titulo(), alvo.get_autor()
+    casos = [
+        ("título",
+         lambda: [l for l in livros if normalizar(l.get_titulo()) == normalizar(titulo)],
+         lambda: indice.buscar_titulo(titulo)),
+        ("autor",
+         lambda: [l for l in livros if normalizar(l.get_autor()) == normalizar(autor)],
+         lambda: indice.livros_do_autor(autor)),
+        ("id",
+         lambda: next(l for l in livros if l.get_id() == alvo.get_id()),
+         lambda: por_id.get(alvo.get_id())),
+        ("duplicado",
+         lambda: any(l.get_titulo() == titulo and l.get_autor() == autor and l.get_tipo() == alvo.get_tipo() for l in livros),
+         lambda: indice.duplicado(titulo, autor, alvo.get_tipo())),
+    ]
+    print(f"{'consulta':<10} {'linear (ms)':>12} {'índice (ms)':>12} {'ganho':>10}")
+    for nome, linear, indexada in casos:
+        t_linear = cronometrar(linear, max(1, args.consultas // 10))
+        t_indice = cronometrar(indexada, args.consultas * 1000)
+        print(f"{nome:<10} {t_linear * 1000:>12.3f} {t_indice * 1000:>12.5f} {t_linear / t_indice:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Teste de carga da API HTTP (servidor.py): várias conexões keep-alive em
+# paralelo, mistura de listagem, busca e empréstimo/devolução.
+# Uso: python benchmarks/carga_servidor.py [--url http://127.0.0.1:8080] [-c 50] [-d 10]
+# Sem --url, sobe um servidor temporário com --livros livros gerados.
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def requisitar(leitor, escritor, metodo, caminho, corpo=None):
+    dados = json.dumps(corpo).encode("utf-8") if corpo is not None else b""
+    escritor.write((f"{metodo} {caminho} HTTP/1.1\r\nHost: localhost\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(dados)}\r\n\r\n").encode("latin-1") + dados)
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    tamanho = 0
+    while True:
+        linha = await leitor.readline()
+        if linha in (b"\r\n", b""):
+            break
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        if nome.strip().lower() == "content-length":
+            tamanho = int(valor)
+    await leitor.readexactly(tamanho)
+    return status
+
+
+def sortear(total):
+    # 70% listagem, 15% busca, 15% emprestar/devolver
+    sorteio = random.random()
+    if sorteio < 0.70:
+        inicio = random.randrange(max(1, total - 50))
+        return "GET", f"/livros?inicio={inicio}&fim={inicio + 50}", None
+    if sorteio < 0.85:
+        return "GET", f"/livros?q=livro+{random.randrange(total)}", None
+    acao = random.choice(("emprestar", "devolver"))
+    return "POST", f"/livros/{random.randint(1, total)}/{acao}", {"leitor": "carga"} if acao == "emprestar" else {}
+
+
+async def cliente(host, porta, total, fim, latencias, status):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    try:
+        while time.perf_counter() < fim:
+            metodo, caminho, corpo = sortear(total)
+            inicio = time.perf_counter()
+            codigo = await requisitar(leitor, escritor, metodo, caminho, corpo)
+            latencias.append(time.perf_counter() - inicio)
+            status[codigo] = status.get(codigo, 0) + 1
+    finally:
+        escritor.close()
+
+
+async def medir(host, porta, conexoes, duracao):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    escritor.write(b"GET /livros?fim=1 HTTP/1.1\r\nConnection: close\r\n\r\n")
+    resposta = await leitor.read()
+    escritor.close()
+    total = json.loads(resposta.split(b"\r\n\r\n", 1)[1])["total"]
+    if not total:
+        raise SystemExit("o catálogo do servidor está vazio")
+    latencias, status = [], {}
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(host, porta, total, inicio + duracao, latencias, status) for _ in range(conexoes)))
+    decorrido = time.perf_counter() - inicio
+    latencias.sort()
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+    print(f"{len(latencias)} requisições em {decorrido:.1f}s com {conexoes} conexões")
+    print(f"{len(latencias) / decorrido:.0f} req/s   p50 {percentil(0.50):.2f} ms   "
+          f"p99 {percentil(0.99):.2f} ms   máx {latencias[-1] * 1000:.2f} ms")
+    print("status:", ", ".join(f"{codigo}: {n}" for codigo, n in sorted(status.items())))
+
+
+def subir_servidor(pasta, livros, porta):
+    arquivo = os.path.join(pasta, "biblioteca.json")
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump([{"titulo": f"Livro {i}", "autor": f"Autor {i % 500}", "disponivel": True,
+                    "tipo": "Físico", "id": i} for i in range(1, livros + 1)], f)
+    processo = subprocess.Popen([sys.executable, os.path.join(RAIZ, "servidor.py"), "--arquivo", arquivo,
+                                 "--porta", str(porta)], stdout=subprocess.PIPE, text=True)
+    print(processo.stdout.readline().strip())  # espera o "Servindo ..."
+    return processo
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="servidor já rodando; sem isso sobe um temporário")
+    parser.add_argument("-c", "--conexoes", type=int, default=50)
+    parser.add_argument("-d", "--duracao", type=float, default=10, help="segundos")
+    parser.add_argument("--livros", type=int, default=10000)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.url:
+        partes = urlsplit(args.url)
+        asyncio.run(medir(partes.hostname, partes.port or 80, args.conexoes, args.duracao))
+        return
+    with tempfile.TemporaryDirectory() as pasta:
+        processo = subir_servidor(pasta, args.livros, args.porta)
+        try:
+            asyncio.run(medir("127.0.0.1", args.porta, args.conexoes, args.duracao))
+        finally:
+            processo.terminate()
+            processo.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+import mmap
+import os
+import struct
+
+from snapshot import sincronizar_pasta
+
+# ---------------- CATÁLOGO BINÁRIO ---------------- #
+# Formato compacto do catálogo ("biblioteca.bib"), lido por mmap:
+#
+#   biblioteca.bib          cabeçalho + registros de tamanho fixo, um por livro
+#   biblioteca.bib.textos.N títulos e autores em UTF-8, um atrás do outro
+#
+# Cada registro tem id, flags (disponível, removido), código do tipo e
+# posição/tamanho do título e do autor no arquivo de textos. O livro n está
+# sempre no byte CABECALHO.size + n * REGISTRO.size: abrir não lê nada, uma
+# página é uma fatia do mapa, e emprestar/devolver/remover mudam um byte no
+# lugar. Livros novos vão para o fim dos dois arquivos; os removidos ficam
+# marcados até a próxima regravação (gravar_catalogo), que troca os textos de
+# geração: o cabeçalho diz qual arquivo de textos vale, então trocar o .bib
+# com os.replace troca os dois de uma vez. A regravação passa por fsync antes
+# da troca, e o .bib anterior fica como "biblioteca.bib.1" (com os textos
+# dele): um .bib ilegível é trocado por ele ao abrir. O cabeçalho guarda
+# também o próximo id a entregar: um id removido nunca volta, nem depois da
+# regravação.
+
+MAGICO = b"BIB1"
+VERSAO = 1
+CABECALHO = struct.Struct("<4sHHII")     # mágico, versão, tamanho do registro, geração dos textos, próximo id
+PROXIMO_ID = 12                          # posição do próximo id no cabeçalho (0 em arquivos antigos)
+REGISTRO = struct.Struct("<IBBxxIIII")   # id, flags, tipo, título (início, tamanho), autor (início, tamanho)
+DISPONIVEL = 1
+REMOVIDO = 2
+TIPOS = ("Livro", "Físico", "Digital")
+CODIGOS = {tipo: codigo for codigo, tipo in enumerate(TIPOS)}
+
+
+def arquivo_textos(arquivo, geracao):
+    return f"{arquivo}.textos.{geracao}"
+
+
+def ler_cabecalho(arquivo):
+    # devolve (geração dos textos, próximo id)
+    with open(arquivo, "rb") as f:
+        dados = f.read(CABECALHO.size)
+    if len(dados) < CABECALHO.size:
+        raise ValueError(f"'{arquivo}' não é um catálogo binário (arquivo curto)")
+    magico, versao, tamanho, geracao, proximo_id = CABECALHO.unpack(dados)
+    if magico != MAGICO or tamanho != REGISTRO.size:
+        raise ValueError(f"'{arquivo}' não é um catálogo binário")
+    if versao > VERSAO:
+        raise ValueError(f"'{arquivo}' foi gravado por uma versão mais nova do programa (formato {versao})")
+    return geracao, proximo_id
+
+
+def arquivo_anterior(arquivo):
+    return arquivo + ".1"
+
+
+def ler_cabecalho_ou_nada(arquivo):
+    # (geração, próximo id) de um .bib legível, ou None
+    try:
+        return ler_cabecalho(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def gravar_catalogo(arquivo, livros, proximo_id=0):
+    # grava o catálogo inteiro (dicts de Livro.to_dict) numa nova geração;
+    # devolve os ids na ordem dos registros. proximo_id: o maior id já
+    # entregue + 1, que pode ser de um livro que não está mais em livros
+    atual = ler_cabecalho_ou_nada(arquivo)
+    anterior = ler_cabecalho_ou_nada(arquivo_anterior(arquivo))
+    geracao = max(atual[0] if atual else 0, anterior[0] if anterior else 0) + 1
+    proximo_id = max(proximo_id, atual[1] if atual else 0)
+    textos = arquivo_textos(arquivo, geracao)
+    temporario = arquivo + ".tmp"
+    ids = []
+    with open(textos, "wb") as t, open(temporario, "wb") as r:
+        r.write(CABECALHO.pack(MAGICO, VERSAO, REGISTRO.size, geracao, 0))
+        posicao = 0
+        for livro in livros:
+            titulo = livro["titulo"].encode("utf-8")
+            autor = livro["autor"].encode("utf-8")
+            t.write(titulo)
+            t.write(autor)
+            flags = DISPONIVEL if livro.get("disponivel", True) else 0
+            r.write(REGISTRO.pack(livro["id"], flags, CODIGOS.get(livro.get("tipo"), 0),
+                                  posicao, len(titulo), posicao + len(titulo), len(autor)))
+            posicao += len(titulo) + len(autor)
+            ids.append(livro["id"])
+            proximo_id = max(proximo_id, livro["id"] + 1)
+        r.seek(PROXIMO_ID)
+        r.write(struct.pack("<I", proximo_id))
+        # sempre no disco antes da troca: o .bib novo não pode apontar para
+        # dados que uma queda de energia ainda pode levar
+        for f in (t, r):
+            f.flush()
+            os.fsync(f.fileno())
+    pasta = os.path.dirname(os.path.abspath(arquivo))
+    # o .bib atual (se legível) vira o anterior, como as gerações do snapshot
+    if atual is not None:
+        os.replace(arquivo, arquivo_anterior(arquivo))
+        anterior = atual
+    os.replace(temporario, arquivo)
+    sincronizar_pasta(pasta)
+    # só com a troca no disco, os textos de outras gerações (menos os do
+    # anterior) podem sair: sobras de gravações antigas ou que caíram
+    manter = {os.path.basename(textos)}
+    if anterior is not None:
+        manter.add(os.path.basename(arquivo_textos(arquivo, anterior[0])))
+    prefixo = os.path.basename(arquivo) + ".textos."
+    for nome in os.listdir(pasta):
+        if nome.startswith(prefixo) and nome not in manter:
+            try:
+                os.remove(os.path.join(pasta, nome))
+            except OSError:
+                pass
+    return ids
+
+
+class CatalogoBinario:
+    # acesso direto aos registros; escrita=True permite acrescentar e mudar flags
+    def __init__(self, arquivo, escrita=False):
+        self.arquivo = arquivo
+        self.escrita = escrita
+        self.geracao, self.proximo_id = ler_cabecalho(arquivo)
+        modo = "r+b" if escrita else "rb"
+        self.__registros = open(arquivo, modo)
+        try:
+            self.__textos = open(arquivo_textos(arquivo, self.geracao), modo)
+        except OSError:
+            self.__registros.close()
+            raise
+        if escrita:
+            # um registro pela metade (queda no meio do acréscimo) é descartado
+            tamanho = os.path.getsize(arquivo)
+            inteiros = CABECALHO.size + (tamanho - CABECALHO.size) // REGISTRO.size * REGISTRO.size
+            if inteiros != tamanho:
+                self.__registros.truncate(inteiros)
+        # registros no arquivo (contando os removidos); o mapa é refeito só
+        # quando alguém pede um registro que ficou além dele
+        self.__total = (os.path.getsize(arquivo) - CABECALHO.size) // REGISTRO.size
+        self.__mapa = None
+        self.__mapa_textos = None
+        self.__mapear()
+
+    def __mapear(self):
+        self.__fechar_mapas()
+        acesso = mmap.ACCESS_WRITE if self.escrita else mmap.ACCESS_READ
+        self.__mapa = mmap.mmap(self.__registros.fileno(), 0, access=acesso)
+        # mmap não aceita arquivo vazio: sem textos ainda, um bytes vazio serve
+        if os.fstat(self.__textos.fileno()).st_size:
+            self.__mapa_textos = mmap.mmap(self.__textos.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.__mapa_textos = b""
+
+    def __fechar_mapas(self):
+        for mapa in (self.__mapa, self.__mapa_textos):
+            if isinstance(mapa, mmap.mmap):
+                mapa.close()
+        self.__mapa = self.__mapa_textos = None
+
+    def __len__(self):
+        return self.__total
+
+    def __garantir(self, posicao):
+        if CABECALHO.size + (posicao + 1) * REGISTRO.size > len(self.__mapa):
+            self.__mapear()
+
+    def __texto(self, inicio, tamanho):
+        if inicio + tamanho > len(self.__mapa_textos):
+            self.__mapear()
+        return self.__mapa_textos[inicio:inicio + tamanho].decode("utf-8")
+
+    def registro(self, posicao):
+        # dict no formato do biblioteca.json, ou None se o livro foi removido
+        self.__garantir(posicao)
+        id, flags, tipo, inicio_titulo, tamanho_titulo, inicio_autor, tamanho_autor = \
+            REGISTRO.unpack_from(self.__mapa, CABECALHO.size + posicao * REGISTRO.size)
+        if flags & REMOVIDO:
+            return None
+        return {"titulo": self.__texto(inicio_titulo, tamanho_titulo),
+                "autor": self.__texto(inicio_autor, tamanho_autor),
+                "disponivel": bool(flags & DISPONIVEL),
+                "tipo": TIPOS[tipo] if tipo < len(TIPOS) else "Livro", "id": id}
+
+    def pagina(self, inicio, fim):
+        # livros dos registros [inicio, fim), sem os removidos
+        livros = []
+        for posicao in range(max(0, inicio), min(fim, len(self))):
+            livro = self.registro(posicao)
+            if livro is not None:
+                livros.append(livro)
+        return livros
+
+    def __iter__(self):
+        # (posição, livro) dos registros não removidos
+        for posicao in range(len(self)):
+            livro = self.registro(posicao)
+            if livro is not None:
+                yield posicao, livro
+
+    # Escrita (escrita=True)
+    def __mudar_flags(self, posicao, ligar=0, desligar=0):
+        self.__garantir(posicao)
+        byte = CABECALHO.size + posicao * REGISTRO.size + 4
+        self.__mapa[byte] = (self.__mapa[byte] | ligar) & ~desligar
+
+    def mudar_status(self, posicao, disponivel):
+        if disponivel:
+            self.__mudar_flags(posicao, ligar=DISPONIVEL)
+        else:
+            self.__mudar_flags(posicao, desligar=DISPONIVEL)
+
+    def remover(self, posicao):
+        self.__mudar_flags(posicao, ligar=REMOVIDO)
+
+    def acrescentar(self, livro):
+        # textos primeiro: um registro nunca aponta para texto que não chegou ao arquivo
+        titulo = livro["titulo"].encode("utf-8")
+        autor = livro["autor"].encode("utf-8")
+        inicio = self.__textos.seek(0, os.SEEK_END)
+        self.__textos.write(titulo + autor)
+        self.__textos.flush()
+        flags = DISPONIVEL if livro.get("disponivel", True) else 0
+        self.__registros.seek(0, os.SEEK_END)
+        self.__registros.write(REGISTRO.pack(livro["id"], flags, CODIGOS.get(livro.get("tipo"), 0),
+                                             inicio, len(titulo), inicio + len(titulo), len(autor)))
+        self.__registros.flush()
+        if livro["id"] >= self.proximo_id:
+            self.proximo_id = livro["id"] + 1
+            struct.pack_into("<I", self.__mapa, PROXIMO_ID, self.proximo_id)
+        self.__total += 1
+        return self.__total - 1
+
+    def sincronizar(self):
+        # leva ao disco o que foi escrito (flags pelo mapa, acréscimos pelo arquivo)
+        self.__mapa.flush()
+        for f in (self.__registros, self.__textos):
+            os.fsync(f.fileno())
+
+    def fechar(self):
+        self.__fechar_mapas()
+        self.__registros.close()
+        self.__textos.close()
+
+
+def recuperar_catalogo(arquivo):
+    # abre o .bib para escrita; se ele (ou os textos dele) não estiver legível
+    # e houver um anterior, o ilegível vai para "<arquivo>.corrompido" e o
+    # anterior volta ao lugar. Sem anterior, o erro segue para quem abriu
+    try:
+        return CatalogoBinario(arquivo, escrita=True)
+    except (OSError, ValueError):
+        anterior = arquivo_anterior(arquivo)
+        if ler_cabecalho_ou_nada(anterior) is None:
+            raise
+    if os.path.exists(arquivo):
+        os.replace(arquivo, arquivo + ".corrompido")
+    os.replace(anterior, arquivo)
+    sincronizar_pasta(os.path.dirname(os.path.abspath(arquivo)))
+    return CatalogoBinario(arquivo, escrita=True)
@@ -0,0 +1,142 @@
+import bisect
+import heapq
+import json
+import os
+import re
+import unicodedata
+
+# ---------------- BUSCA ---------------- #
+# Índice invertido: cada palavra (sem acento, minúscula) dos títulos e autores
+# aponta para o conjunto de ids que a contém. As palavras ficam também numa
+# lista ordenada, então "alien" acha "alienista" por busca binária de prefixo,
+# o que permite pesquisar enquanto o usuário digita.
+
+PALAVRA = re.compile(r"\w+")
+
+
+def sem_acentos(texto):
+    if texto.isascii():
+        return texto
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    return PALAVRA.findall(sem_acentos(texto).casefold())
+
+
+def impressao_ids(ids):
+    # identifica o conjunto de livros; títulos e autores não mudam depois do
+    # cadastro, então o mesmo conjunto de ids implica o mesmo índice
+    ids = list(ids)
+    return [len(ids), sum(ids), sum(i * i for i in ids) % 2 ** 61]
+
+
+class IndiceBusca:
+    def __init__(self):
+        self.palavras = {}   # palavra -> set de ids
+        self.ordenadas = []  # vocabulário ordenado para busca por prefixo
+        # palavras já em self.palavras que ainda não entraram em ordenadas
+        # (importação): entram todas de uma vez, por juntar_novas()
+        self.novas = []
+        # muda a cada alteração: quem serializa fora da trava confere depois
+        # se o índice continuou o mesmo
+        self.versao = 0
+
+    def adicionar(self, id, *textos):
+        self.versao += 1
+        for palavra in {p for texto in textos for p in tokenizar(texto)}:
+            ids = self.palavras.get(palavra)
+            if ids is None:
+                ids = self.palavras[palavra] = set()
+                bisect.insort(self.ordenadas, palavra)
+            ids.add(id)
+
+    def adicionar_palavras(self, itens):
+        # itens: (id, palavras já tokenizadas, sem repetição); as palavras
+        # novas esperam em self.novas, e o vocabulário não é reordenado a cada
+        # chamada: a importação junta tudo uma vez só no fim
+        self.versao += 1
+        for id, palavras in itens:
+            for palavra in palavras:
+                ids = self.palavras.get(palavra)
+                if ids is None:
+                    ids = self.palavras[palavra] = set()
+                    self.novas.append(palavra)
+                ids.add(id)
+
+    def juntar_novas(self):
+        # intercala as palavras novas (ordenadas entre si) no vocabulário: O(V + k log k)
+        if self.novas:
+            self.ordenadas = list(heapq.merge(self.ordenadas, sorted(self.novas)))
+            self.novas = []
+
+    def remover(self, id, *textos):
+        self.versao += 1
+        for palavra in {p for texto in textos for p in tokenizar(texto)}:
+            ids = self.palavras.get(palavra)
+            if ids is None:
+                continue
+            ids.discard(id)
+            if not ids:
+                self.juntar_novas()
+                del self.palavras[palavra]
+                pos = bisect.bisect_left(self.ordenadas, palavra)
+                if pos < len(self.ordenadas) and self.ordenadas[pos] == palavra:
+                    del self.ordenadas[pos]
+
+    def reconstruir(self, itens):
+        # itens: (id, textos...); ordena o vocabulário uma vez só no fim
+        self.versao += 1
+        self.palavras = {}
+        for id, *textos in itens:
+            for palavra in {p for texto in textos for p in tokenizar(texto)}:
+                self.palavras.setdefault(palavra, set()).add(id)
+        self.ordenadas = sorted(self.palavras)
+        self.novas = []
+
+    def __com_prefixo(self, prefixo):
+        self.juntar_novas()  # pesquisa no meio de uma importação
+        inicio = bisect.bisect_left(self.ordenadas, prefixo)
+        fim = bisect.bisect_left(self.ordenadas, prefixo + "\U0010ffff")
+        if fim - inicio == 1:
+            return self.palavras[self.ordenadas[inicio]]
+        encontrados = set()
+        for palavra in self.ordenadas[inicio:fim]:
+            encontrados |= self.palavras[palavra]
+        return encontrados
+
+    def buscar(self, consulta):
+        # ids que têm todas as palavras da consulta (cada uma como prefixo)
+        termos = tokenizar(consulta)
+        if not termos:
+            return []
+        conjuntos = sorted((self.__com_prefixo(t) for t in set(termos)), key=len)
+        resultado = set(conjuntos[0])
+        for conjunto in conjuntos[1:]:
+            resultado &= conjunto
+            if not resultado:
+                break
+        return sorted(resultado)
+
+    # Persistência ao lado do biblioteca.json
+    def serializar(self, impressao):
+        dados = {"impressao": impressao, "palavras": {p: sorted(ids) for p, ids in self.palavras.items()}}
+        return json.dumps(dados, ensure_ascii=False, separators=(",", ":"))
+
+    def carregar(self, arquivo, impressao):
+        # só aproveita o arquivo se ele for do mesmo conjunto de livros
+        if not os.path.exists(arquivo):
+            return False
+        try:
+            with open(arquivo, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if dados.get("impressao") != impressao:
+            return False
+        self.versao += 1
+        self.palavras = {p: set(ids) for p, ids in dados["palavras"].items()}
+        self.ordenadas = sorted(self.palavras)
+        self.novas = []
+        return True
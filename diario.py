@@ -0,0 +1,188 @@
+import json
+import os
+import zlib
+
+# ---------------- DIÁRIO (write-ahead log) ---------------- #
+# Cada alteração do catálogo vira uma linha JSON compacta anexada ao arquivo
+# "<snapshot>.log". A primeira linha do log guarda o CRC32 do snapshot sobre o
+# qual as alterações devem ser reaplicadas; se o snapshot mudar (compactação
+# concluída), o log antigo é descartado em vez de ser aplicado duas vezes.
+#
+# Na compactação o log atual vira "<snapshot>.log.anterior" até o novo snapshot
+# estar gravado no disco. Se o programa cair antes disso, o snapshot antigo
+# continua valendo e as alterações saem do log anterior + log atual.
+#
+# Com o catálogo compartilhado entre processos, cada um lembra até que byte do
+# log já leu (ou escreveu) e, antes de gravar, lê só o que os outros anexaram
+# depois disso (novidades). Um log novo, criado na compactação, diz no
+# cabeçalho onde o anterior terminou ("continua"), para quem já tinha lido
+# tudo seguir sem recarregar o snapshot.
+#
+# O cabeçalho leva também o próximo id a entregar ("proximo"): o snapshot é só
+# a lista de livros, e sem isso um id removido antes da compactação voltaria
+# a ser usado por um livro novo.
+
+
+def crc_conteudo(conteudo):
+    if isinstance(conteudo, str):
+        conteudo = conteudo.encode("utf-8")
+    return zlib.crc32(conteudo)
+
+
+class Diario:
+    def __init__(self, arquivo_snapshot, limite_compactacao=1000, sincronizar=False):
+        self.arquivo = arquivo_snapshot + ".log"
+        self.arquivo_anterior = self.arquivo + ".anterior"
+        self.limite_compactacao = limite_compactacao
+        # fsync a cada lote: sobrevive a queda de energia, custa uma ida ao disco
+        self.sincronizar = sincronizar
+        self.registros = 0
+        self.pendente = False
+        # base do log e posição (bytes) até onde este processo já leu/escreveu
+        self.base = None
+        self.posicao = 0
+        # próximo id a entregar, dos cabeçalhos lidos e das gravações deste processo
+        self.proximo_id = 0
+
+    def registrar(self, registro):
+        self.registrar_varios([registro])
+
+    def registrar_varios(self, registros):
+        # o lote inteiro numa abertura e numa escrita só
+        linhas = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in registros)
+        with open(self.arquivo, "ab") as f:
+            f.write(linhas.encode("utf-8"))
+            if self.sincronizar:
+                f.flush()
+                os.fsync(f.fileno())
+            self.posicao = f.tell()
+        self.registros += len(registros)
+
+    def precisa_compactar(self):
+        return self.registros >= self.limite_compactacao
+
+    def reiniciar(self, crc_snapshot, continua=None, proximo_id=0):
+        # log vazio apontando para o snapshot recém-gravado
+        self.proximo_id = max(self.proximo_id, proximo_id)
+        cabecalho = {"base": crc_snapshot}
+        if continua is not None:
+            cabecalho["continua"] = continua
+        if self.proximo_id:
+            cabecalho["proximo"] = self.proximo_id
+        with open(self.arquivo, "wb") as f:
+            f.write((json.dumps(cabecalho) + "\n").encode("utf-8"))
+            self.posicao = f.tell()
+        self.base = crc_snapshot
+        self.registros = 0
+
+    def rotacionar(self, crc_novo, proximo_id=0):
+        # chamado antes de gravar um snapshot novo: o log atual fica guardado
+        # até confirmar(); se a gravação anterior não foi confirmada, os
+        # registros se acumulam no log anterior, que ainda é o válido
+        if os.path.exists(self.arquivo):
+            if self.pendente and os.path.exists(self.arquivo_anterior):
+                _, registros, _ = self.__ler(self.arquivo)
+                with open(self.arquivo_anterior, "a", encoding="utf-8") as f:
+                    for registro in registros:
+                        f.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n")
+            else:
+                os.replace(self.arquivo, self.arquivo_anterior)
+        # o snapshot novo é o antigo mais tudo o que este processo leu do log
+        self.reiniciar(crc_novo, [self.base, self.posicao] if self.base is not None else None, proximo_id)
+        self.pendente = True
+
+    def confirmar(self):
+        # o snapshot novo está no disco; o log anterior não é mais necessário
+        self.pendente = False
+        try:
+            os.remove(self.arquivo_anterior)
+        except FileNotFoundError:
+            pass
+
+    def __ler(self, arquivo):
+        if not os.path.exists(arquivo):
+            return None, [], False
+        registros = []
+        cortado = False
+        with open(arquivo, "r", encoding="utf-8") as f:
+            cabecalho = f.readline()
+            try:
+                cabecalho = json.loads(cabecalho)
+                base = cabecalho.get("base")
+            except (json.JSONDecodeError, AttributeError):
+                return None, [], True
+            self.__ver_proximo(cabecalho)
+            for linha in f:
+                if not linha.endswith("\n"):
+                    cortado = True  # última linha cortada por queda no meio da escrita
+                    break
+                try:
+                    registros.append(json.loads(linha))
+                except json.JSONDecodeError:
+                    cortado = True
+                    break
+        return base, registros, cortado
+
+    def __ver_proximo(self, cabecalho):
+        proximo_id = cabecalho.get("proximo")
+        if isinstance(proximo_id, int):
+            self.proximo_id = max(self.proximo_id, proximo_id)
+
+    def reproduzir(self, crc_snapshot):
+        # devolve as alterações pendentes sobre o snapshot carregado; logs de
+        # outro snapshot são descartados
+        base, registros, cortado = self.__ler(self.arquivo)
+        base_anterior, registros_anteriores, _ = self.__ler(self.arquivo_anterior)
+        if base == crc_snapshot and base is not None and not cortado \
+                and not os.path.exists(self.arquivo_anterior):
+            self.registros = len(registros)
+            self.pendente = False
+            self.base = base
+            self.posicao = os.path.getsize(self.arquivo)
+            return registros
+        if base == crc_snapshot:
+            pendentes = registros
+        elif base_anterior == crc_snapshot:
+            # o snapshot novo não chegou ao disco
+            pendentes = registros_anteriores + registros
+        else:
+            pendentes = []
+        # regrava um log único e limpo sobre o snapshot carregado
+        self.reiniciar(crc_snapshot)
+        if pendentes:
+            self.registrar_varios(pendentes)
+        self.confirmar()
+        return pendentes
+
+    def novidades(self):
+        # registros que outros processos anexaram depois da posição deste;
+        # None quando o log foi trocado de um jeito que não dá para seguir
+        # (é preciso recarregar o snapshot)
+        try:
+            f = open(self.arquivo, "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            cabecalho = f.readline()
+            try:
+                dados = json.loads(cabecalho)
+            except ValueError:
+                return None
+            if not isinstance(dados, dict):
+                return None
+            if dados.get("base") != self.base:
+                if dados.get("continua") != [self.base, self.posicao]:
+                    return None
+                # outro processo compactou depois de tudo o que já tínhamos lido
+                self.base = dados["base"]
+                self.__ver_proximo(dados)
+                self.posicao = len(cabecalho)
+            if os.fstat(f.fileno()).st_size < self.posicao:
+                return None
+            f.seek(self.posicao)
+            resto = f.read()
+        # uma linha sem "\n" ainda está sendo escrita: fica para a próxima
+        fim = resto.rfind(b"\n") + 1
+        self.posicao += fim
+        self.registros += resto.count(b"\n", 0, fim)
+        return [json.loads(linha) for linha in resto[:fim].splitlines() if linha.strip()]
@@ -0,0 +1,151 @@
+import bisect
+import json
+from datetime import datetime, timedelta
+
+# ---------------- EMPRÉSTIMOS ---------------- #
+# Histórico de empréstimos num arquivo que só cresce ("<catálogo>.historico",
+# uma linha JSON por retirada ou devolução). Em memória ficam os empréstimos
+# em aberto por livro e uma lista ordenada por data prevista de devolução:
+# "atrasados" e "vencem nos próximos N dias" são uma busca binária mais os k
+# resultados, sem passar por todos os livros.
+
+PRAZO_DIAS = 14
+PRAZO_MAXIMO_DIAS = 3650  # dez anos; além disso é engano de digitação
+
+
+def validar_prazo(dias):
+    # bool é subclasse de int: True/False não contam como prazo
+    if isinstance(dias, bool) or not isinstance(dias, int) or not 1 <= dias <= PRAZO_MAXIMO_DIAS:
+        raise ValueError(f"prazo inválido: {dias!r} (de 1 a {PRAZO_MAXIMO_DIAS} dias)")
+    return dias
+
+
+def data_iso(quando):
+    return quando.isoformat(timespec="seconds")
+
+
+class Emprestimo:
+    __slots__ = ("id_livro", "leitor", "retirada", "prevista", "devolucao")
+
+    def __init__(self, id_livro, leitor, retirada, prevista, devolucao=None):
+        self.id_livro = id_livro
+        self.leitor = leitor
+        self.retirada = retirada
+        self.prevista = prevista
+        self.devolucao = devolucao
+
+    def atrasado(self, agora=None):
+        return self.devolucao is None and self.prevista < (agora or datetime.now())
+
+
+class HistoricoEmprestimos:
+    def __init__(self, arquivo=None):
+        self.arquivo = arquivo   # None: só em memória
+        self.posicao = 0         # bytes do arquivo já lidos/escritos
+        self.por_livro = {}      # id do livro -> empréstimos em ordem de retirada
+        self.ativos = {}         # id do livro -> empréstimo em aberto
+        self.por_prevista = []   # (prevista, id do livro) dos ativos, ordenado
+
+    def limpar(self):
+        self.posicao = 0
+        self.por_livro = {}
+        self.ativos = {}
+        self.por_prevista = []
+
+    def __fechar(self, id_livro, quando):
+        emprestimo = self.ativos.pop(id_livro, None)
+        if emprestimo is None:
+            return None
+        emprestimo.devolucao = quando
+        pos = bisect.bisect_left(self.por_prevista, (emprestimo.prevista, id_livro))
+        if pos < len(self.por_prevista) and self.por_prevista[pos] == (emprestimo.prevista, id_livro):
+            del self.por_prevista[pos]
+        return emprestimo
+
+    def __aplicar(self, evento):
+        id_livro = evento["id"]
+        if evento["op"] == "retirada":
+            retirada = datetime.fromisoformat(evento["retirada"])
+            # retirada sem devolução registrada (queda no meio): fecha a anterior
+            self.__fechar(id_livro, retirada)
+            emprestimo = Emprestimo(id_livro, evento.get("leitor", ""), retirada,
+                                    datetime.fromisoformat(evento["prevista"]))
+            self.por_livro.setdefault(id_livro, []).append(emprestimo)
+            self.ativos[id_livro] = emprestimo
+            bisect.insort(self.por_prevista, (emprestimo.prevista, id_livro))
+            return emprestimo
+        return self.__fechar(id_livro, datetime.fromisoformat(evento["devolucao"]))
+
+    def __gravar(self, eventos):
+        # vários eventos numa escrita só (um lote de empréstimos/devoluções).
+        # O arquivo vem antes da memória: se a escrita falha, nada muda
+        if self.arquivo is not None and eventos:
+            with open(self.arquivo, "ab") as f:
+                f.write("".join(json.dumps(evento, ensure_ascii=False, separators=(",", ":")) + "\n"
+                                for evento in eventos).encode("utf-8"))
+                self.posicao = f.tell()
+        return [self.__aplicar(evento) for evento in eventos]
+
+    def atualizar(self):
+        # aplica as linhas que ainda não foram lidas: o arquivo inteiro na
+        # carga, ou o que outro processo anexou no catálogo compartilhado
+        if self.arquivo is None:
+            return
+        try:
+            f = open(self.arquivo, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self.posicao)
+            resto = f.read()
+        # uma linha sem "\n" ainda está sendo escrita (ou foi cortada)
+        fim = resto.rfind(b"\n") + 1
+        self.posicao += fim
+        for linha in resto[:fim].splitlines():
+            try:
+                self.__aplicar(json.loads(linha))
+            except (ValueError, KeyError, TypeError):
+                continue  # linha ilegível não derruba o histórico inteiro
+
+    def retirar(self, id_livro, leitor="", dias=PRAZO_DIAS, agora=None):
+        return self.retirar_varios([id_livro], leitor, dias, agora)[0]
+
+    def retirar_varios(self, ids, leitor="", dias=PRAZO_DIAS, agora=None):
+        validar_prazo(dias)
+        agora = (agora or datetime.now()).replace(microsecond=0)
+        retirada, prevista = data_iso(agora), data_iso(agora + timedelta(days=dias))
+        return self.__gravar([{"op": "retirada", "id": id_livro, "leitor": leitor,
+                               "retirada": retirada, "prevista": prevista} for id_livro in ids])
+
+    def devolver(self, id_livro, agora=None):
+        devolvidos = self.devolver_varios([id_livro], agora)
+        return devolvidos[0] if devolvidos else None
+
+    def devolver_varios(self, ids, agora=None):
+        # só os que estão em aberto
+        devolucao = data_iso((agora or datetime.now()).replace(microsecond=0))
+        return self.__gravar([{"op": "devolucao", "id": id_livro, "devolucao": devolucao}
+                              for id_livro in ids if id_livro in self.ativos])
+
+    # Consultas
+    def maior_id(self):
+        # maior id de livro que já passou pelo histórico (0 se nenhum)
+        return max(self.por_livro, default=0)
+
+    def ativo(self, id_livro):
+        return self.ativos.get(id_livro)
+
+    def do_livro(self, id_livro):
+        return list(self.por_livro.get(id_livro, ()))
+
+    def atrasados(self, agora=None):
+        # ativos com data prevista antes de agora, do mais atrasado ao menos
+        fim = bisect.bisect_left(self.por_prevista, (agora or datetime.now(),))
+        return [self.ativos[id] for _, id in self.por_prevista[:fim]]
+
+    def vencendo(self, dias, agora=None):
+        # ativos que vencem entre agora e daqui a `dias` dias
+        agora = agora or datetime.now()
+        inicio = bisect.bisect_left(self.por_prevista, (agora,))
+        fim = bisect.bisect_left(self.por_prevista, (agora + timedelta(days=dias),))
+        return [self.ativos[id] for _, id in self.por_prevista[inicio:fim]]
@@ -0,0 +1,109 @@
+import queue
+import threading
+
+from modelo import erro_no_terminal
+
+# ---------------- EXECUTOR ---------------- #
+# Tudo o que toca o disco (cadastrar, emprestar, devolver, remover) roda numa
+# thread de trabalho, uma tarefa por vez e na ordem em que foram pedidas. O
+# Tk não pode ser usado fora da thread principal, então os resultados voltam
+# por uma fila que a interface esvazia com root.after: o clique nunca espera
+# o disco, por mais lento que ele seja.
+
+
+class Executor:
+    def __init__(self, root, intervalo=50, ao_erro=erro_no_terminal):
+        self.root = root
+        self.intervalo = intervalo  # ms entre verificações da fila de respostas
+        self.ao_erro = ao_erro      # usado quando a tarefa falha sem ao_falhar próprio
+        self.ao_mudar = None        # (pendentes) -> None, chamado na thread do Tk
+        self.__tarefas = queue.Queue()
+        self.__respostas = queue.Queue()
+        self.__pendentes = 0  # só mexido na thread do Tk
+        self.__agendado = None
+        self.__encerrado = False
+        # thread não-daemon: ao sair, as alterações já pedidas terminam de ser gravadas
+        self.__thread = threading.Thread(target=self.__trabalhar, name="executor-biblioteca")
+        self.__thread.start()
+        self.__verificar()
+
+    def enviar(self, funcao, *args, ao_concluir=None, ao_falhar=None, contar=True):
+        # ao_concluir(resultado) e ao_falhar(erro) são chamados na thread do Tk;
+        # contar=False para tarefas de rotina, que não aparecem em pendentes()
+        if contar:
+            self.__pendentes += 1
+            self.__avisar()
+        self.__tarefas.put((funcao, args, ao_concluir, ao_falhar, contar))
+
+    def pendentes(self):
+        return self.__pendentes
+
+    def na_interface(self, funcao):
+        # embrulha funcao para poder ser chamada de qualquer thread: fora da
+        # principal, a chamada vai para a fila e acontece no loop do Tk
+        def chamar(*args):
+            if threading.current_thread() is threading.main_thread():
+                funcao(*args)
+            else:
+                self.__respostas.put((funcao, args))
+        return chamar
+
+    def encerrar(self):
+        # espera as tarefas já enviadas; as respostas delas são descartadas.
+        # Pode ser chamado de novo e de dentro de um ao_concluir
+        if self.__encerrado:
+            return
+        self.__encerrado = True
+        self.__tarefas.put(None)
+        self.__thread.join()
+        if self.__agendado is not None:
+            try:
+                self.root.after_cancel(self.__agendado)
+            except Exception:
+                pass  # a janela já foi destruída
+            self.__agendado = None
+
+    def __trabalhar(self):
+        while True:
+            tarefa = self.__tarefas.get()
+            if tarefa is None:
+                return
+            funcao, args, ao_concluir, ao_falhar, contar = tarefa
+            try:
+                resultado = funcao(*args)
+            except Exception as e:
+                self.__respostas.put((self.__falhou, (ao_falhar, e, contar)))
+            else:
+                self.__respostas.put((self.__concluiu, (ao_concluir, resultado, contar)))
+
+    def __avisar(self):
+        if self.ao_mudar is not None:
+            self.ao_mudar(self.__pendentes)
+
+    def __concluiu(self, ao_concluir, resultado, contar):
+        if contar:
+            self.__pendentes -= 1
+            self.__avisar()
+        if ao_concluir is not None:
+            ao_concluir(resultado)
+
+    def __falhou(self, ao_falhar, erro, contar):
+        if contar:
+            self.__pendentes -= 1
+            self.__avisar()
+        if ao_falhar is not None:
+            ao_falhar(erro)
+        else:
+            self.ao_erro("Erro", str(erro))
+
+    def __verificar(self):
+        try:
+            while True:
+                try:
+                    funcao, args = self.__respostas.get_nowait()
+                except queue.Empty:
+                    break
+                funcao(*args)
+        finally:
+            if not self.__encerrado:
+                self.__agendado = self.root.after(self.intervalo, self.__verificar)
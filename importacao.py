@@ -0,0 +1,306 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from busca import sem_acentos, tokenizar
+from indices import normalizar
+
+# ---------------- IMPORTAÇÃO / EXPORTAÇÃO ---------------- #
+# Catálogos de parceiros chegam em CSV ou JSON Lines (um livro por linha) com
+# centenas de milhares de linhas. O arquivo é lido linha a linha, cada linha é
+# validada aqui e a Biblioteca insere em lotes, com uma gravação só no fim.
+# A exportação faz o caminho inverso, página por página.
+#
+# Com processos > 1 a leitura, a validação e a normalização rodam em vários
+# processos: o arquivo é dividido em faixas de bytes (cada linha pertence à
+# faixa onde começa), cada processo devolve só tuplas compactas dos livros
+# válidos, já normalizados e sem repetidos dentro da faixa, e as faixas são
+# juntadas na ordem do arquivo. O resultado é o mesmo da importação serial.
+# Nos dois caminhos a Biblioteca recebe os textos prontos, as chaves dos
+# índices e as palavras da busca (normalizar_item): sob a trava só resta
+# conferir duplicados e inserir.
+
+FORMATOS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+COLUNAS = ("titulo", "autor", "tipo", "disponivel")
+TIPOS = {"livro": "Livro", "fisico": "Físico", "digital": "Digital"}
+SIM = {"", "1", "true", "sim", "s", "yes", "disponivel"}
+NAO = {"0", "false", "nao", "n", "no", "emprestado"}
+
+
+def formato_do_arquivo(arquivo):
+    formato = FORMATOS.get(os.path.splitext(arquivo)[1].lower())
+    if formato is None:
+        raise ValueError(f"'{arquivo}': use .csv, .jsonl ou .ndjson")
+    return formato
+
+
+def simplificar(texto):
+    # "Título " -> "titulo", "Físico" -> "fisico"
+    return sem_acentos(str(texto).strip()).casefold()
+
+
+def validar_item(item):
+    # devolve o dict no formato do biblioteca.json ou ValueError com o motivo;
+    # espaços e maiúsculas ficam por conta de normalizar_item
+    if not isinstance(item, dict):
+        raise ValueError("a linha não é um objeto JSON válido")
+    titulo, autor = item.get("titulo"), item.get("autor")
+    if not isinstance(titulo, str) or not titulo.strip():
+        raise ValueError("título vazio")
+    if not isinstance(autor, str) or not autor.strip():
+        raise ValueError("autor vazio")
+    tipo = TIPOS.get(simplificar(item.get("tipo") or "Livro"))
+    if tipo is None:
+        raise ValueError(f"tipo desconhecido: {item.get('tipo')!r}")
+    disponivel = item.get("disponivel", True)
+    if not isinstance(disponivel, bool):
+        valor = simplificar(disponivel if disponivel is not None else "")
+        if valor in SIM:
+            disponivel = True
+        elif valor in NAO:
+            disponivel = False
+        else:
+            raise ValueError(f"disponível inválido: {item.get('disponivel')!r}")
+    return {"titulo": titulo, "autor": autor, "disponivel": disponivel, "tipo": tipo}
+
+
+def normalizar_item(item):
+    # dict validado -> tupla que Biblioteca.importar aceita: (titulo, autor,
+    # tipo, disponivel, titulo normalizado, autor normalizado, palavras). Os
+    # textos saem como o Livro os guarda (strip().title()); as chaves, como
+    # os índices as calculam; as palavras, como a busca as tokeniza
+    titulo, autor = item["titulo"].strip().title(), item["autor"].strip().title()
+    palavras = tuple({*tokenizar(titulo), *tokenizar(autor)})
+    return titulo, autor, item["tipo"], item["disponivel"], normalizar(titulo), normalizar(autor), palavras
+
+
+def detectar_colunas(cabecalho):
+    # planilhas em português costumam separar com ";"
+    delimitador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+    colunas = [simplificar(c) for c in next(csv.reader([cabecalho], delimiter=delimitador), [])]
+    return delimitador, colunas
+
+
+class LeitorCatalogo:
+    # gera (número da linha, item) de um CSV ou JSONL, sem ler o arquivo
+    # inteiro; item é None quando a linha do JSONL não é um JSON válido.
+    # progresso(bytes lidos, bytes do arquivo), como no LeitorJSON
+    def __init__(self, arquivo, progresso=None, formato=None):
+        self.arquivo = arquivo
+        self.progresso = progresso
+        self.formato = formato or formato_do_arquivo(arquivo)
+
+    def __linhas(self, f, total):
+        lidos = 0
+        for n, bruta in enumerate(f, 1):
+            lidos += len(bruta)
+            try:
+                linha = bruta.decode("utf-8-sig" if n == 1 else "utf-8")
+            except UnicodeDecodeError:
+                raise ValueError(f"'{self.arquivo}', linha {n}: o arquivo precisa estar em UTF-8")
+            if self.progresso is not None and n % 10000 == 0:
+                self.progresso(lidos, total)
+            yield linha
+        if self.progresso is not None:
+            self.progresso(total, total)
+
+    def __iter__(self):
+        total = os.path.getsize(self.arquivo)
+        with open(self.arquivo, "rb") as f:
+            linhas = self.__linhas(f, total)
+            if self.formato == "jsonl":
+                for n, linha in enumerate(linhas, 1):
+                    if not linha.strip():
+                        continue
+                    try:
+                        yield n, json.loads(linha)
+                    except ValueError:
+                        yield n, None
+                return
+            delimitador, colunas = detectar_colunas(next(linhas, ""))
+            leitor = csv.reader(linhas, delimiter=delimitador)
+            for campos in leitor:
+                if any(campos):
+                    yield leitor.line_num + 1, dict(zip(colunas, campos))
+
+
+# ---------------- IMPORTAÇÃO EM PARALELO ---------------- #
+class LinhaQuebradaCSV(Exception):
+    # registro CSV com quebra de linha dentro de aspas: as faixas de bytes não
+    # servem, a importação volta para a leitura serial
+    pass
+
+
+def linhas_da_faixa(f, inicio, fim):
+    # linhas (bytes) que começam em [inicio, fim)
+    if inicio > 0:
+        f.seek(inicio - 1)
+        f.readline()  # termina a linha que começou na faixa anterior
+    else:
+        f.seek(0)
+    while f.tell() < fim:
+        bruta = f.readline()
+        if not bruta:
+            return
+        yield bruta
+
+
+def processar_faixa(arquivo, formato, inicio, fim, delimitador=None, colunas=None):
+    # roda em outro processo. Devolve (linhas lidas, [(linha, item de
+    # normalizar_item)], [(linha, motivo)]), com as linhas contadas a partir
+    # do começo da faixa
+    validos, recusados, vistos = [], [], set()
+    lidas = 0
+
+    def aceitar(n, item):
+        try:
+            item = validar_item(item)
+        except ValueError as e:
+            recusados.append((n, str(e)))
+            return
+        item = normalizar_item(item)
+        _, _, tipo, _, titulo, autor, _ = item
+        chave = (titulo, autor, tipo)
+        if chave in vistos:
+            recusados.append((n, "livro já cadastrado"))
+            return
+        vistos.add(chave)
+        validos.append((n, item))
+
+    with open(arquivo, "rb") as f:
+        textos = []
+        for bruta in linhas_da_faixa(f, inicio, fim):
+            lidas += 1
+            try:
+                textos.append(bruta.decode("utf-8-sig" if inicio == 0 and lidas == 1 else "utf-8"))
+            except UnicodeDecodeError:
+                raise ValueError(f"'{arquivo}': o arquivo precisa estar em UTF-8 (perto do byte {inicio})")
+    if formato == "jsonl":
+        for n, linha in enumerate(textos, 1):
+            if linha.strip():
+                try:
+                    item = json.loads(linha)
+                except ValueError:
+                    item = None
+                aceitar(n, item)
+    else:
+        for n, campos in enumerate(csv.reader(textos, delimiter=delimitador), 1):
+            if any(campos):
+                aceitar(n, dict(zip(colunas, campos)))
+        if any(linha.count('"') % 2 for linha in textos):
+            raise LinhaQuebradaCSV()
+    return lidas, validos, recusados
+
+
+def faixas(inicio, fim, quantidade):
+    passo = max(1, -(-(fim - inicio) // quantidade))
+    return [(a, min(a + passo, fim)) for a in range(inicio, fim, passo)]
+
+
+def ler_em_paralelo(arquivo, processos, progresso=None, formato=None):
+    # devolve ([(linha, item de normalizar_item)], [(linha, motivo)]) na ordem do arquivo
+    formato = formato or formato_do_arquivo(arquivo)
+    total = os.path.getsize(arquivo)
+    inicio, extras, linhas_antes = 0, (), 0
+    if formato == "csv":
+        with open(arquivo, "rb") as f:
+            cabecalho = f.readline()
+        inicio, linhas_antes = len(cabecalho), 1
+        extras = detectar_colunas(cabecalho.decode("utf-8-sig", errors="replace"))
+    # mais faixas que processos: uma faixa lenta não segura as outras paradas
+    partes = faixas(inicio, total, processos * 4)
+    with ProcessPoolExecutor(processos) as pool:
+        futuros = [pool.submit(processar_faixa, arquivo, formato, a, b, *extras) for a, b in partes]
+        resultados = []
+        for (a, b), futuro in zip(partes, futuros):
+            resultados.append(futuro.result())
+            if progresso is not None:
+                progresso(b, total)
+    validos, recusados = [], []
+    for lidas, aceitos, recusas in resultados:
+        validos.extend((linhas_antes + n, item) for n, item in aceitos)
+        recusados.extend((linhas_antes + n, motivo) for n, motivo in recusas)
+        linhas_antes += lidas
+    return validos, recusados
+
+
+def importar_arquivo(biblioteca, arquivo, progresso=None, formato=None, processos=1):
+    # devolve (importados, [(linha, motivo) das linhas recusadas]).
+    # processos > 1 lê e valida o arquivo em paralelo (ver acima)
+    recusados = []
+
+    def validos():
+        for linha, item in LeitorCatalogo(arquivo, progresso, formato):
+            try:
+                yield linha, normalizar_item(validar_item(item))
+            except ValueError as e:
+                recusados.append((linha, str(e)))
+
+    itens = None
+    if processos > 1:
+        try:
+            itens, recusados = ler_em_paralelo(arquivo, processos, progresso, formato)
+        except LinhaQuebradaCSV:
+            recusados = []
+    importados, duplicados = biblioteca.importar(itens if itens is not None else validos())
+    recusados.extend(duplicados)
+    recusados.sort()
+    return importados, recusados
+
+
+def exportar_arquivo(biblioteca, arquivo, progresso=None, formato=None, tamanho_lote=10000):
+    # grava num temporário e troca no fim: um arquivo pela metade nunca fica no lugar
+    formato = formato or formato_do_arquivo(arquivo)
+    total = biblioteca.total_livros()
+    temporario = arquivo + ".tmp"
+    exportados = 0
+    try:
+        with open(temporario, "w", encoding="utf-8", newline="") as f:
+            escritor = csv.writer(f) if formato == "csv" else None
+            if escritor is not None:
+                escritor.writerow(COLUNAS)
+            for inicio in range(0, total, tamanho_lote):
+                for livro in biblioteca.pagina(inicio, inicio + tamanho_lote):
+                    if escritor is not None:
+                        escritor.writerow((livro.get_titulo(), livro.get_autor(), livro.get_tipo(),
+                                           "sim" if livro.is_disponivel() else "não"))
+                    else:
+                        f.write(json.dumps(livro.to_dict(), ensure_ascii=False) + "\n")
+                    exportados += 1
+                if progresso is not None:
+                    progresso(min(inicio + tamanho_lote, total), total)
+        os.replace(temporario, arquivo)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    return exportados
+
+
+if __name__ == "__main__":
+    from modelo import Biblioteca
+
+    parser = argparse.ArgumentParser(description="Importa ou exporta o catálogo em CSV / JSON Lines")
+    parser.add_argument("acao", choices=("importar", "exportar"))
+    parser.add_argument("arquivo", help="ex.: parceiro.csv, catalogo.jsonl")
+    parser.add_argument("--biblioteca", default="biblioteca.json", help="biblioteca.json, biblioteca.db ou biblioteca.bib")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="processos para ler e validar a importação (0: um por núcleo)")
+    args = parser.parse_args()
+    biblioteca = Biblioteca(args.biblioteca)
+    try:
+        if args.acao == "importar":
+            importados, recusados = importar_arquivo(biblioteca, args.arquivo,
+                                                     processos=args.processos or os.cpu_count() or 1)
+            for linha, motivo in recusados:
+                print(f"linha {linha}: {motivo}", file=sys.stderr)
+            print(f"{importados} livros importados, {len(recusados)} linhas recusadas")
+        else:
+            print(f"{exportar_arquivo(biblioteca, args.arquivo)} livros exportados para {args.arquivo}")
+    finally:
+        biblioteca.fechar()
@@ -0,0 +1,204 @@
+import bisect
+import heapq
+
+# ---------------- ÍNDICES ---------------- #
+# Índices secundários sobre os livros da Biblioteca (o índice primário é o
+# próprio dict {id: livro} da Biblioteca). Quase todo título (e muitos
+# autores) tem um livro só, então a chave aponta direto para o livro; só
+# quando ganha o segundo ela passa a um dict {id: livro}. Inserir e remover
+# custam O(1) e listar os k livros de uma chave custa O(k), sem varrer o
+# catálogo. Duplicados (mesmo título, autor e tipo) saem do grupo do título.
+#
+# As ordenações por coluna são listas ordenadas de (chave, id): a primeira
+# vez que uma coluna é pedida custa um sort; depois cada alteração entra ou
+# sai por busca binária, e trocar a ordem da lista não ordena nada de novo.
+#
+# As contagens das estatísticas saem dos próprios índices (len de cada grupo).
+# Os autores com mais livros ficam num heap de (-quantidade, autor): cada
+# inclusão/remoção empurra a contagem nova em O(log n) e as entradas velhas
+# são descartadas quando aparecem no topo.
+
+
+def normalizar(texto):
+    # mesma normalização do Livro (strip) + espaços internos e maiúsculas
+    return " ".join(texto.split()).casefold()
+
+
+class IndiceLivros:
+    def __init__(self):
+        self.por_titulo = {}  # título normalizado -> livro ou {id: livro}
+        self.por_autor = {}   # autor normalizado -> livro ou {id: livro}
+        self.emprestados = {}
+        self.por_tipo = {}   # tipo -> {id: livro}, na ordem de cadastro
+        self.ordenacoes = {}  # coluna -> [(chave, id)] ordenada; só as já pedidas
+        self.heap_autores = []  # (-livros do autor, autor normalizado), com entradas velhas
+
+    @staticmethod
+    def chave_ordem(coluna, livro):
+        if coluna == "titulo":
+            return normalizar(livro.get_titulo())
+        if coluna == "autor":
+            return normalizar(livro.get_autor())
+        if coluna == "disponivel":
+            return livro.is_disponivel()
+        if coluna == "tipo":
+            return livro.get_tipo()
+        raise ValueError(f"coluna desconhecida: {coluna!r}")
+
+    @staticmethod
+    def chave(titulo, autor, tipo):
+        return (normalizar(titulo), normalizar(autor), tipo)
+
+    @staticmethod
+    def __incluir(indice, chave, livro):
+        grupo = indice.get(chave)
+        if grupo is None or (not isinstance(grupo, dict) and grupo.get_id() == livro.get_id()):
+            indice[chave] = livro
+        elif isinstance(grupo, dict):
+            grupo[livro.get_id()] = livro
+        else:
+            indice[chave] = {grupo.get_id(): grupo, livro.get_id(): livro}
+
+    @staticmethod
+    def __excluir(indice, chave, livro):
+        grupo = indice.get(chave)
+        if grupo is None:
+            return
+        if not isinstance(grupo, dict):
+            if grupo.get_id() == livro.get_id():
+                del indice[chave]
+            return
+        grupo.pop(livro.get_id(), None)
+        if len(grupo) == 1:
+            indice[chave] = next(iter(grupo.values()))
+        elif not grupo:
+            del indice[chave]
+
+    @staticmethod
+    def livros_do_grupo(grupo):
+        # lista dos livros de uma entrada de por_titulo/por_autor (ou None)
+        if grupo is None:
+            return []
+        return list(grupo.values()) if isinstance(grupo, dict) else [grupo]
+
+    @staticmethod
+    def tamanho_do_grupo(grupo):
+        if grupo is None:
+            return 0
+        return len(grupo) if isinstance(grupo, dict) else 1
+
+    def adicionar(self, livro, chaves=None):
+        # cada texto é normalizado uma vez só e reaproveitado na chave;
+        # chaves: (título, autor) já normalizados por quem chama (importação)
+        titulo, autor = chaves or (normalizar(livro.get_titulo()), normalizar(livro.get_autor()))
+        self.__incluir(self.por_titulo, titulo, livro)
+        self.__incluir(self.por_autor, autor, livro)
+        self.por_tipo.setdefault(livro.get_tipo(), {})[livro.get_id()] = livro
+        self.__contar_autor(autor)
+        if livro.is_disponivel():
+            self.emprestados.pop(livro.get_id(), None)
+        else:
+            self.emprestados[livro.get_id()] = livro
+        if self.ordenacoes:
+            chaves = {"titulo": titulo, "autor": autor}
+            for coluna, ordenada in self.ordenacoes.items():
+                chave = chaves[coluna] if coluna in chaves else self.chave_ordem(coluna, livro)
+                bisect.insort(ordenada, (chave, livro.get_id()))
+
+    def remover(self, livro):
+        titulo, autor = normalizar(livro.get_titulo()), normalizar(livro.get_autor())
+        self.__excluir(self.por_titulo, titulo, livro)
+        self.__excluir(self.por_autor, autor, livro)
+        do_tipo = self.por_tipo.get(livro.get_tipo())
+        if do_tipo is not None:
+            do_tipo.pop(livro.get_id(), None)
+            if not do_tipo:
+                del self.por_tipo[livro.get_tipo()]
+        self.__contar_autor(autor)
+        # o status pode ter mudado sem passar por aqui: vale o que o índice sabe
+        disponivel = self.emprestados.pop(livro.get_id(), None) is None
+        chaves = {"titulo": titulo, "autor": autor, "disponivel": disponivel}
+        for coluna, ordenada in self.ordenacoes.items():
+            chave = chaves[coluna] if coluna in chaves else self.chave_ordem(coluna, livro)
+            self.__tirar(ordenada, (chave, livro.get_id()))
+
+    def atualizar_status(self, livro):
+        estava_disponivel = livro.get_id() not in self.emprestados
+        if livro.is_disponivel():
+            self.emprestados.pop(livro.get_id(), None)
+        else:
+            self.emprestados[livro.get_id()] = livro
+        ordenada = self.ordenacoes.get("disponivel")
+        if ordenada is not None and estava_disponivel != livro.is_disponivel():
+            self.__tirar(ordenada, (estava_disponivel, livro.get_id()))
+            bisect.insort(ordenada, (livro.is_disponivel(), livro.get_id()))
+
+    def __contar_autor(self, autor):
+        quantidade = self.tamanho_do_grupo(self.por_autor.get(autor))
+        if quantidade:
+            heapq.heappush(self.heap_autores, (-quantidade, autor))
+        # entradas velhas demais: refaz o heap só com as contagens atuais
+        if len(self.heap_autores) > 2 * len(self.por_autor) + 64:
+            self.heap_autores = [(-self.tamanho_do_grupo(grupo), autor) for autor, grupo in self.por_autor.items()]
+            heapq.heapify(self.heap_autores)
+
+    @staticmethod
+    def __tirar(ordenada, item):
+        pos = bisect.bisect_left(ordenada, item)
+        if pos < len(ordenada) and ordenada[pos] == item:
+            del ordenada[pos]
+
+    def limpar(self):
+        self.por_titulo.clear()
+        self.por_autor.clear()
+        self.emprestados.clear()
+        self.por_tipo.clear()
+        self.ordenacoes.clear()
+        self.heap_autores = []
+
+    def descartar_ordenacoes(self):
+        # antes de muitas inclusões de uma vez: um sort no próximo pedido sai
+        # mais barato que uma inserção ordenada por livro
+        self.ordenacoes.clear()
+
+    # Consultas
+    def buscar_titulo(self, titulo):
+        return self.livros_do_grupo(self.por_titulo.get(normalizar(titulo)))
+
+    def livros_do_autor(self, autor):
+        return self.livros_do_grupo(self.por_autor.get(normalizar(autor)))
+
+    def duplicado(self, titulo, autor, tipo, normalizados=False):
+        # os livros de um mesmo título são poucos: compara o autor só neles.
+        # normalizados: titulo e autor já passaram por normalizar()
+        if not normalizados:
+            titulo, autor = normalizar(titulo), normalizar(autor)
+        return any(livro.get_tipo() == tipo and normalizar(livro.get_autor()) == autor
+                   for livro in self.livros_do_grupo(self.por_titulo.get(titulo)))
+
+    def get_emprestados(self):
+        return list(self.emprestados.values())
+
+    def top_autores(self, k):
+        # [(autor como cadastrado, quantidade)] dos k autores com mais livros;
+        # empate sai em ordem alfabética
+        topo, vistos = [], set()
+        while self.heap_autores and len(topo) < k:
+            item = heapq.heappop(self.heap_autores)
+            quantidade, autor = -item[0], item[1]
+            if autor in vistos or self.tamanho_do_grupo(self.por_autor.get(autor)) != quantidade:
+                continue  # contagem velha ou repetida
+            vistos.add(autor)
+            topo.append(item)
+        for item in topo:
+            heapq.heappush(self.heap_autores, item)
+        return [(self.livros_do_grupo(self.por_autor[autor])[0].get_autor(), -negativo) for negativo, autor in topo]
+
+    def ordenacao(self, coluna, livros):
+        # [(chave, id)] de todos os livros pela coluna; livros ({id: livro})
+        # só é percorrido na primeira vez que a coluna é pedida
+        ordenada = self.ordenacoes.get(coluna)
+        if ordenada is None:
+            ordenada = sorted((self.chave_ordem(coluna, livro), id) for id, livro in livros.items())
+            self.ordenacoes[coluna] = ordenada
+        return ordenada
@@ -0,0 +1,148 @@
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# ---------------- INSTRUMENTAÇÃO ---------------- #
+# Contagens e tempos dos caminhos quentes, para quando "está lento no balcão".
+# Desligada por padrão: só ligar() troca os métodos da Biblioteca e do Livro
+# por versões cronometradas, e cronometrar() devolve a própria função enquanto
+# estiver desligada; sem pedir, nada é embrulhado e o custo é zero.
+# Liga com BIBLIOTECA_PERFIL=perfil.json ou --perfil [perfil.json]; as medidas
+# vão para esse arquivo ao sair.
+
+# limites das faixas do histograma, em ms; a última faixa é "acima de 5 s"
+LIMITES_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+ARQUIVO_PADRAO = "perfil-biblioteca.json"
+
+# o que é medido quando ligada: persistência e alterações da Biblioteca e as
+# mudanças de estado do Livro (as subclasses herdam)
+METODOS = {
+    "Biblioteca": ("carregar_dados", "salvar_dados", "flush", "compactar", "sincronizar", "importar",
+                   "fechar", "adicionar_livro", "remover_livro", "emprestar", "devolver",
+                   "emprestar_varios", "devolver_varios"),
+    "Livro": ("emprestar", "devolver", "set_disponivel"),
+}
+
+
+class Medida:
+    __slots__ = ("chamadas", "total", "maximo", "faixas")
+
+    def __init__(self):
+        self.chamadas = 0
+        self.total = 0.0    # ms
+        self.maximo = 0.0   # ms
+        self.faixas = [0] * (len(LIMITES_MS) + 1)
+
+    def registrar(self, ms):
+        self.chamadas += 1
+        self.total += ms
+        self.maximo = max(self.maximo, ms)
+        self.faixas[bisect.bisect_left(LIMITES_MS, ms)] += 1
+
+    def percentil(self, p):
+        # limite superior da faixa onde cai o percentil (o máximo, na última)
+        alvo = p * self.chamadas
+        acumulado = 0
+        for i, n in enumerate(self.faixas):
+            acumulado += n
+            if n and acumulado >= alvo:
+                return round(min(LIMITES_MS[i], self.maximo) if i < len(LIMITES_MS) else self.maximo, 3)
+        return 0.0
+
+    def to_dict(self):
+        return {"chamadas": self.chamadas, "total_ms": round(self.total, 3),
+                "media_ms": round(self.total / self.chamadas, 3) if self.chamadas else 0.0,
+                "p50_ms": self.percentil(0.50), "p95_ms": self.percentil(0.95), "p99_ms": self.percentil(0.99),
+                "max_ms": round(self.maximo, 3),
+                "histograma": {f"<={limite}" if i < len(LIMITES_MS) else f">{LIMITES_MS[-1]}": n
+                               for i, (limite, n) in enumerate(zip(LIMITES_MS + (None,), self.faixas)) if n}}
+
+
+_ligada = False
+_medidas = {}
+_trava = threading.Lock()
+
+
+def ligada():
+    return _ligada
+
+
+def registrar(nome, segundos):
+    with _trava:
+        medida = _medidas.get(nome)
+        if medida is None:
+            medida = _medidas[nome] = Medida()
+        medida.registrar(segundos * 1000)
+
+
+def cronometrar(nome, funcao):
+    # desligada: a própria função, sem camada nenhuma
+    if not _ligada:
+        return funcao
+
+    @functools.wraps(funcao)
+    def cronometrada(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            registrar(nome, time.perf_counter() - inicio)
+    cronometrada.medida = nome
+    return cronometrada
+
+
+def instrumentar(classe, metodos, prefixo=None):
+    for metodo in metodos:
+        funcao = classe.__dict__.get(metodo)
+        if funcao is not None and not hasattr(funcao, "medida"):
+            setattr(classe, metodo, cronometrar(f"{prefixo or classe.__name__}.{metodo}", funcao))
+
+
+def ligar(arquivo=None):
+    # arquivo: onde gravar as medidas ao sair (None: só na janela de diagnóstico)
+    global _ligada
+    import modelo
+
+    _ligada = True
+    for nome, metodos in METODOS.items():
+        instrumentar(getattr(modelo, nome), metodos)
+    if arquivo:
+        atexit.register(gravar, arquivo)
+
+
+def ligar_se_pedido(argv):
+    # --perfil [arquivo] na linha de comando ou BIBLIOTECA_PERFIL no ambiente;
+    # devolve o arquivo das medidas, ou None se continua desligada
+    arquivo = os.environ.get("BIBLIOTECA_PERFIL") or None
+    if "--perfil" in argv:
+        posicao = argv.index("--perfil")
+        seguinte = argv[posicao + 1] if posicao + 1 < len(argv) else ""
+        arquivo = seguinte if seguinte and not seguinte.startswith("-") else arquivo or ARQUIVO_PADRAO
+    if arquivo == "1":
+        arquivo = ARQUIVO_PADRAO
+    if arquivo:
+        ligar(arquivo)
+    return arquivo
+
+
+def medidas():
+    # cópia de [(nome, dict)] em ordem de tempo total, para mostrar ou gravar
+    with _trava:
+        copia = [(nome, medida.to_dict()) for nome, medida in _medidas.items()]
+    return sorted(copia, key=lambda par: -par[1]["total_ms"])
+
+
+def zerar():
+    with _trava:
+        _medidas.clear()
+
+
+def gravar(arquivo):
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump({"data": datetime.now().isoformat(timespec="seconds"), "limites_ms": LIMITES_MS,
+                   "medidas": dict(medidas())}, f, ensure_ascii=False, indent=2)
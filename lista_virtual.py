@@ -0,0 +1,149 @@
+import tkinter as tk
+from tkinter import ttk
+
+# ---------------- LISTA VIRTUAL ---------------- #
+# Treeview que só cria as linhas visíveis (mais uma folga). As linhas vêm de
+# uma função pagina(inicio, fim) conforme a barra de rolagem anda, então o
+# custo de memória e de desenho não cresce com o tamanho do catálogo.
+# A seleção fica num conjunto de iids à parte: uma linha selecionada que sai
+# da tela é apagada do Treeview, mas continua selecionada e volta marcada.
+
+SHIFT, CONTROL = 0x1, 0x4  # bits de event.state
+
+
+class ListaVirtual(tk.Frame):
+    def __init__(self, master, colunas, total, pagina, valores, chave, folga=20, etiquetas=None,
+                 ao_ordenar=None, selectmode="browse", **kwargs):
+        super().__init__(master, **kwargs)
+        self.total = total        # () -> quantidade de linhas
+        self.pagina = pagina      # (inicio, fim) -> itens nessa faixa
+        self.valores = valores    # item -> tupla com os valores das colunas
+        self.chave = chave        # item -> iid da linha
+        self.etiquetas = etiquetas  # item -> tags da linha (cores), opcional
+        self.colunas = colunas
+        self.folga = folga
+        self.inicio = 0
+        self.visiveis = 20
+
+        self.tree = ttk.Treeview(self, columns=colunas, show="headings", selectmode=selectmode)
+        for c in colunas:
+            # ao_ordenar(coluna): clique no cabeçalho, opcional; quem chama
+            # refaz a lista e marca a coluna com marcar_ordem
+            comando = (lambda c=c: ao_ordenar(c)) if ao_ordenar is not None else ""
+            self.tree.heading(c, text=c, command=comando)
+            self.tree.column(c, anchor="w")
+        self.barra = ttk.Scrollbar(self, orient="vertical", command=self.__rolar)
+        self.barra.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        # a rolagem interna do Treeview (roda do mouse, setas) desloca a janela
+        self.tree.configure(yscrollcommand=self.__tree_rolou)
+        self.tree.bind("<Configure>", self.__redimensionou)
+        # iids selecionados, inclusive os das linhas que já não estão criadas
+        self.selecionados = set()
+        self.__substituir = False
+        self.tree.bind("<<TreeviewSelect>>", self.__selecao_mudou, add="+")
+        for sequencia in ("<ButtonPress-1>", "<KeyPress-Up>", "<KeyPress-Down>"):
+            self.tree.bind(sequencia, self.__nova_selecao, add="+")
+
+    def marcar_ordem(self, coluna=None, decrescente=False):
+        # seta no cabeçalho da coluna que ordena a lista
+        for c in self.colunas:
+            seta = (" ▼" if decrescente else " ▲") if c == coluna else ""
+            self.tree.heading(c, text=c + seta)
+
+    def __nova_selecao(self, event):
+        # clique numa linha ou seta sem Shift/Ctrl: o Tk troca a seleção
+        # inteira, e as linhas fora da tela também deixam de estar selecionadas
+        if event.type == tk.EventType.ButtonPress and self.tree.identify_region(event.x, event.y) not in ("cell", "tree"):
+            return
+        self.__substituir = not event.state & (SHIFT | CONTROL)
+
+    def __selecao_mudou(self, event=None):
+        # o Treeview só sabe das linhas criadas: as demais ficam como estavam
+        marcadas = set(self.tree.selection())
+        if self.__substituir:
+            self.selecionados = marcadas
+            self.__substituir = False
+        else:
+            self.selecionados = (self.selecionados - set(self.tree.get_children())) | marcadas
+
+    def limpar_selecao(self):
+        self.selecionados = set()
+        self.tree.selection_set([])
+
+    def __altura_linha(self):
+        try:
+            return int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except (tk.TclError, ValueError):
+            return 20
+
+    def __redimensionou(self, event):
+        visiveis = max(1, (event.height - 25) // self.__altura_linha())
+        if visiveis != self.visiveis:
+            self.visiveis = visiveis
+            self.atualizar()
+
+    def __opcoes(self, item):
+        opcoes = {"values": self.valores(item)}
+        if self.etiquetas is not None:
+            opcoes["tags"] = self.etiquetas(item)
+        return opcoes
+
+    def __limitar(self, inicio):
+        return max(0, min(inicio, self.total() - self.visiveis))
+
+    def __rolar(self, acao, valor, unidade=None):
+        total = self.total()
+        if acao == "moveto":
+            inicio = int(float(valor) * total)
+        elif unidade == "pages":
+            inicio = self.inicio + int(valor) * self.visiveis
+        else:
+            inicio = self.inicio + int(valor)
+        self.ir_para(inicio)
+
+    def __tree_rolou(self, primeiro, ultimo):
+        # o Treeview rolou dentro das linhas criadas: traduz em deslocamento
+        criadas = len(self.tree.get_children())
+        deslocamento = int(round(float(primeiro) * criadas))
+        if deslocamento:
+            self.ir_para(self.inicio + deslocamento)
+
+    def ir_para(self, inicio):
+        inicio = self.__limitar(inicio)
+        if inicio != self.inicio:
+            self.inicio = inicio
+            self.atualizar()
+
+    def atualizar(self):
+        # sincroniza as linhas criadas com a faixa [inicio, inicio + visiveis + folga)
+        self.inicio = self.__limitar(self.inicio)
+        itens = self.pagina(self.inicio, self.inicio + self.visiveis + self.folga)
+        novos = [self.chave(item) for item in itens]
+        manter = set(novos)
+        for iid in self.tree.get_children():
+            if iid not in manter:
+                self.tree.delete(iid)
+        for pos, (iid, item) in enumerate(zip(novos, itens)):
+            if self.tree.exists(iid):
+                self.tree.item(iid, **self.__opcoes(item))
+                if self.tree.index(iid) != pos:
+                    self.tree.move(iid, "", pos)
+            else:
+                self.tree.insert("", pos, iid=iid, **self.__opcoes(item))
+        # as linhas recriadas voltam com a seleção que tinham
+        marcar = [iid for iid in novos if iid in self.selecionados]
+        if set(self.tree.selection()) != set(marcar):
+            self.tree.selection_set(marcar)
+        self.tree.yview_moveto(0)
+        total = self.total()
+        if total:
+            self.barra.set(self.inicio / total, min(1.0, (self.inicio + self.visiveis) / total))
+        else:
+            self.barra.set(0, 1)
+
+    def atualizar_item(self, item):
+        # só mexe na linha se ela estiver criada agora
+        iid = self.chave(item)
+        if self.tree.exists(iid):
+            self.tree.item(iid, **self.__opcoes(item))
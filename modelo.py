@@ -0,0 +1,776 @@
+import contextlib
+import itertools
+import sys
+import threading
+import time
+
+from armazenamento import abrir_armazenamento
+from busca import IndiceBusca, impressao_ids
+from emprestimos import PRAZO_DIAS, HistoricoEmprestimos, validar_prazo
+from indices import IndiceLivros
+from snapshot import GravadorSnapshot
+
+# Núcleo da biblioteca, sem interface gráfica: pode ser importado por scripts,
+# servidores, benchmarks e processos auxiliares. Importar não carrega nada;
+# o catálogo só é lido quando uma Biblioteca é criada.
+
+
+def erro_no_terminal(titulo, mensagem):
+    # padrão sem interface; a GUI passa messagebox.showerror no lugar
+    print(f"{titulo}: {mensagem}", file=sys.stderr)
+
+
+# ---------------- CLASSES ---------------- 
+class Livro:
+    # sem __dict__ por instância: catálogos grandes têm milhões de livros
+    __slots__ = ("__titulo", "__autor", "__disponivel", "__id")
+
+    def __init__(self, titulo, autor, disponivel=True, id=None):
+        self.__titulo = titulo.strip().title()
+        # o mesmo autor se repete em muitos livros: guarda uma cópia só do texto
+        self.__autor = sys.intern(autor.strip().title())
+        self.__disponivel = disponivel
+        self.__id = id
+
+    @classmethod
+    def normalizado(cls, titulo, autor, disponivel=True, id=None):
+        # textos que já passaram pelo strip().title() (importação): entram como vieram
+        livro = cls.__new__(cls)
+        livro.__titulo = titulo
+        livro.__autor = sys.intern(autor)
+        livro.__disponivel = disponivel
+        livro.__id = id
+        return livro
+
+    # Encapsulamento
+    def get_id(self): return self.__id
+    def set_id(self, valor: int): self.__id = valor
+    def get_tipo(self): return "Livro"
+    def get_titulo(self): return self.__titulo
+    def get_autor(self): return self.__autor
+    def is_disponivel(self): return self.__disponivel
+    def set_disponivel(self, valor: bool): self.__disponivel = valor
+
+    # Ações
+    def emprestar(self):
+        if self.__disponivel:
+            self.__disponivel = False
+            return True, f"O livro '{self.__titulo}' foi emprestado com sucesso!"
+        return False, f"O livro '{self.__titulo}' já está emprestado."
+
+    def devolver(self):
+        if not self.__disponivel:
+            self.__disponivel = True
+            return True, f"O livro '{self.__titulo}' foi devolvido com sucesso!"
+        return False, f"O livro '{self.__titulo}' já estava disponível."
+
+
+    def to_dict(self):
+        return {
+            "titulo": self.__titulo,
+            "autor": self.__autor,
+            "disponivel": self.__disponivel,
+            "tipo": "Livro",
+            "id": self.__id
+        }
+
+    
+    def exibir_informacoes(self):
+        return (self.__titulo, self.__autor, "Sim" if self.__disponivel else "Não", "Livro")
+
+    def __str__(self):
+        status = "Disponível" if self.__disponivel else "Emprestado"
+        return f"{self.__titulo} - {self.__autor} ({status})"
+
+
+class LivroFisico(Livro):
+    __slots__ = ()
+
+    def get_tipo(self): return "Físico"
+    def to_dict(self):
+        data = super().to_dict()
+        data["tipo"] = "Físico"
+        return data
+    def exibir_informacoes(self):
+        titulo, autor, disponivel, _ = super().exibir_informacoes()
+        return (titulo, autor, disponivel, "Físico")
+
+
+class LivroDigital(Livro):
+    __slots__ = ()
+
+    def get_tipo(self): return "Digital"
+    def to_dict(self):
+        data = super().to_dict()
+        data["tipo"] = "Digital"
+        return data
+    def exibir_informacoes(self):
+        titulo, autor, disponivel, _ = super().exibir_informacoes()
+        return (titulo, autor, disponivel, "Digital")
+
+
+# classe de cada tipo gravado no biblioteca.json
+CLASSES = {"Livro": Livro, "Físico": LivroFisico, "Digital": LivroDigital}
+
+
+class Biblioteca:
+    def __init__(self, arquivo="biblioteca.json", armazenamento=None, gravar_em_segundo_plano=True,
+                 progresso=None, ao_erro=erro_no_terminal, carregar=True,
+                 atraso_gravacao=0, limite_gravacao=100, compartilhado=False, **opcoes):
+        self.__arquivo = arquivo
+        # ao_erro(titulo, mensagem): como avisar erros de disco sem travar a operação
+        self.__ao_erro = ao_erro
+        # JSON (com diário) ou SQLite, conforme a extensão do arquivo
+        if armazenamento is None:
+            armazenamento = abrir_armazenamento(arquivo, gravar_em_segundo_plano=gravar_em_segundo_plano,
+                                                compartilhado=compartilhado, **opcoes)
+        self.__armazenamento = armazenamento
+        # compartilhado: outras instâncias (outras máquinas) usam o mesmo arquivo;
+        # cada alteração é gravada na hora, com o arquivo travado
+        # livros por id: remover e achar um livro custa O(1), sem depender da posição
+        self.__livros = {}
+        # ids em ordem de cadastro para paginar a lista; refeita só depois de remoções
+        self.__ordem = []
+        # índices por título e autor, mantidos a cada alteração
+        self.__indice = IndiceLivros()
+        self.__proximo_id = 1
+        # busca por palavras (e prefixos) de título e autor, gravada em "<arquivo>.busca"
+        self.__busca = IndiceBusca()
+        self.__busca_pronta = False
+        # versão do índice que está no .busca (None: o arquivo está velho)
+        self.__busca_gravada = None
+        # funções avisadas a cada alteração: (evento, livro)
+        self.__ouvintes = []
+        self.__gravador_busca = GravadorSnapshot(arquivo + ".busca", 0, gravar_em_segundo_plano)
+        # quem levou cada livro, quando e até quando: "<arquivo>.historico"
+        self.__historico = HistoricoEmprestimos(arquivo + ".historico")
+        # as alterações podem vir da thread do executor enquanto a interface lê;
+        # a trava cobre só a memória, a gravação em disco fica fora dela
+        self.__trava = threading.RLock()
+        # alterações ainda não gravadas; vão para o disco em lote depois de
+        # atraso_gravacao segundos sem alterações ou quando juntar limite_gravacao
+        # (atraso_gravacao=0 grava cada alteração na hora)
+        self.__fila = []
+        self.__compartilhado = compartilhado
+        self.__atraso_gravacao = 0 if compartilhado else atraso_gravacao
+        self.__limite_gravacao = limite_gravacao
+        # gravação adiada: uma thread só, que dorme até o prazo (cada
+        # alteração empurra o prazo) e então chama flush()
+        self.__prazo_gravacao = None
+        self.__adiador = None
+        self.__condicao_prazo = threading.Condition()
+        self.__encerrando = False
+        # uma gravação falhou: a memória tem alterações que não chegaram ao
+        # disco; a próxima gravação salva o catálogo inteiro
+        self.__sujo = False
+        # uma gravação por vez, para o disco receber os lotes na ordem
+        self.__trava_gravacao = threading.RLock()
+        # carregar=False deixa a leitura para uma chamada explícita a carregar_dados()
+        if carregar:
+            self.carregar_dados(progresso)
+
+    def adicionar_livro(self, livro):
+        with self.__transacao():
+            with self.__trava:
+                if self.existe_livro(livro.get_titulo(), livro.get_autor(), livro.get_tipo()):
+                    return False
+                self.__incluir(livro)
+                self.__fila.append({"op": "adicionar", "livro": livro.to_dict()})
+        self.__notificar("adicionado", livro)
+        self.__gravar_se_preciso()
+        return True
+
+    def importar(self, itens, tamanho_lote=5000):
+        # itens: (referencia, (titulo, autor, tipo, disponivel, titulo
+        # normalizado, autor normalizado, palavras da busca)), já validados e
+        # normalizados fora da trava (importacao.normalizar_item, às vezes em
+        # outros processos). Entra em lotes (a interface lê entre um lote e
+        # outro), sem aviso por livro: um "importado" e uma gravação no fim.
+        # Devolve (importados, [(referencia, motivo) recusados])
+        with self.__transacao():
+            importados, recusados = 0, []
+            itens = iter(itens)
+            primeiro_lote = True
+            while True:
+                lote = list(itertools.islice(itens, tamanho_lote))
+                if not lote:
+                    break
+                novos = []
+                with self.__trava:
+                    if primeiro_lote:
+                        # as ordenações da lista são refeitas no próximo pedido
+                        self.__indice.descartar_ordenacoes()
+                        primeiro_lote = False
+                    for referencia, (titulo, autor, tipo, disponivel, *chaves, palavras) in lote:
+                        if self.__indice.duplicado(*chaves, tipo, normalizados=True):
+                            recusados.append((referencia, "livro já cadastrado"))
+                            continue
+                        livro = CLASSES[tipo].normalizado(titulo, autor, disponivel)
+                        self.__incluir(livro, indexar_busca=False, chaves=chaves)
+                        self.__fila.append({"op": "adicionar", "livro": livro.to_dict()})
+                        novos.append((livro.get_id(), palavras))
+                    if self.__busca_pronta:
+                        self.__busca.adicionar_palavras(novos)
+                importados += len(novos)
+            with self.__trava:
+                # as palavras novas de todos os lotes entram no vocabulário de uma vez
+                self.__busca.juntar_novas()
+            if importados:
+                self.__notificar("importado", None)
+            if importados and self.__armazenamento.salvar_tudo_compensa(importados):
+                # quem decide é o armazenamento: no JSON, um lote grande sai mais
+                # barato como snapshot novo do que como diário seguido da
+                # compactação; no SQLite e no .bib a fila vira uma transação ou
+                # um acréscimo, sem regravar o resto
+                self.salvar_dados()
+            else:
+                self.flush()
+        return importados, recusados
+
+    def remover_livro(self, id):
+        with self.__transacao():
+            with self.__trava:
+                livro = self.__livros.get(id)
+                if livro is not None:
+                    # um empréstimo em aberto termina com o livro: não fica
+                    # pendurado no histórico esperando outro livro com o mesmo id.
+                    # O histórico vai primeiro: se ele falha, o livro fica
+                    self.__historico.devolver(id)
+                    del self.__livros[id]
+                    self.__ordem = None
+                    self.__indice.remover(livro)
+                    self.__busca.remover(id, livro.get_titulo(), livro.get_autor())
+                    self.__fila.append({"op": "remover", "id": id})
+        if livro is not None:
+            self.__notificar("removido", livro)
+            self.__gravar_se_preciso()
+
+    def emprestar(self, id, leitor="", dias=PRAZO_DIAS):
+        # devolve (sucesso, mensagem). O empréstimo é gravado no histórico
+        # antes de o livro mudar: se a gravação falha, o livro continua
+        # disponível e nada entra na fila
+        try:
+            validar_prazo(dias)
+        except ValueError as e:
+            return False, f"Nenhum livro foi emprestado: {e}."
+        with self.__transacao():
+            with self.__trava:
+                livro = self.__livros.get(id)
+                if livro is None:
+                    return False, f"Livro {id} não encontrado."
+                emprestimo = self.__historico.retirar(id, leitor, dias) if livro.is_disponivel() else None
+                sucesso, msg = livro.emprestar()
+                if sucesso:
+                    self.__indice.atualizar_status(livro)
+                    self.__fila.append({"op": "disponivel", "id": id, "valor": False})
+                    msg += f" Devolver até {emprestimo.prevista:%d/%m/%Y}."
+        if sucesso:
+            self.__notificar("status", livro)
+            self.__gravar_se_preciso()
+        return sucesso, msg
+
+    def devolver(self, id):
+        with self.__transacao():
+            with self.__trava:
+                livro = self.__livros.get(id)
+                if livro is None:
+                    return False, f"Livro {id} não encontrado."
+                if not livro.is_disponivel():
+                    self.__historico.devolver(id)
+                sucesso, msg = livro.devolver()
+                if sucesso:
+                    self.__indice.atualizar_status(livro)
+                    self.__fila.append({"op": "disponivel", "id": id, "valor": True})
+        if sucesso:
+            self.__notificar("status", livro)
+            self.__gravar_se_preciso()
+        return sucesso, msg
+
+    def emprestar_varios(self, ids, leitor="", dias=PRAZO_DIAS):
+        return self.__mudar_varios(ids, False, leitor, dias)
+
+    def devolver_varios(self, ids):
+        return self.__mudar_varios(ids, True)
+
+    def __mudar_varios(self, ids, disponivel, leitor="", dias=PRAZO_DIAS):
+        # tudo ou nada: se algum livro não existe ou já está no estado pedido,
+        # nenhum muda. Uma linha no histórico, uma gravação e um aviso
+        # ("lote") para o lote inteiro. Devolve (sucesso, mensagem)
+        acao = "devolvido" if disponivel else "emprestado"
+        ids = list(dict.fromkeys(ids))
+        if not disponivel:
+            try:
+                validar_prazo(dias)
+            except ValueError as e:
+                return False, f"Nenhum livro foi {acao}: {e}."
+        with self.__transacao():
+            with self.__trava:
+                livros, problemas = [], []
+                for id in ids:
+                    livro = self.__livros.get(id)
+                    if livro is None:
+                        problemas.append(f"livro {id} não encontrado")
+                    elif livro.is_disponivel() == disponivel:
+                        problemas.append(f"'{livro.get_titulo()}' já está {'disponível' if disponivel else 'emprestado'}")
+                    else:
+                        livros.append(livro)
+                if problemas or not livros:
+                    motivo = "; ".join(problemas[:5]) + ("; ..." if len(problemas) > 5 else "")
+                    return False, f"Nenhum livro foi {acao}: {motivo or 'nenhum livro selecionado'}."
+                # o histórico vai primeiro, numa escrita só: se ela falha,
+                # nenhum livro mudou e nada entrou na fila
+                msg = f"{len(livros)} livro(s) {acao}(s)."
+                if disponivel:
+                    self.__historico.devolver_varios([l.get_id() for l in livros])
+                else:
+                    emprestimos = self.__historico.retirar_varios([l.get_id() for l in livros], leitor, dias)
+                    msg += f" Devolver até {emprestimos[0].prevista:%d/%m/%Y}."
+                for livro in livros:
+                    if disponivel:
+                        livro.devolver()
+                    else:
+                        livro.emprestar()
+                    self.__indice.atualizar_status(livro)
+                    self.__fila.append({"op": "disponivel", "id": livro.get_id(), "valor": disponivel})
+        self.__notificar("lote", livros)
+        self.flush()
+        return True, msg
+
+    # Notificações: "adicionado", "removido", "status" (emprestado/devolvido),
+    # "lote" (emprestar_varios/devolver_varios, livro = lista dos livros),
+    # "importado" (vários livros de uma vez, livro = None), "sincronizado"
+    # (alterações de outra instância do catálogo compartilhado, livro = None)
+    # e "recarregado" (catálogo inteiro lido de novo, livro = None). O aviso sai
+    # antes da gravação no disco (no catálogo compartilhado, depois), na thread
+    # que fez a alteração; "gravado"
+    # (livro = None) avisa que a fila de alterações chegou ao disco
+    def inscrever(self, ouvinte):
+        self.__ouvintes.append(ouvinte)
+
+    def desinscrever(self, ouvinte):
+        if ouvinte in self.__ouvintes:
+            self.__ouvintes.remove(ouvinte)
+
+    def __notificar(self, evento, livro):
+        for ouvinte in list(self.__ouvintes):
+            ouvinte(evento, livro)
+
+    def get_livros(self):
+        with self.__trava:
+            return list(self.__livros.values())
+
+    def total_livros(self):
+        return len(self.__livros)
+
+    def pagina(self, inicio, fim):
+        # livros das posições [inicio, fim) sem copiar o catálogo inteiro
+        with self.__trava:
+            if self.__ordem is None:
+                self.__ordem = list(self.__livros)
+            return [self.__livros[id] for id in self.__ordem[inicio:fim]]
+
+    def listar(self, ordem=None, decrescente=False, disponivel=None, tipo=None, livros=None):
+        # livros ordenados por uma coluna ("titulo", "autor", "disponivel",
+        # "tipo"; None = ordem de cadastro), só os disponíveis (disponivel=True)
+        # ou emprestados (False) e só de um tipo. livros restringe a uma lista
+        # (o resultado de buscar). Custa no máximo uma passada pelo catálogo:
+        # as ordenações ficam prontas no índice
+        with self.__trava:
+            emprestados = self.__indice.emprestados
+            do_tipo = self.__indice.por_tipo.get(tipo, {}) if tipo is not None else None
+
+            def passa(id):
+                return ((do_tipo is None or id in do_tipo)
+                        and (disponivel is None or (id not in emprestados) == disponivel))
+
+            if livros is not None:
+                # poucos livros: ordenar só eles sai mais barato que percorrer a ordenação
+                escolhidos = [l for l in livros if self.__livros.get(l.get_id()) is l and passa(l.get_id())]
+                if ordem is not None:
+                    escolhidos.sort(key=lambda l: (self.__indice.chave_ordem(ordem, l), l.get_id()))
+                if decrescente:
+                    escolhidos.reverse()
+                return escolhidos
+            if ordem is not None:
+                ordenada = self.__indice.ordenacao(ordem, self.__livros)
+                ids = (id for _, id in (reversed(ordenada) if decrescente else ordenada))
+            elif do_tipo is not None and disponivel is None:
+                # um tipo, em ordem de cadastro: o próprio índice do tipo
+                livros = list(do_tipo.values())
+                return livros[::-1] if decrescente else livros
+            else:
+                if self.__ordem is None:
+                    self.__ordem = list(self.__livros)
+                ids = reversed(self.__ordem) if decrescente else self.__ordem
+            if do_tipo is None and disponivel is None:
+                return [self.__livros[id] for id in ids]
+            return [self.__livros[id] for id in ids if passa(id)]
+
+    # Consultas pelos índices
+    def buscar_por_id(self, id):
+        return self.__livros.get(id)
+
+    def buscar_por_titulo(self, titulo):
+        with self.__trava:
+            return self.__indice.buscar_titulo(titulo)
+
+    def livros_do_autor(self, autor):
+        with self.__trava:
+            return self.__indice.livros_do_autor(autor)
+
+    def buscar(self, texto):
+        # livros com todas as palavras do texto, sem diferenciar acentos
+        with self.__trava:
+            return [self.__livros[id] for id in self.__busca.buscar(texto) if id in self.__livros]
+
+    # Empréstimos: só contam os de livros que continuam emprestados no catálogo
+    def emprestimo_ativo(self, id):
+        livro = self.__livros.get(id)
+        if livro is None or livro.is_disponivel():
+            return None
+        return self.__historico.ativo(id)
+
+    def historico_do_livro(self, id):
+        with self.__trava:
+            return self.__historico.do_livro(id)
+
+    def __com_livro(self, emprestimos):
+        pares = []
+        for emprestimo in emprestimos:
+            livro = self.__livros.get(emprestimo.id_livro)
+            if livro is not None and not livro.is_disponivel():
+                pares.append((livro, emprestimo))
+        return pares
+
+    def atrasados(self, agora=None):
+        # [(livro, emprestimo)] do mais atrasado ao menos
+        with self.__trava:
+            return self.__com_livro(self.__historico.atrasados(agora))
+
+    def vencendo(self, dias, agora=None):
+        # [(livro, emprestimo)] que vencem nos próximos `dias` dias
+        with self.__trava:
+            return self.__com_livro(self.__historico.vencendo(dias, agora))
+
+    def estatisticas(self, top=10):
+        # contagens mantidas a cada alteração: não percorre o catálogo
+        with self.__trava:
+            emprestados = len(self.__indice.emprestados)
+            return {"total": len(self.__livros),
+                    "disponiveis": len(self.__livros) - emprestados,
+                    "emprestados": emprestados,
+                    "atrasados": len(self.__com_livro(self.__historico.atrasados())),
+                    "por_tipo": {tipo: len(self.__indice.por_tipo.get(tipo, ())) for tipo in ("Livro", "Físico", "Digital")},
+                    "autores": len(self.__indice.por_autor),
+                    "top_autores": self.__indice.top_autores(top)}
+
+    def existe_livro(self, titulo, autor, tipo):
+        return self.__indice.duplicado(titulo, autor, tipo)
+
+    def get_emprestados(self):
+        with self.__trava:
+            return self.__indice.get_emprestados()
+
+    def __incluir(self, livro, indexar_busca=True, chaves=None):
+        # ids antigos são mantidos; livros sem id (ou com id repetido) ganham o próximo.
+        # chaves: (título, autor) já normalizados para os índices, se houver
+        id = livro.get_id()
+        if id is None or id in self.__livros:
+            id = self.__proximo_id
+            livro.set_id(id)
+        self.__proximo_id = max(self.__proximo_id, id + 1)
+        self.__livros[id] = livro
+        if self.__ordem is not None:
+            self.__ordem.append(id)
+        self.__indice.adicionar(livro, chaves)
+        if self.__busca_pronta and indexar_busca:
+            self.__busca.adicionar(id, livro.get_titulo(), livro.get_autor())
+
+    def __gravar_se_preciso(self):
+        if not self.__atraso_gravacao or len(self.__fila) >= self.__limite_gravacao:
+            self.flush()
+            return
+        # cada alteração adia a gravação: uma rajada vira uma escrita só
+        with self.__condicao_prazo:
+            sem_prazo = self.__prazo_gravacao is None
+            self.__prazo_gravacao = time.monotonic() + self.__atraso_gravacao
+            if self.__adiador is None:
+                self.__adiador = threading.Thread(target=self.__gravar_no_prazo, name="gravacao-adiada",
+                                                  daemon=True)
+                self.__adiador.start()
+            elif sem_prazo:
+                self.__condicao_prazo.notify()
+
+    def __gravar_no_prazo(self):
+        # thread da gravação adiada: espera o prazo (que pode ser empurrado
+        # enquanto ela dorme) e grava; sem prazo, dorme até a próxima alteração
+        while True:
+            with self.__condicao_prazo:
+                while not self.__encerrando:
+                    if self.__prazo_gravacao is None:
+                        self.__condicao_prazo.wait()
+                        continue
+                    restante = self.__prazo_gravacao - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self.__condicao_prazo.wait(restante)
+                if self.__encerrando:
+                    return
+                self.__prazo_gravacao = None
+            self.flush()
+
+    def __parar_adiador(self):
+        with self.__condicao_prazo:
+            self.__encerrando = True
+            self.__condicao_prazo.notify()
+            adiador = self.__adiador
+        if adiador is not None and adiador is not threading.current_thread():
+            adiador.join()
+
+    @contextlib.contextmanager
+    def __transacao(self):
+        # catálogo compartilhado: com o arquivo travado, traz o que as outras
+        # instâncias gravaram, faz a alteração e grava antes de soltar a trava.
+        # Assim emprestar/devolver decidem sobre o estado mais recente do disco
+        # e dois balcões não emprestam o mesmo livro
+        if not self.__compartilhado:
+            yield
+            return
+        with self.__trava_gravacao, self.__armazenamento.travar():
+            self.__sincronizar()
+            yield
+            self.flush()
+
+    def __sincronizar(self):
+        novos = self.__armazenamento.novidades()
+        if novos is None:
+            # o log foi trocado sem dar para seguir: lê o catálogo de novo
+            with self.__trava:
+                self.__carregar()
+            self.__notificar("recarregado", None)
+        elif novos:
+            with self.__trava:
+                for registro in novos:
+                    self.__aplicar(registro)
+                self.__historico.atualizar()
+            self.__notificar("sincronizado", None)
+
+    def sincronizar(self):
+        # aplica o que as outras instâncias gravaram desde a última vez
+        with self.__transacao():
+            pass
+
+    def set_ao_erro(self, ao_erro):
+        # troca o aviso de erros de disco (ex.: quando a janela que avisava fecha)
+        self.__ao_erro = ao_erro
+
+    def is_compartilhado(self):
+        return self.__compartilhado
+
+    def alteracoes_pendentes(self):
+        return len(self.__fila)
+
+    def flush(self):
+        # grava agora as alterações da fila, numa escrita só
+        with self.__trava_gravacao:
+            with self.__condicao_prazo:
+                self.__prazo_gravacao = None
+            with self.__trava:
+                registros, self.__fila = self.__fila, []
+                sujo = self.__sujo
+            if sujo:
+                # uma gravação anterior se perdeu: só o catálogo inteiro garante o disco
+                if not self.salvar_dados():
+                    return
+            elif not registros:
+                return
+            else:
+                try:
+                    with self.__armazenamento.travar():
+                        salvar_tudo = self.__armazenamento.registrar_varios(registros)
+                except Exception as e:
+                    # os registros podem ter chegado em parte ao diário: em vez de
+                    # repeti-los, a próxima gravação (flush ou fechar) salva tudo
+                    with self.__trava:
+                        self.__sujo = True
+                    self.__ao_erro("Erro ao salvar", str(e))
+                    return
+                if salvar_tudo:
+                    self.compactar()
+        self.__notificar("gravado", None)
+
+    def gravado(self):
+        # True se tudo o que mudou já está no disco: fila vazia, nenhuma
+        # gravação em andamento (em outra thread) e nenhuma falha esperando
+        # o salvamento completo
+        if not self.__trava_gravacao.acquire(blocking=False):
+            return False
+        try:
+            with self.__trava:
+                return not self.__fila and not self.__sujo
+        finally:
+            self.__trava_gravacao.release()
+
+    def compactar(self):
+        # junta o log no snapshot e começa um log vazio
+        self.salvar_dados()
+
+    def salvar_dados(self):
+        # devolve True se o catálogo inteiro chegou ao armazenamento
+        with self.__trava_gravacao, self.__transacao():
+            self.aguardar_gravacao()
+            try:
+                # na trava só as referências: converter e serializar um
+                # catálogo grande seguraria a lista e o servidor por segundos
+                with self.__trava:
+                    livros = list(self.__livros.values())
+                    proximo_id = self.__proximo_id
+                    versao_busca = self.__busca.versao if self.__busca_pronta else None
+                    # o catálogo inteiro já inclui o que estava na fila
+                    self.__fila = []
+                    self.__sujo = False
+                # títulos e autores não mudam; um status que mude daqui em
+                # diante vai também para a fila, e reaplicar é inofensivo
+                livros = [l.to_dict() for l in livros]
+                busca = self.__serializar_busca(versao_busca, [l["id"] for l in livros])
+                with self.__armazenamento.travar():
+                    self.__armazenamento.salvar(livros, proximo_id)
+            except Exception as e:
+                with self.__trava:
+                    self.__sujo = True
+                self.__ao_erro("Erro ao salvar", str(e))
+                return False
+            try:
+                if busca is not None:
+                    self.__gravador_busca.gravar(busca)
+                    self.__busca_gravada = versao_busca
+            except Exception as e:
+                self.__ao_erro("Erro ao salvar", str(e))
+            return True
+
+    def __serializar_busca(self, versao, ids):
+        # o índice de busca dos livros ids, ou None se ele mudou enquanto era
+        # serializado (o .busca fica como está; o próximo salvamento grava)
+        if versao is None:
+            return None
+        try:
+            busca = self.__busca.serializar(impressao_ids(ids))
+        except RuntimeError:
+            return None  # um conjunto mudou de tamanho no meio
+        with self.__trava:
+            return busca if self.__busca.versao == versao else None
+
+    def __gravar_busca(self):
+        # o .busca vale para o catálogo como ele está agora; sem isso o SQLite
+        # e o .bib (que quase nunca salvam o catálogo inteiro) e o diário do
+        # JSON refariam o índice a cada abertura
+        with self.__trava:
+            versao = self.__busca.versao if self.__busca_pronta else None
+            ids = list(self.__livros)
+        if versao is None or versao == self.__busca_gravada:
+            return
+        busca = self.__serializar_busca(versao, ids)
+        if busca is None:
+            return
+        try:
+            self.__gravador_busca.gravar(busca)
+            self.__busca_gravada = versao
+        except Exception as e:
+            self.__ao_erro("Erro ao salvar", str(e))
+
+    def aguardar_gravacao(self):
+        for gravador in (self.__armazenamento, self.__gravador_busca):
+            try:
+                gravador.aguardar()
+            except Exception as e:
+                if gravador is self.__armazenamento:
+                    # o snapshot da thread não chegou ao disco
+                    with self.__trava:
+                        self.__sujo = True
+                self.__ao_erro("Erro ao salvar", str(e))
+
+    def fechar(self):
+        self.__parar_adiador()
+        self.flush()
+        self.__gravar_busca()
+        self.aguardar_gravacao()
+        self.__armazenamento.fechar()
+
+    @staticmethod
+    def criar_livro(item):
+        titulo = item.get("titulo", "")
+        autor = item.get("autor", "")
+        disponivel = item.get("disponivel", True)
+        tipo = item.get("tipo", "Livro")
+        id = item.get("id")
+        return CLASSES.get(tipo, Livro)(titulo, autor, disponivel, id)
+
+    def __aplicar(self, registro):
+        op = registro.get("op")
+        if op == "adicionar":
+            self.__incluir(self.criar_livro(registro["livro"]))
+            return
+        if "idx" in registro:
+            # logs antigos apontavam a posição na lista
+            id = list(self.__livros)[registro["idx"]]
+        else:
+            id = registro["id"]
+        if op == "remover":
+            self.__ordem = None
+            livro = self.__livros.pop(id)
+            self.__indice.remover(livro)
+            self.__busca.remover(id, livro.get_titulo(), livro.get_autor())
+        elif op == "disponivel":
+            livro = self.__livros[id]
+            livro.set_disponivel(registro["valor"])
+            self.__indice.atualizar_status(livro)
+
+    def carregar_dados(self, progresso=None):
+        # progresso(feito, total) é chamado enquanto o catálogo é lido
+        self.flush()
+        with self.__armazenamento.travar():
+            self.__carregar(progresso)
+        self.__notificar("recarregado", None)
+
+    def __preparar_busca(self):
+        # com o catálogo já completo (snapshot + diário): o índice gravado só
+        # vale se for do mesmo conjunto de livros
+        if self.__busca.carregar(self.__arquivo + ".busca", impressao_ids(self.__livros)):
+            self.__busca_gravada = self.__busca.versao
+        else:
+            self.__busca.reconstruir((id, l.get_titulo(), l.get_autor()) for id, l in self.__livros.items())
+            self.__busca_gravada = None
+        self.__busca_pronta = True
+
+    def __esvaziar(self):
+        self.__livros = {}
+        self.__ordem = []
+        self.__indice.limpar()
+        self.__proximo_id = 1
+
+    def __carregar(self, progresso=None):
+        self.__esvaziar()
+        self.__busca_pronta = False
+        self.__historico.limpar()
+        try:
+            self.__historico.atualizar()
+        except Exception as e:
+            self.__ao_erro("Erro ao carregar", f"Histórico de empréstimos: {e}")
+        try:
+            # os livros chegam um a um: não há texto nem lista intermediária inteira na memória
+            for item in self.__armazenamento.carregar(progresso, self.__esvaziar):
+                self.__incluir(self.criar_livro(item))
+            pendentes = self.__armazenamento.pendentes()
+        except Exception as e:
+            self.__ao_erro("Erro ao carregar", str(e))
+        else:
+            try:
+                for registro in pendentes:
+                    self.__aplicar(registro)
+            except Exception as e:
+                self.__ao_erro("Erro ao carregar", str(e))
+        # ids de livros removidos (guardados pelo armazenamento ou ainda
+        # no histórico de empréstimos) não voltam a ser entregues
+        self.__proximo_id = max(self.__proximo_id, self.__armazenamento.proximo_id(),
+                                self.__historico.maior_id() + 1)
+        self.__preparar_busca()
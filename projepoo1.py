@@ -1,125 +1,101 @@
 import tkinter as tk
-from tkinter import messagebox, ttk
-import json
+from tkinter import filedialog, messagebox, simpledialog
+from tkinter import ttk
+from datetime import datetime
 import os
+import sys
+
+import instrumentacao
+from executor import Executor
+from importacao import exportar_arquivo, importar_arquivo
+from lista_virtual import ListaVirtual
+from modelo import Biblioteca, LivroDigital, LivroFisico
+
+# ---------------- DIAGNÓSTICO ---------------- #
+# Só aparece com a instrumentação ligada (--perfil ou BIBLIOTECA_PERFIL):
+# contagens e tempos de cada operação medida, atualizados a cada segundo.
+def abrir_diagnostico(root):
+    janela = tk.Toplevel(root)
+    janela.title("Diagnóstico")
+    janela.geometry("900x400")
+    colunas = ("Operação", "Chamadas", "Média (ms)", "p50", "p95", "p99", "Máx (ms)", "Total (ms)")
+    tabela = ttk.Treeview(janela, columns=colunas, show="headings")
+    for c in colunas:
+        tabela.heading(c, text=c)
+        tabela.column(c, anchor="w" if c == "Operação" else "e", width=220 if c == "Operação" else 80)
+    tabela.pack(fill="both", expand=True, padx=10, pady=10)
 
-# ---------------- CLASSES ---------------- 
-class Livro:
-    def __init__(self, titulo, autor, disponivel=True):
-        self.__titulo = titulo.strip().title()
-        self.__autor = autor.strip().title()
-        self.__disponivel = disponivel
-
-    # Encapsulamento
-    def get_titulo(self): return self.__titulo
-    def get_autor(self): return self.__autor
-    def is_disponivel(self): return self.__disponivel
-    def set_disponivel(self, valor: bool): self.__disponivel = valor
-
-    # Ações
-    def emprestar(self):
-        if self.__disponivel:
-            self.__disponivel = False
-            return True, f"O livro '{self.__titulo}' foi emprestado com sucesso!"
-        return False, f"O livro '{self.__titulo}' já está emprestado."
-
-    def devolver(self):
-        if not self.__disponivel:
-            self.__disponivel = True
-            return True, f"O livro '{self.__titulo}' foi devolvido com sucesso!"
-        return False, f"O livro '{self.__titulo}' já estava disponível."
-
-
-    def to_dict(self):
-        return {
-            "titulo": self.__titulo,
-            "autor": self.__autor,
-            "disponivel": self.__disponivel,
-            "tipo": "Livro"
-        }
-
-    
-    def exibir_informacoes(self):
-        return (self.__titulo, self.__autor, "Sim" if self.__disponivel else "Não", "Livro")
-
-
-class LivroFisico(Livro):
-    def to_dict(self):
-        data = super().to_dict()
-        data["tipo"] = "Físico"
-        return data
-    def exibir_informacoes(self):
-        titulo, autor, disponivel, _ = super().exibir_informacoes()
-        return (titulo, autor, disponivel, "Físico")
-
-
-class LivroDigital(Livro):
-    def to_dict(self):
-        data = super().to_dict()
-        data["tipo"] = "Digital"
-        return data
-    def exibir_informacoes(self):
-        titulo, autor, disponivel, _ = super().exibir_informacoes()
-        return (titulo, autor, disponivel, "Digital")
-
-
-
-class Biblioteca:
-    def __init__(self, arquivo="biblioteca.json"):
-        self.__arquivo = arquivo
-        self.__livros = []
-        self.carregar_dados()
-
-    def adicionar_livro(self, livro):
-        self.__livros.append(livro)
-        self.salvar_dados()
-
-    def remover_livro(self, idx):
-        if 0 <= idx < len(self.__livros):
-            del self.__livros[idx]
-            self.salvar_dados()
-
-    def get_livros(self):
-        return self.__livros
-
-    def salvar_dados(self):
-        try:
-            with open(self.__arquivo, "w", encoding="utf-8") as f:
-                json.dump([l.to_dict() for l in self.__livros], f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            messagebox.showerror("Erro ao salvar", str(e))
-
-    def carregar_dados(self):
-        if not os.path.exists(self.__arquivo):
-            self.__livros = []
+    def atualizar():
+        if not tabela.winfo_exists():
+            return
+        tabela.delete(*tabela.get_children())
+        for nome, medida in instrumentacao.medidas():
+            tabela.insert("", "end", values=(nome, medida["chamadas"], f"{medida['media_ms']:.2f}",
+                                             f"≤{medida['p50_ms']:g}", f"≤{medida['p95_ms']:g}",
+                                             f"≤{medida['p99_ms']:g}", f"{medida['max_ms']:.2f}",
+                                             f"{medida['total_ms']:.1f}"))
+        janela.after(1000, atualizar)
+
+    def gravar():
+        arquivo = filedialog.asksaveasfilename(parent=janela, title="Gravar medidas", defaultextension=".json",
+                                               initialfile=instrumentacao.ARQUIVO_PADRAO,
+                                               filetypes=[("JSON", "*.json")])
+        if arquivo:
+            instrumentacao.gravar(arquivo)
+
+    botoes = tk.Frame(janela)
+    botoes.pack(pady=(0, 10))
+    tk.Button(botoes, text="Zerar", command=instrumentacao.zerar, width=12).grid(row=0, column=0, padx=5)
+    tk.Button(botoes, text="Gravar...", command=gravar, width=12).grid(row=0, column=1, padx=5)
+    tk.Button(botoes, text="Fechar", command=janela.destroy, width=12).grid(row=0, column=2, padx=5)
+    atualizar()
+
+
+# ---------------- ESTATÍSTICAS ---------------- #
+# Números do acervo para a gerência. As contagens são mantidas pela
+# Biblioteca a cada alteração, então atualizar o painel não percorre o catálogo.
+def abrir_estatisticas(root, biblioteca):
+    janela = tk.Toplevel(root)
+    janela.title("Estatísticas")
+    janela.geometry("420x460")
+    janela.configure(bg="#f2f2f2")
+    resumo = tk.Label(janela, justify="left", anchor="w", font=("Helvetica", 11), bg="#f2f2f2")
+    resumo.pack(fill="x", padx=15, pady=10)
+    tk.Label(janela, text="Autores com mais livros", font=("Helvetica", 11, "bold"), bg="#f2f2f2").pack(anchor="w", padx=15)
+    tabela = ttk.Treeview(janela, columns=("Autor", "Livros"), show="headings", height=10)
+    tabela.heading("Autor", text="Autor")
+    tabela.heading("Livros", text="Livros")
+    tabela.column("Autor", anchor="w", width=300)
+    tabela.column("Livros", anchor="e", width=80)
+    tabela.pack(fill="both", expand=True, padx=15, pady=(5, 15))
+
+    def percentual(parte, total):
+        return f"{parte} ({parte * 100 / total:.1f}%)" if total else "0"
+
+    def atualizar():
+        if not tabela.winfo_exists():
             return
-        try:
-            with open(self.__arquivo, "r", encoding="utf-8") as f:
-                conteudo = f.read().strip()
-                if not conteudo:
-                    self.__livros = []
-                    return
-                dados_json = json.loads(conteudo)
-                self.__livros = []
-                for item in dados_json:
-                    titulo = item.get("titulo", "")
-                    autor = item.get("autor", "")
-                    disponivel = item.get("disponivel", True)
-                    tipo = item.get("tipo", "Livro")
-                    if tipo == "Físico":
-                        self.__livros.append(LivroFisico(titulo, autor, disponivel))
-                    elif tipo == "Digital":
-                        self.__livros.append(LivroDigital(titulo, autor, disponivel))
-                    else:
-                        self.__livros.append(Livro(titulo, autor, disponivel))
-        except Exception as e:
-            messagebox.showerror("Erro ao carregar", str(e))
+        numeros = biblioteca.estatisticas()
+        total = numeros["total"]
+        por_tipo = numeros["por_tipo"]
+        resumo.config(text="\n".join((
+            f"Livros no acervo: {total}",
+            f"Disponíveis: {percentual(numeros['disponiveis'], total)}",
+            f"Emprestados: {percentual(numeros['emprestados'], total)}  (atrasados: {numeros['atrasados']})",
+            f"Físicos: {percentual(por_tipo['Físico'], total)}",
+            f"Digitais: {percentual(por_tipo['Digital'], total)}",
+            f"Sem tipo: {percentual(por_tipo['Livro'], total)}",
+            f"Autores: {numeros['autores']}")))
+        tabela.delete(*tabela.get_children())
+        for autor, quantidade in numeros["top_autores"]:
+            tabela.insert("", "end", values=(autor, quantidade))
+        janela.after(1000, atualizar)
+
+    atualizar()
 
 
 # ---------------- INTERFACE ---------------- 
-biblioteca = Biblioteca()
-
-def abrir_janela_principal(root):
+def abrir_janela_principal(root, biblioteca, executor):
     for widget in root.winfo_children():
         widget.destroy()
 
@@ -148,24 +124,172 @@ def abrir_janela_principal(root):
     frame_inputs.grid_columnconfigure(1, weight=1)
 
     
+    frame_busca = tk.Frame(frame, bg="#f2f2f2")
+    frame_busca.pack(pady=5, fill="x")
+    tk.Label(frame_busca, text="Buscar:", bg="#f2f2f2").pack(side="left", padx=5)
+    busca_var = tk.StringVar()
+    tk.Entry(frame_busca, textvariable=busca_var).pack(side="left", fill="x", expand=True, padx=5)
+    # filtros por status e tipo; valem junto com a busca e a ordenação
+    filtro_status = tk.StringVar(value="Todos")
+    filtro_tipo = tk.StringVar(value="Todos os tipos")
+    tk.OptionMenu(frame_busca, filtro_tipo, "Todos os tipos", "Livro", "Físico", "Digital").pack(side="right", padx=5)
+    tk.OptionMenu(frame_busca, filtro_status, "Todos", "Disponíveis", "Emprestados").pack(side="right", padx=5)
+    tk.Label(frame_busca, text="Mostrar:", bg="#f2f2f2").pack(side="right", padx=5)
+
+    # None = catálogo inteiro em ordem de cadastro; senão, os livros filtrados,
+    # encontrados pela busca e/ou ordenados por uma coluna
+    resultado = None
+    # coluna clicada (chave do Biblioteca.listar) e direção
+    ordem = None
+    decrescente = False
+    colunas_ordem = {"Título": "titulo", "Autor": "autor", "Disponível": "disponivel", "Tipo": "tipo"}
+
+    def total_visivel():
+        return biblioteca.total_livros() if resultado is None else len(resultado)
+
+    def pagina_visivel(inicio, fim):
+        return biblioteca.pagina(inicio, fim) if resultado is None else resultado[inicio:fim]
+
+    # livros com alteração ainda não feita: livro -> quantas estão na fila do executor
+    aguardando = {}
+    # livros já alterados na memória cuja gravação a Biblioteca ainda não
+    # confirmou (gravação adiada, ou que falhou e espera o salvamento completo)
+    nao_gravados = set()
+
     quadro_listagem = tk.Frame(frame, bg="#f2f2f2")
     quadro_listagem.pack(pady=5, fill="both", expand=True)
-    colunas = ("Título", "Autor", "Disponível", "Tipo")
-    tree = ttk.Treeview(quadro_listagem, columns=colunas, show="headings", selectmode="browse")
-    for c in colunas:
-        tree.heading(c, text=c)
-        tree.column(c, anchor="w")
-    tree.pack(fill="both", expand=True, padx=10, pady=10)
-    vsb = ttk.Scrollbar(quadro_listagem, orient="vertical", command=tree.yview)
-    tree.configure(yscroll=vsb.set)
-    vsb.pack(side="right", fill="y")
+    colunas = ("Título", "Autor", "Disponível", "Tipo", "Devolver até")
+
+    def valores(livro):
+        emprestimo = biblioteca.emprestimo_ativo(livro.get_id())
+        prazo = f"{emprestimo.prevista:%d/%m/%Y}" if emprestimo is not None else ""
+        return livro.exibir_informacoes() + (prazo,)
+
+    def etiquetas(livro):
+        if livro in aguardando or livro in nao_gravados:
+            return ("pendente",)
+        emprestimo = biblioteca.emprestimo_ativo(livro.get_id())
+        return ("atrasado",) if emprestimo is not None and emprestimo.atrasado() else ()
+
+    # só as linhas visíveis existem no Treeview; o id do livro é o iid da linha
+    lista = ListaVirtual(quadro_listagem, colunas, total_visivel, pagina_visivel,
+                         valores=valores, chave=lambda livro: str(livro.get_id()),
+                         etiquetas=etiquetas, ao_ordenar=lambda coluna: ordenar(coluna),
+                         selectmode="extended", bg="#f2f2f2")
+    lista.pack(fill="both", expand=True, padx=10, pady=10)
+    tree = lista.tree
+    tree.tag_configure("pendente", foreground="gray")
+    tree.tag_configure("atrasado", foreground="#D32F2F")
+    # toda atualização da lista (pesquisa, rolagem, alterações) passa por aqui
+    lista.atualizar = instrumentacao.cronometrar("interface.atualizar_tree", lista.atualizar)
 
 
     def atualizar_tree():
-        for i in tree.get_children():
-            tree.delete(i)
-        for livro in biblioteca.get_livros():
-            tree.insert("", tk.END, values=livro.exibir_informacoes())
+        lista.atualizar()
+
+    def filtro_disponivel():
+        return {"Disponíveis": True, "Emprestados": False}.get(filtro_status.get())
+
+    def pesquisar(voltar_ao_topo=True):
+        nonlocal resultado
+        texto = busca_var.get().strip()
+        encontrados = biblioteca.buscar(texto) if texto else None
+        disponivel = filtro_disponivel()
+        tipo = filtro_tipo.get() if filtro_tipo.get() != "Todos os tipos" else None
+        if encontrados is None and ordem is None and disponivel is None and tipo is None:
+            resultado = None
+        else:
+            # as linhas são achadas pelo id (iid), não pela posição: a ordem
+            # mostrada não precisa ser a do catálogo
+            resultado = biblioteca.listar(ordem, decrescente, disponivel, tipo, encontrados)
+        if voltar_ao_topo:
+            lista.inicio = 0
+        lista.atualizar()
+
+    def ordenar(coluna):
+        # clicar de novo na mesma coluna inverte a direção
+        nonlocal ordem, decrescente
+        if coluna not in colunas_ordem:
+            return
+        if ordem == colunas_ordem[coluna]:
+            decrescente = not decrescente
+        else:
+            ordem, decrescente = colunas_ordem[coluna], False
+        lista.marcar_ordem(coluna, decrescente)
+        pesquisar()
+
+    def nova_pesquisa(*args):
+        # outro texto ou filtro: a seleção de antes não vale para a lista nova
+        lista.limpar_selecao()
+        pesquisar()
+
+    filtro_status.trace_add("write", nova_pesquisa)
+    filtro_tipo.trace_add("write", nova_pesquisa)
+
+    # pesquisa enquanto digita, esperando uma pausa curta entre as teclas
+    agendada = None
+
+    def agendar_pesquisa(*args):
+        nonlocal agendada
+        if agendada is not None:
+            root.after_cancel(agendada)
+        agendada = root.after(150, nova_pesquisa)
+
+    busca_var.trace_add("write", agendar_pesquisa)
+
+    # cada alteração mexe só nas linhas visíveis, sem refazer a lista inteira
+    def ao_alterar(evento, livro):
+        if evento == "gravado":
+            mostrar_pendentes(executor.pendentes())
+            confirmar_gravacao()
+        elif evento == "status" and ordem != "disponivel" and filtro_disponivel() is None:
+            lista.atualizar_item(livro)
+        elif resultado is not None:
+            pesquisar(voltar_ao_topo=False)
+        else:
+            lista.atualizar()
+
+    # as alterações acontecem na thread do executor; o aviso é repassado ao Tk
+    ao_alterar_na_interface = executor.na_interface(ao_alterar)
+    biblioteca.inscrever(ao_alterar_na_interface)
+    tree.bind("<Destroy>", lambda e: biblioteca.desinscrever(ao_alterar_na_interface))
+
+    def confirmar_gravacao():
+        # o cinza sai só quando a Biblioteca diz que tudo chegou ao disco
+        if nao_gravados and biblioteca.gravado():
+            livros = list(nao_gravados)
+            nao_gravados.clear()
+            for livro in livros:
+                lista.atualizar_item(livro)
+
+    def enviar(livros, funcao, *args, ao_concluir):
+        # as linhas ficam em cinza até a gravação ser confirmada: a tarefa
+        # terminar não basta, a gravação pode ter sido adiada ou falhado
+        for livro in livros:
+            aguardando[livro] = aguardando.get(livro, 0) + 1
+            lista.atualizar_item(livro)
+
+        def terminou(alterou):
+            for livro in livros:
+                aguardando[livro] -= 1
+                if not aguardando[livro]:
+                    del aguardando[livro]
+                if alterou:
+                    nao_gravados.add(livro)
+            confirmar_gravacao()
+            for livro in livros:
+                lista.atualizar_item(livro)
+
+        def concluiu(resultado):
+            terminou(True)
+            ao_concluir(resultado)
+
+        def falhou(erro):
+            # as alterações não mudam nada quando falham (histórico primeiro)
+            terminou(False)
+            messagebox.showerror("Erro", str(erro))
+
+        executor.enviar(funcao, *args, ao_concluir=concluiu, ao_falhar=falhou)
 
     def adicionar_livro():
         titulo = entrada_titulo.get().strip()
@@ -178,62 +302,227 @@ def abrir_janela_principal(root):
             livro = LivroFisico(titulo, autor)
         else:
             livro = LivroDigital(titulo, autor)
-        biblioteca.adicionar_livro(livro)
-        atualizar_tree()
-        messagebox.showinfo("Sucesso", f"Livro '{titulo}' cadastrado!")
-        entrada_titulo.delete(0, tk.END)
-        entrada_autor.delete(0, tk.END)
+
+        def cadastrado(sucesso):
+            if not sucesso:
+                messagebox.showwarning("Atenção", f"O livro '{livro.get_titulo()}' de {livro.get_autor()} já está cadastrado ({tipo})")
+                return
+            messagebox.showinfo("Sucesso", f"Livro '{titulo}' cadastrado!")
+            entrada_titulo.delete(0, tk.END)
+            entrada_autor.delete(0, tk.END)
+
+        enviar([livro], biblioteca.adicionar_livro, livro, ao_concluir=cadastrado)
+
+    def selecionados():
+        # linhas marcadas (Ctrl/Shift para várias), também as que rolaram para
+        # fora da tela e não estão criadas no Treeview; o iid é o id do livro
+        ids = sorted(int(iid) for iid in lista.selecionados)
+        return [livro for livro in map(biblioteca.buscar_por_id, ids) if livro is not None]
+
+    # várias linhas: um lote só, tudo ou nada, com uma gravação e um aviso no fim
+    def emprestar_lote(livros):
+        leitor = simpledialog.askstring("Empréstimo", f"Quem vai levar os {len(livros)} livros?", parent=root)
+        if leitor is None:
+            return
+        enviar(livros, biblioteca.emprestar_varios, [l.get_id() for l in livros], leitor.strip(),
+               ao_concluir=lambda resultado: messagebox.showinfo("Resultado", resultado[1]))
+
+    def devolver_lote(livros):
+        enviar(livros, biblioteca.devolver_varios, [l.get_id() for l in livros],
+               ao_concluir=lambda resultado: messagebox.showinfo("Resultado", resultado[1]))
 
     def emprestar():
-        sel = tree.selection()
+        sel = selecionados()
         if not sel: return messagebox.showwarning("Aviso", "Selecione um livro")
-        idx = tree.index(sel[0])
-        livro = biblioteca.get_livros()[idx]
-        sucesso, msg = livro.emprestar()
-        if sucesso: biblioteca.salvar_dados()
-        atualizar_tree()
-        messagebox.showinfo("Resultado", msg)
+        if len(sel) > 1:
+            return emprestar_lote(sel)
+        livro = sel[0]
+        if not livro.is_disponivel():
+            return messagebox.showinfo("Resultado", f"O livro '{livro.get_titulo()}' já está emprestado.")
+        leitor = simpledialog.askstring("Empréstimo", f"Quem vai levar '{livro.get_titulo()}'?", parent=root)
+        if leitor is None:
+            return
+        enviar([livro], biblioteca.emprestar, livro.get_id(), leitor.strip(),
+               ao_concluir=lambda resultado: messagebox.showinfo("Resultado", resultado[1]))
 
     def devolver():
-        sel = tree.selection()
+        sel = selecionados()
         if not sel: return messagebox.showwarning("Aviso", "Selecione um livro")
-        idx = tree.index(sel[0])
-        livro = biblioteca.get_livros()[idx]
-        sucesso, msg = livro.devolver()
-        if sucesso: biblioteca.salvar_dados()
-        atualizar_tree()
-        messagebox.showinfo("Resultado", msg)
+        if len(sel) > 1:
+            return devolver_lote(sel)
+        livro = sel[0]
+        enviar([livro], biblioteca.devolver, livro.get_id(),
+               ao_concluir=lambda resultado: messagebox.showinfo("Resultado", resultado[1]))
 
     def remover():
-        sel = tree.selection()
+        sel = selecionados()
         if not sel: return messagebox.showwarning("Aviso", "Selecione um livro para remover")
-        idx = tree.index(sel[0])
-        livro = biblioteca.get_livros()[idx]
+        if len(sel) > 1: return messagebox.showwarning("Aviso", "Selecione um livro só para remover")
+        livro = sel[0]
         confirm = messagebox.askyesno("Confirmação", f"Remover '{livro.get_titulo()}'?")
         if confirm:
-            biblioteca.remover_livro(idx)
-            atualizar_tree()
-            messagebox.showinfo("Removido", f"Livro '{livro.get_titulo()}' removido!")
+            enviar([livro], biblioteca.remover_livro, livro.get_id(),
+                   ao_concluir=lambda resultado: messagebox.showinfo("Removido", f"Livro '{livro.get_titulo()}' removido!"))
+
+    def mostrar_atrasados():
+        atrasados = biblioteca.atrasados()
+        vencendo = biblioteca.vencendo(3)
+        if not atrasados and not vencendo:
+            return messagebox.showinfo("Empréstimos", "Nenhum empréstimo atrasado ou vencendo nos próximos 3 dias.")
+        hoje = datetime.now()
+        linhas = [f"{len(atrasados)} atrasado(s):"]
+        linhas += [f"  {livro.get_titulo()} - {emprestimo.leitor or 'sem nome'} "
+                   f"({(hoje - emprestimo.prevista).days} dia(s) de atraso)" for livro, emprestimo in atrasados[:15]]
+        linhas.append(f"{len(vencendo)} vencendo nos próximos 3 dias:")
+        linhas += [f"  {livro.get_titulo()} - {emprestimo.leitor or 'sem nome'} "
+                   f"(até {emprestimo.prevista:%d/%m/%Y})" for livro, emprestimo in vencendo[:15]]
+        messagebox.showinfo("Empréstimos", "\n".join(linhas))
+
+    def mostrar_andamento(acao):
+        # progresso(feito, total) chamado pela thread de trabalho
+        def andamento(feito, total):
+            status_gravacao.config(text=f"{acao}... {feito * 100 // total if total else 100}%")
+        return executor.na_interface(andamento)
+
+    def importar():
+        arquivo = filedialog.askopenfilename(title="Importar catálogo",
+                                             filetypes=[("CSV ou JSON Lines", "*.csv *.jsonl *.ndjson")])
+        if not arquivo:
+            return
+
+        def importado(resultado):
+            importados, recusados = resultado
+            texto = f"{importados} livros importados."
+            if recusados:
+                texto += f"\n{len(recusados)} linhas recusadas:\n"
+                texto += "\n".join(f"linha {linha}: {motivo}" for linha, motivo in recusados[:10])
+                if len(recusados) > 10:
+                    texto += "\n..."
+            messagebox.showinfo("Importação", texto)
+
+        executor.enviar(importar_arquivo, biblioteca, arquivo, mostrar_andamento("Importando"),
+                        ao_concluir=importado)
+
+    def exportar():
+        arquivo = filedialog.asksaveasfilename(title="Exportar catálogo", defaultextension=".csv",
+                                               filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not arquivo:
+            return
+        executor.enviar(exportar_arquivo, biblioteca, arquivo, mostrar_andamento("Exportando"),
+                        ao_concluir=lambda total: messagebox.showinfo("Exportação", f"{total} livros exportados."))
+
+    # com a instrumentação ligada, o tempo de cada botão na thread do Tk
+    adicionar_livro = instrumentacao.cronometrar("interface.adicionar_livro", adicionar_livro)
+    emprestar = instrumentacao.cronometrar("interface.emprestar", emprestar)
+    devolver = instrumentacao.cronometrar("interface.devolver", devolver)
+    remover = instrumentacao.cronometrar("interface.remover", remover)
 
-    
     botoes = tk.Frame(frame, bg="#f2f2f2")
     botoes.pack(pady=8)
     tk.Button(botoes, text="Cadastrar", command=adicionar_livro, bg="#3a7bd5", fg="white", width=12).grid(row=0, column=0, padx=5)
     tk.Button(botoes, text="Emprestar", command=emprestar, bg="#2196F3", fg="white", width=12).grid(row=0, column=1, padx=5)
     tk.Button(botoes, text="Devolver", command=devolver, bg="#FF9800", fg="white", width=12).grid(row=0, column=2, padx=5)
     tk.Button(botoes, text="Remover", command=remover, bg="#9C27B0", fg="white", width=12).grid(row=0, column=3, padx=5)
-    tk.Button(botoes, text="Sair", command=root.destroy, bg="#F44336", fg="white", width=12).grid(row=0, column=4, padx=5)
+    tk.Button(botoes, text="Atrasados", command=mostrar_atrasados, bg="#D32F2F", fg="white", width=12).grid(row=0, column=4, padx=5)
+    tk.Button(botoes, text="Importar", command=importar, bg="#607D8B", fg="white", width=12).grid(row=0, column=5, padx=5)
+    tk.Button(botoes, text="Exportar", command=exportar, bg="#607D8B", fg="white", width=12).grid(row=0, column=6, padx=5)
+    tk.Button(botoes, text="Estatísticas", command=lambda: abrir_estatisticas(root, biblioteca), bg="#009688", fg="white", width=12).grid(row=0, column=7, padx=5)
+    if instrumentacao.ligada():
+        tk.Button(botoes, text="Diagnóstico", command=lambda: abrir_diagnostico(root), bg="#455A64", fg="white", width=12).grid(row=0, column=8, padx=5)
+    tk.Button(botoes, text="Sair", command=root.destroy, bg="#F44336", fg="white", width=12).grid(row=0, column=9, padx=5)
+
+    status_gravacao = tk.Label(frame, text="", fg="gray", bg="#f2f2f2")
+    status_gravacao.pack()
+
+    def mostrar_pendentes(pendentes):
+        if pendentes:
+            status_gravacao.config(text=f"Salvando... ({pendentes} alteração(ões) na fila)")
+        elif biblioteca.alteracoes_pendentes():
+            status_gravacao.config(text="Alterações aguardando gravação")
+        else:
+            status_gravacao.config(text="Todas as alterações foram salvas")
 
-    atualizar_tree()
+    executor.ao_mudar = mostrar_pendentes
+    status_gravacao.bind("<Destroy>", lambda e: setattr(executor, "ao_mudar", None))
+
+    # catálogo compartilhado: de tempos em tempos traz o que as outras
+    # máquinas gravaram, uma verificação por vez
+    sincronizando = False
+
+    def fim_sincronizacao(erro=None):
+        nonlocal sincronizando
+        sincronizando = False
+        if erro is not None:
+            status_gravacao.config(text=f"Falha ao sincronizar: {erro}")
 
+    def acompanhar():
+        nonlocal sincronizando
+        if not status_gravacao.winfo_exists():
+            return
+        if not sincronizando:
+            sincronizando = True
+            executor.enviar(biblioteca.sincronizar, contar=False,
+                            ao_concluir=lambda resultado: fim_sincronizacao(), ao_falhar=fim_sincronizacao)
+        root.after(2000, acompanhar)
+
+    if biblioteca.is_compartilhado():
+        acompanhar()
 
-root = tk.Tk()
-root.title("Bookish Bliss")
-root.state("zoomed")
-root.configure(bg="#f2f2f2")
+    atualizar_tree()
 
-tk.Label(root, text="Bookish Bliss 📚", font=("Helvetica", 36, "bold"), bg="#f2f2f2").pack(pady=150)
-tk.Button(root, text="Entrar", command=lambda: abrir_janela_principal(root),
-          bg="#1a73e8", fg="white", font=("Helvetica", 14, "bold"), width=12).pack()
 
-root.mainloop()
\ No newline at end of file
+def main():
+    # --perfil [arquivo] ou BIBLIOTECA_PERFIL=arquivo: mede as operações e grava
+    # o resultado ao sair; tem que vir antes de criar a Biblioteca
+    instrumentacao.ligar_se_pedido(sys.argv[1:])
+
+    root = tk.Tk()
+    root.title("Bookish Bliss")
+    root.state("zoomed")
+    root.configure(bg="#f2f2f2")
+
+    tk.Label(root, text="Bookish Bliss 📚", font=("Helvetica", 36, "bold"), bg="#f2f2f2").pack(pady=150)
+    botao_entrar = tk.Button(root, text="Entrar", bg="#1a73e8", fg="white",
+                             font=("Helvetica", 14, "bold"), width=12, state="disabled")
+    botao_entrar.pack()
+    status_carga = tk.Label(root, text="Carregando catálogo...", bg="#f2f2f2")
+    status_carga.pack(pady=10)
+
+    # o catálogo é lido com a tela inicial já desenhada, mostrando o andamento
+    ultimo_percentual = -1
+
+    def mostrar_progresso(feito, total):
+        nonlocal ultimo_percentual
+        percentual = feito * 100 // total if total else 100
+        if percentual != ultimo_percentual:
+            ultimo_percentual = percentual
+            status_carga.config(text=f"Carregando catálogo... {percentual}%")
+            root.update()
+
+    # as alterações (e a gravação delas) rodam fora da thread do Tk
+    executor = Executor(root, ao_erro=messagebox.showerror)
+
+    # BIBLIOTECA_ARQUIVO=biblioteca.db usa o SQLite (migre antes com: python armazenamento.py biblioteca.json biblioteca.db)
+    # e BIBLIOTECA_ARQUIVO=biblioteca.bib o formato binário (python armazenamento.py biblioteca.json biblioteca.bib)
+    # durabilidade por instalação: BIBLIOTECA_ATRASO_GRAVACAO (segundos sem alterações
+    # antes de gravar; 0 grava cada uma na hora), BIBLIOTECA_LIMITE_GRAVACAO (grava
+    # ao juntar tantas alterações) e BIBLIOTECA_SINCRONIZAR=1 (fsync a cada gravação).
+    # BIBLIOTECA_COMPARTILHADO=1 quando várias máquinas abrem o mesmo arquivo
+    biblioteca = Biblioteca(os.environ.get("BIBLIOTECA_ARQUIVO", "biblioteca.json"),
+                            progresso=mostrar_progresso, ao_erro=executor.na_interface(messagebox.showerror),
+                            atraso_gravacao=float(os.environ.get("BIBLIOTECA_ATRASO_GRAVACAO", "1")),
+                            limite_gravacao=int(os.environ.get("BIBLIOTECA_LIMITE_GRAVACAO", "100")),
+                            sincronizar=os.environ.get("BIBLIOTECA_SINCRONIZAR") == "1",
+                            compartilhado=os.environ.get("BIBLIOTECA_COMPARTILHADO") == "1")
+    status_carga.config(text=f"{biblioteca.total_livros()} livros no catálogo")
+    botao_entrar.config(command=lambda: abrir_janela_principal(root, biblioteca, executor), state="normal")
+
+    root.mainloop()
+    # Sair / fechar a janela: termina as alterações que ainda estavam na fila
+    # e grava as que aguardavam o atraso antes de fechar o arquivo
+    executor.encerrar()
+    biblioteca.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,85 @@
 # biblioteca_gui_robusto.py
+import time
+INICIO = time.perf_counter()  # referência do tempo até a primeira tela
+
 import tkinter as tk
-from tkinter import messagebox, ttk
-import json
+from tkinter import messagebox
+import importlib.util
 import os
-
-# tenta importar Pillow, se não tiver, usaremos fallback
-try:
-    from PIL import Image, ImageTk
-    PIL_AVAILABLE = True
-except Exception:
-    PIL_AVAILABLE = False
-
-# ---------------- CLASSES ---------------- #
-class Livro:
-    def __init__(self, titulo, autor, disponivel=True):
-        self.titulo = titulo
-        self.autor = autor
-        self.disponivel = disponivel
-
-    def emprestar(self):
-        if self.disponivel:
-            self.disponivel = False
-            return True, f"O livro '{self.titulo}' foi emprestado com sucesso!"
-        return False, f"O livro '{self.titulo}' já está emprestado."
-
-    def devolver(self):
-        if not self.disponivel:
-            self.disponivel = True
-            return True, f"O livro '{self.titulo}' foi devolvido com sucesso!"
-        return False, f"O livro '{self.titulo}' já estava disponível."
-
-    def to_dict(self):
-        return {"titulo": self.titulo, "autor": self.autor, "disponivel": self.disponivel}
-
-    def __str__(self):
-        status = "Disponível" if self.disponivel else "Emprestado"
-        return f"{self.titulo} - {self.autor} ({status})"
-
-
-class Biblioteca:
-    def __init__(self, arquivo="biblioteca.json"):
-        self.arquivo = arquivo
-        self.livros = []
-        self.carregar_dados()
-
-    def adicionar_livro(self, livro):
-        self.livros.append(livro)
-        self.salvar_dados()
-
-    def salvar_dados(self):
-        try:
-            with open(self.arquivo, "w", encoding="utf-8") as f:
-                json.dump([livro.to_dict() for livro in self.livros], f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            messagebox.showerror("Erro ao salvar", f"Não foi possível salvar os dados:\n{e}")
-
-    def carregar_dados(self):
-        if not os.path.exists(self.arquivo):
-            self.livros = []
-            return
-        try:
-            with open(self.arquivo, "r", encoding="utf-8") as f:
-                conteudo = f.read().strip()
-                if conteudo == "":
-                    self.livros = []
-                    return
-                dados = json.loads(conteudo)
-                self.livros = []
-                for item in dados:
-                    # tolerância: se faltar chave, usa valores padrão
-                    titulo = item.get("titulo", "Título sem nome")
-                    autor = item.get("autor", "Autor desconhecido")
-                    disponivel = item.get("disponivel", True)
-                    self.livros.append(Livro(titulo, autor, disponivel))
-        except json.JSONDecodeError:
-            messagebox.showwarning("JSON inválido", "O arquivo biblioteca.json está inválido. Ignorando o conteúdo.")
-            self.livros = []
-        except Exception as e:
-            messagebox.showerror("Erro ao carregar", f"Erro ao ler arquivo:\n{e}")
-            self.livros = []
+import queue
+import sys
+
+import instrumentacao
+from executor import Executor
+from lista_virtual import ListaVirtual
+from modelo import Biblioteca, Livro, erro_no_terminal
+
+# o Pillow só é importado (na thread de trabalho) quando a imagem não está no
+# cache; aqui só se verifica se ele existe, sem pagar a importação
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+# ---------------- Imagem da tela inicial ---------------- #
+# A imagem redimensionada fica num PNG em cache, com o mtime e o tamanho da
+# original e o tamanho pedido no nome. O Tk lê PNG sozinho: nas aberturas
+# seguintes não há Pillow, decodificação do JPEG nem resize.
+PASTA_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "bookish_bliss")
+
+
+def imagem_em_cache(origem, tamanho):
+    # devolve o caminho do PNG pronto para o tk.PhotoImage; gera se preciso
+    info = os.stat(origem)
+    base = os.path.splitext(os.path.basename(origem))[0]
+    nome = f"{base}-{info.st_mtime_ns}-{info.st_size}-{tamanho[0]}x{tamanho[1]}.png"
+    caminho = os.path.join(PASTA_CACHE, nome)
+    if os.path.exists(caminho):
+        return caminho
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow não instalado.\nInstale com: pip install pillow")
+    from PIL import Image
+
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    with Image.open(origem) as img:
+        img = img.convert("RGB").resize(tamanho)
+    temporario = caminho + ".tmp"
+    img.save(temporario, "PNG")
+    os.replace(temporario, caminho)
+    # versões antigas da mesma imagem (outro mtime ou tamanho) saem do cache
+    for antigo in os.listdir(PASTA_CACHE):
+        if antigo.startswith(base + "-") and antigo != nome:
+            try:
+                os.remove(os.path.join(PASTA_CACHE, antigo))
+            except OSError:
+                pass
+    return caminho
+
+def medir_inicio(nome, segundos):
+    # tempos da abertura: só com a instrumentação ligada (--perfil ou BIBLIOTECA_PERFIL)
+    if instrumentacao.ligada():
+        instrumentacao.registrar(nome, segundos)
+        print(f"{nome}: {segundos * 1000:.0f} ms", file=sys.stderr)
 
 # ---------------- Interface ---------------- #
-biblioteca = Biblioteca()
-
-def abrir_menu_principal():
+def abrir_menu_principal(tela_inicial, biblioteca, erros):
     tela_inicial.destroy()
-    criar_janela_principal()
+    criar_janela_principal(biblioteca, erros)
 
-def criar_janela_principal():
+def criar_janela_principal(biblioteca, erros):
+    # erros: fila de (titulo, mensagem) dos erros de disco da Biblioteca, que
+    # podem vir de outras threads (gravação adiada); mostrados no loop do Tk
     root = tk.Tk()
     root.title("Bookish Bliss - Biblioteca")
     root.geometry("600x450")
     root.configure(bg="#f2f2f2")
 
+    def mostrar_erros():
+        while True:
+            try:
+                titulo, mensagem = erros.get_nowait()
+            except queue.Empty:
+                break
+            messagebox.showerror(titulo, mensagem)
+        root.after(200, mostrar_erros)
+
     tk.Label(root, text="Biblioteca Digital", font=("Helvetica", 18, "bold"), bg="#f2f2f2").pack(pady=10)
 
     frame = tk.Frame(root, bg="#f2f2f2")
@@ -110,7 +97,9 @@ def criar_janela_principal():
         titulo = entrada_titulo.get().strip()
         autor = entrada_autor.get().strip()
         if titulo and autor:
-            biblioteca.adicionar_livro(Livro(titulo, autor))
+            if not biblioteca.adicionar_livro(Livro(titulo, autor)):
+                messagebox.showwarning("Atenção", f"O livro '{titulo}' de {autor} já está cadastrado.")
+                return
             atualizar_tree()
             messagebox.showinfo("Sucesso", f"Livro '{titulo}' cadastrado!")
             entrada_titulo.delete(0, tk.END)
@@ -120,50 +109,40 @@ def criar_janela_principal():
 
     tk.Button(root, text="Cadastrar Livro", command=adicionar_livro_interface, bg="#3a7bd5", fg="white", width=20).pack(pady=8)
 
-    # Treeview para listar livros (Título, Autor, Disponível)
+    # lista de livros (Título, Autor, Disponível)
     quadro_listagem = tk.Frame(root, bg="#f2f2f2")
     quadro_listagem.pack(pady=5, fill="both", expand=True)
 
     colunas = ("Título", "Autor", "Disponível")
-    tree = ttk.Treeview(quadro_listagem, columns=colunas, show="headings", selectmode="browse")
-    for c in colunas:
-        tree.heading(c, text=c)
-        tree.column(c, anchor="w")
-    tree.pack(fill="both", expand=True, padx=10, pady=10)
-
-    # Scrollbar vertical
-    vsb = ttk.Scrollbar(quadro_listagem, orient="vertical", command=tree.yview)
-    tree.configure(yscroll=vsb.set)
-    vsb.pack(side="right", fill="y")
+    # só as linhas visíveis existem no Treeview (lista_virtual), como no
+    # projepoo1: abrir e atualizar não dependem do tamanho do catálogo
+    lista = ListaVirtual(quadro_listagem, colunas, biblioteca.total_livros, biblioteca.pagina,
+                         valores=lambda livro: livro.exibir_informacoes()[:3],
+                         chave=lambda livro: str(livro.get_id()), bg="#f2f2f2")
+    lista.pack(fill="both", expand=True, padx=10, pady=10)
 
     def atualizar_tree():
-        for i in tree.get_children():
-            tree.delete(i)
-        for livro in biblioteca.livros:
-            disponivel_text = "Sim" if livro.disponivel else "Não"
-            tree.insert("", tk.END, values=(livro.titulo, livro.autor, disponivel_text))
+        lista.atualizar()
+
+    def selecionado():
+        # id da linha marcada, mesmo que ela tenha rolado para fora da tela
+        return int(next(iter(lista.selecionados))) if lista.selecionados else None
 
     def emprestar_selecionado():
-        sel = tree.selection()
-        if not sel:
+        id = selecionado()
+        if id is None:
             messagebox.showwarning("Aviso", "Selecione um livro na lista!")
             return
-        idx = tree.index(sel[0])
-        sucesso, msg = biblioteca.livros[idx].emprestar()
-        if sucesso:
-            biblioteca.salvar_dados()
+        sucesso, msg = biblioteca.emprestar(id)
         atualizar_tree()
         messagebox.showinfo("Resultado", msg)
 
     def devolver_selecionado():
-        sel = tree.selection()
-        if not sel:
+        id = selecionado()
+        if id is None:
             messagebox.showwarning("Aviso", "Selecione um livro na lista!")
             return
-        idx = tree.index(sel[0])
-        sucesso, msg = biblioteca.livros[idx].devolver()
-        if sucesso:
-            biblioteca.salvar_dados()
+        sucesso, msg = biblioteca.devolver(id)
         atualizar_tree()
         messagebox.showinfo("Resultado", msg)
 
@@ -176,39 +155,98 @@ def criar_janela_principal():
     tk.Button(botoes_quadro, text="Sair", command=root.destroy, bg="#F44336", fg="white", width=12).grid(row=0, column=2, padx=6)
 
     atualizar_tree()
+    mostrar_erros()
     root.mainloop()
 
-# --- Tela inicial (com imagem opcional) ---
-tela_inicial = tk.Tk()
-tela_inicial.title("Bookish Bliss")
-tela_inicial.geometry("500x400")
-tela_inicial.resizable(False, False)
-
-IMAGE_NAME = "bookish_bliss.jpg"  # coloque o nome do arquivo da imagem aqui
-
-# tenta carregar imagem com Pillow (quando disponível), senão usa label simples
-if PIL_AVAILABLE and os.path.exists(IMAGE_NAME):
-    try:
-        img = Image.open(IMAGE_NAME)
-        img = img.resize((500, 400))
-        img_tk = ImageTk.PhotoImage(img)
+def main():
+    instrumentacao.ligar_se_pedido(sys.argv[1:])
+
+    # --- Tela inicial (com imagem opcional) ---
+    # A tela aparece primeiro, só com texto; a imagem e o catálogo vêm depois,
+    # da thread de trabalho, e o Entrar é liberado quando o catálogo chega
+    tela_inicial = tk.Tk()
+    tela_inicial.title("Bookish Bliss")
+    tela_inicial.geometry("500x400")
+    tela_inicial.resizable(False, False)
+
+    IMAGE_NAME = "bookish_bliss.jpg"  # coloque o nome do arquivo da imagem aqui
+    TAMANHO_IMAGEM = (500, 400)
+
+    fundo = tk.Frame(tela_inicial)
+    fundo.pack(fill="both", expand=True)
+    tk.Label(fundo, text="Bookish Bliss", font=("Helvetica", 28, "bold")).pack(pady=60)
+    aviso = tk.Label(fundo, text="", font=("Helvetica", 10))
+    aviso.pack()
+    status_carga = tk.Label(tela_inicial, text="Carregando catálogo...", font=("Helvetica", 10))
+    status_carga.place(relx=0.5, rely=0.92, anchor="center")
+    botao_entrar = tk.Button(tela_inicial, text="Entrar", state="disabled",
+                             bg="#1a73e8", fg="white", font=("Helvetica", 12, "bold"), width=10)
+    botao_entrar.place(relx=0.5, rely=0.8, anchor="center")
+
+    tela_inicial.update()
+    primeira_tela = time.perf_counter() - INICIO
+    medir_inicio("inicio.primeira_tela", primeira_tela)
+
+    executor = Executor(tela_inicial, ao_erro=messagebox.showerror)
+
+    def mostrar_imagem(caminho):
+        img_tk = tk.PhotoImage(file=caminho)
         label_img = tk.Label(tela_inicial, image=img_tk)
         label_img.image = img_tk  # referencia para evitar garbage collection
-        label_img.pack(fill="both", expand=True)
-    except Exception as e:
-        tk.Label(tela_inicial, text="Bookish Bliss", font=("Helvetica", 24, "bold")).pack(expand=True)
-        print("Erro ao abrir imagem:", e)
-else:
-    # se Pillow não está disponível ou imagem não existe, mostra texto informativo
-    if not PIL_AVAILABLE:
-        aviso_text = "Imagem não mostrada (Pillow não instalado).\nInstale com: pip install pillow"
-    else:
-        aviso_text = f"Imagem '{IMAGE_NAME}' não encontrada na pasta do script."
-    tk.Label(tela_inicial, text="Bookish Bliss", font=("Helvetica", 28, "bold")).pack(pady=60)
-    tk.Label(tela_inicial, text=aviso_text, font=("Helvetica", 10)).pack()
-
-botao_entrar = tk.Button(tela_inicial, text="Entrar", command=abrir_menu_principal,
-                         bg="#1a73e8", fg="white", font=("Helvetica", 12, "bold"), width=10)
-botao_entrar.place(relx=0.5, rely=0.8, anchor="center")
+        label_img.place(x=0, y=0, relwidth=1, relheight=1)
+        label_img.lower()  # atrás do Entrar e do andamento
+        fundo.destroy()
 
-tela_inicial.mainloop()
\ No newline at end of file
+    def sem_imagem(erro):
+        if isinstance(erro, FileNotFoundError):
+            aviso.config(text=f"Imagem '{IMAGE_NAME}' não encontrada na pasta do script.")
+        else:
+            aviso.config(text=f"Imagem não mostrada ({erro})")
+
+    executor.enviar(imagem_em_cache, IMAGE_NAME, TAMANHO_IMAGEM, ao_concluir=mostrar_imagem, ao_falhar=sem_imagem)
+
+    # o catálogo é lido na thread de trabalho; o andamento volta para o Tk
+    ultimo_percentual = -1
+    mostrar_andamento = executor.na_interface(
+        lambda percentual: status_carga.config(text=f"Carregando catálogo... {percentual}%"))
+
+    def progresso(feito, total):
+        nonlocal ultimo_percentual
+        percentual = feito * 100 // total if total else 100
+        if percentual != ultimo_percentual:
+            ultimo_percentual = percentual
+            mostrar_andamento(percentual)
+
+    # a Biblioteca fica aqui também para ser fechada se a janela for fechada
+    # no meio da carga (as respostas do executor são descartadas ao encerrar)
+    carregada = {}
+    erros = queue.Queue()
+
+    def carregar():
+        carregada["biblioteca"] = Biblioteca(progresso=progresso, ao_erro=executor.na_interface(messagebox.showerror))
+        return carregada["biblioteca"]
+
+    def pronta(biblioteca):
+        executor.encerrar()  # daqui em diante tudo roda na thread do Tk
+        # o executor parou de esvaziar a fila dele: os erros de disco (que
+        # podem vir da thread de uma gravação adiada) passam a ir para a fila
+        # que a janela principal mostra
+        biblioteca.set_ao_erro(lambda titulo, mensagem: erros.put((titulo, mensagem)))
+        pronta_em = time.perf_counter() - INICIO
+        status_carga.config(text=f"{biblioteca.total_livros()} livros no catálogo "
+                                 f"(tela em {primeira_tela * 1000:.0f} ms, pronto em {pronta_em:.1f} s)")
+        medir_inicio("inicio.catalogo_pronto", pronta_em)
+        botao_entrar.config(state="normal", command=lambda: abrir_menu_principal(tela_inicial, biblioteca, erros))
+
+    executor.enviar(carregar, ao_concluir=pronta)
+
+    tela_inicial.mainloop()
+    executor.encerrar()
+    if "biblioteca" in carregada:
+        carregada["biblioteca"].fechar()
+    # o que falhou depois da última janela (ex.: a gravação ao fechar) não se perde
+    while not erros.empty():
+        erro_no_terminal(*erros.get_nowait())
+
+if __name__ == "__main__":
+    main()
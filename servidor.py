@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from emprestimos import PRAZO_DIAS, PRAZO_MAXIMO_DIAS, validar_prazo
+from modelo import Biblioteca, LivroDigital, LivroFisico
+
+# ---------------- SERVIDOR HTTP ---------------- #
+# API JSON local para quiosques e scripts de autoatendimento, só com a
+# biblioteca padrão (asyncio). Um único catálogo em memória atende todas as
+# conexões: leituras rodam direto no loop; alterações vão para uma thread só,
+# uma por vez e na ordem de chegada, sem segurar o loop enquanto o disco
+# grava. As gravações de várias requisições são juntadas (atraso_gravacao).
+# No catálogo compartilhado, a mesma thread traz de tempos em tempos o que as
+# outras instâncias gravaram (sincronizar), para as leituras não ficarem velhas.
+#
+#   GET    /livros?inicio=0&fim=50      lista paginada
+#   GET    /livros?q=machado            busca por palavras (prefixos)
+#   GET    /livros/<id>
+#   POST   /livros                      {"titulo", "autor", "tipo"}
+#   DELETE /livros/<id>
+#   POST   /livros/<id>/emprestar       {"leitor", "dias"} (opcionais)
+#   POST   /livros/<id>/devolver
+#   GET    /emprestimos/atrasados
+#   GET    /estatisticas?top=10             contagens e autores com mais livros
+
+MOTIVOS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+LIMITE_CORPO = 1 << 20
+LIMITE_PAGINA = 1000
+
+
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class ServidorBiblioteca:
+    def __init__(self, biblioteca):
+        self.biblioteca = biblioteca
+        # uma thread só: as alterações saem serializadas, na ordem de chegada
+        self.alteracoes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="alteracoes")
+
+    async def alterar(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.alteracoes, funcao, *args)
+
+    async def sincronizar_sempre(self, intervalo):
+        # catálogo compartilhado: livros que outra instância removeu ou mudou
+        # deixam de aparecer velhos depois de no máximo `intervalo` segundos
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await self.alterar(self.biblioteca.sincronizar)
+            except Exception as e:
+                print(f"erro ao sincronizar: {e}", file=sys.stderr, flush=True)
+
+    def livro_json(self, livro):
+        dados = livro.to_dict()
+        emprestimo = self.biblioteca.emprestimo_ativo(livro.get_id())
+        dados["devolver_ate"] = emprestimo.prevista.isoformat() if emprestimo is not None else None
+        return dados
+
+    def buscar_livro(self, id):
+        try:
+            livro = self.biblioteca.buscar_por_id(int(id))
+        except ValueError:
+            livro = None
+        if livro is None:
+            raise ErroHTTP(404, f"livro {id} não encontrado")
+        return livro
+
+    # Rotas
+    async def rotear(self, metodo, caminho, consulta, corpo):
+        partes = [p for p in caminho.split("/") if p]
+        if partes[:1] == ["livros"]:
+            if len(partes) == 1:
+                if metodo == "GET":
+                    return 200, self.listar(consulta)
+                if metodo == "POST":
+                    return await self.adicionar(corpo)
+            elif len(partes) == 2:
+                if metodo == "GET":
+                    return 200, self.livro_json(self.buscar_livro(partes[1]))
+                if metodo == "DELETE":
+                    livro = self.buscar_livro(partes[1])
+                    await self.alterar(self.biblioteca.remover_livro, livro.get_id())
+                    return 200, {"removido": livro.get_id()}
+            elif len(partes) == 3 and partes[2] in ("emprestar", "devolver"):
+                if metodo == "POST":
+                    return await self.mudar_status(partes[1], partes[2], corpo)
+            else:
+                raise ErroHTTP(404, "rota não encontrada")
+            raise ErroHTTP(405, f"{metodo} não é aceito em {caminho}")
+        if partes == ["emprestimos", "atrasados"]:
+            if metodo != "GET":
+                raise ErroHTTP(405, f"{metodo} não é aceito em {caminho}")
+            return 200, [dict(self.livro_json(livro), leitor=emprestimo.leitor)
+                         for livro, emprestimo in self.biblioteca.atrasados()]
+        if partes == ["estatisticas"]:
+            if metodo != "GET":
+                raise ErroHTTP(405, f"{metodo} não é aceito em {caminho}")
+            try:
+                top = min(max(0, int(consulta.get("top", 10))), LIMITE_PAGINA)
+            except ValueError:
+                raise ErroHTTP(400, "top deve ser um número")
+            numeros = self.biblioteca.estatisticas(top)
+            numeros["top_autores"] = [{"autor": autor, "livros": n} for autor, n in numeros["top_autores"]]
+            return 200, numeros
+        raise ErroHTTP(404, "rota não encontrada")
+
+    def listar(self, consulta):
+        try:
+            inicio = max(0, int(consulta.get("inicio", 0)))
+            fim = max(inicio, min(int(consulta.get("fim", inicio + 50)), inicio + LIMITE_PAGINA))
+        except ValueError:
+            raise ErroHTTP(400, "inicio e fim devem ser números")
+        texto = consulta.get("q", "").strip()
+        if texto:
+            encontrados = self.biblioteca.buscar(texto)
+            total, livros = len(encontrados), encontrados[inicio:fim]
+        else:
+            total, livros = self.biblioteca.total_livros(), self.biblioteca.pagina(inicio, fim)
+        return {"total": total, "inicio": inicio, "livros": [self.livro_json(l) for l in livros]}
+
+    async def adicionar(self, corpo):
+        titulo, autor = corpo.get("titulo"), corpo.get("autor")
+        if not isinstance(titulo, str) or not titulo.strip() or not isinstance(autor, str) or not autor.strip():
+            raise ErroHTTP(400, "informe titulo e autor")
+        tipo = corpo.get("tipo", "Físico")
+        if tipo not in ("Físico", "Digital"):
+            raise ErroHTTP(400, "tipo deve ser 'Físico' ou 'Digital'")
+        livro = (LivroFisico if tipo == "Físico" else LivroDigital)(titulo, autor)
+        if not await self.alterar(self.biblioteca.adicionar_livro, livro):
+            raise ErroHTTP(409, f"O livro '{livro.get_titulo()}' de {livro.get_autor()} já está cadastrado ({tipo})")
+        return 201, self.livro_json(livro)
+
+    async def mudar_status(self, id, acao, corpo):
+        livro = self.buscar_livro(id)
+        if acao == "emprestar":
+            leitor = corpo.get("leitor", "")
+            dias = corpo.get("dias", PRAZO_DIAS)
+            try:
+                if not isinstance(leitor, str):
+                    raise ValueError(leitor)
+                validar_prazo(dias)
+            except ValueError:
+                raise ErroHTTP(400, f"leitor deve ser texto e dias um número inteiro de 1 a {PRAZO_MAXIMO_DIAS}")
+            sucesso, msg = await self.alterar(self.biblioteca.emprestar, livro.get_id(), leitor.strip(), dias)
+        else:
+            sucesso, msg = await self.alterar(self.biblioteca.devolver, livro.get_id())
+        if not sucesso:
+            # no catálogo compartilhado o livro pode ter sido removido por
+            # outra instância entre a busca e a alteração
+            if self.biblioteca.buscar_por_id(livro.get_id()) is None:
+                raise ErroHTTP(404, msg)
+            raise ErroHTTP(409, msg)
+        return 200, dict(self.livro_json(livro), mensagem=msg)
+
+    # HTTP/1.1 mínimo, com keep-alive
+    async def atender(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode("latin-1").split()
+                except ValueError:
+                    await self.responder(escritor, 400, {"erro": "requisição inválida"}, False)
+                    break
+                cabecalhos = {}
+                while True:
+                    linha = await leitor.readline()
+                    if linha in (b"\r\n", b"\n", b""):
+                        break
+                    nome, _, valor = linha.decode("latin-1").partition(":")
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                conexao = cabecalhos.get("connection", "").lower()
+                manter = conexao == "keep-alive" or (versao == "HTTP/1.1" and conexao != "close")
+                try:
+                    tamanho = int(cabecalhos.get("content-length", 0) or 0)
+                except ValueError:
+                    await self.responder(escritor, 400, {"erro": "Content-Length inválido"}, False)
+                    break
+                if tamanho < 0:
+                    await self.responder(escritor, 400, {"erro": "Content-Length inválido"}, False)
+                    break
+                if tamanho > LIMITE_CORPO:
+                    await self.responder(escritor, 413, {"erro": "corpo grande demais"}, False)
+                    break
+                bruto = await leitor.readexactly(tamanho) if tamanho else b""
+                status, dados = await self.processar(metodo, alvo, bruto)
+                await self.responder(escritor, status, dados, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def processar(self, metodo, alvo, bruto):
+        partes = urlsplit(alvo)
+        consulta = {k: v[-1] for k, v in parse_qs(partes.query).items()}
+        try:
+            try:
+                corpo = json.loads(bruto) if bruto else {}
+            except ValueError:
+                raise ErroHTTP(400, "corpo não é um JSON válido")
+            if not isinstance(corpo, dict):
+                raise ErroHTTP(400, "o corpo deve ser um objeto JSON")
+            return await self.rotear(metodo.upper(), partes.path, consulta, corpo)
+        except ErroHTTP as e:
+            return e.status, {"erro": str(e)}
+        except Exception as e:
+            return 500, {"erro": str(e)}
+
+    async def responder(self, escritor, status, dados, manter):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        escritor.write((f"HTTP/1.1 {status} {MOTIVOS.get(status, '')}\r\n"
+                        f"Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(corpo)}\r\n"
+                        f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n").encode("latin-1") + corpo)
+        await escritor.drain()
+
+    def fechar(self):
+        self.alteracoes.shutdown(wait=True)
+        self.biblioteca.fechar()
+
+
+async def servir(biblioteca, host="127.0.0.1", porta=8080, intervalo_sincronizacao=1.0):
+    servidor = ServidorBiblioteca(biblioteca)
+    sincronizacao = None
+    try:
+        if biblioteca.is_compartilhado():
+            sincronizacao = asyncio.create_task(servidor.sincronizar_sempre(intervalo_sincronizacao))
+        async with await asyncio.start_server(servidor.atender, host, porta) as rede:
+            print(f"Servindo {biblioteca.total_livros()} livros em http://{host}:{porta}/livros", flush=True)
+            await rede.serve_forever()
+    finally:
+        if sincronizacao is not None:
+            sincronizacao.cancel()
+        servidor.fechar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP/JSON local sobre o catálogo")
+    parser.add_argument("--arquivo", default=os.environ.get("BIBLIOTECA_ARQUIVO", "biblioteca.json"))
+    parser.add_argument("--host", default="127.0.0.1", help="padrão: só a própria máquina")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--atraso-gravacao", type=float, default=0.2,
+                        help="segundos sem alterações antes de gravar (junta várias requisições)")
+    parser.add_argument("--compartilhado", action="store_true", help="outras instâncias usam o mesmo arquivo")
+    parser.add_argument("--intervalo-sincronizacao", type=float, default=1.0,
+                        help="segundos entre as leituras do que as outras instâncias gravaram (--compartilhado)")
+    args = parser.parse_args()
+    biblioteca = Biblioteca(args.arquivo, atraso_gravacao=args.atraso_gravacao, compartilhado=args.compartilhado)
+    try:
+        asyncio.run(servir(biblioteca, args.host, args.porta, args.intervalo_sincronizacao))
+    except KeyboardInterrupt:
+        pass
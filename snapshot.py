@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+# ---------------- SNAPSHOT ATÔMICO ---------------- #
+# O snapshot nunca é truncado no lugar: o conteúdo vai para um arquivo
+# temporário na mesma pasta, passa por fsync e só então substitui o original
+# com os.replace. As versões anteriores ficam como "<arquivo>.1", "<arquivo>.2"...
+
+
+def nomes_geracoes(arquivo, geracoes):
+    return [arquivo] + [f"{arquivo}.{n}" for n in range(1, geracoes + 1)]
+
+
+def sincronizar_pasta(pasta):
+    # garante que o rename também está no disco (não existe no Windows)
+    try:
+        fd = os.open(pasta, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def rotacionar_geracoes(arquivo, geracoes):
+    nomes = nomes_geracoes(arquivo, geracoes)
+    for origem, destino in reversed(list(zip(nomes, nomes[1:]))):
+        if os.path.exists(origem):
+            os.replace(origem, destino)
+
+
+def gravar_atomico(arquivo, conteudo, geracoes=3):
+    pasta = os.path.dirname(os.path.abspath(arquivo))
+    fd, temporario = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=pasta)
+    try:
+        # mkstemp cria com 0600; mantém as permissões do snapshot atual
+        os.chmod(temporario, os.stat(arquivo).st_mode if os.path.exists(arquivo) else 0o644)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+            f.flush()
+            os.fsync(f.fileno())
+        if geracoes > 0:
+            rotacionar_geracoes(arquivo, geracoes)
+        os.replace(temporario, arquivo)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+    sincronizar_pasta(pasta)
+
+
+ESPACOS = re.compile(r"[ \t\n\r]*")
+
+
+class LeitorJSON:
+    # lê a lista de livros do snapshot aos pedaços e entrega um dict por vez,
+    # sem ter o texto inteiro e a lista inteira na memória ao mesmo tempo.
+    # Depois de percorrido, crc tem o CRC32 do conteúdo (igual a crc_conteudo).
+    def __init__(self, arquivo, progresso=None, tamanho_bloco=1 << 20):
+        self.arquivo = arquivo
+        self.progresso = progresso  # (bytes lidos, bytes do arquivo)
+        self.tamanho_bloco = tamanho_bloco
+        self.crc = 0
+
+    def __iter__(self):
+        decodificador = json.JSONDecoder()
+        total = os.path.getsize(self.arquivo)
+        self.crc = 0
+        lidos = 0
+        buf, pos = "", 0
+        with open(self.arquivo, "r", encoding="utf-8") as f:
+
+            def ler():
+                nonlocal buf, pos, lidos
+                bloco = f.read(self.tamanho_bloco)
+                if not bloco:
+                    return False
+                dados = bloco.encode("utf-8")
+                self.crc = zlib.crc32(dados, self.crc)
+                lidos += len(dados)
+                # descarta o que já foi decodificado só quando chega um bloco novo
+                buf, pos = buf[pos:] + bloco, 0
+                if self.progresso is not None:
+                    self.progresso(min(lidos, total), total)
+                return True
+
+            def proximo_caractere():
+                nonlocal pos
+                while True:
+                    pos = ESPACOS.match(buf, pos).end()
+                    if pos < len(buf):
+                        return buf[pos]
+                    if not ler():
+                        return ""
+
+            c = proximo_caractere()
+            if c == "":
+                return  # arquivo vazio: nenhum livro
+            if c != "[":
+                raise ValueError(f"'{self.arquivo}' não contém uma lista de livros")
+            pos += 1
+            if proximo_caractere() == "]":
+                pos += 1
+            else:
+                while True:
+                    while True:
+                        try:
+                            item, fim = decodificador.raw_decode(buf, pos)
+                            break
+                        except json.JSONDecodeError:
+                            # o livro continua no próximo bloco
+                            if not ler():
+                                raise
+                    pos = fim
+                    yield item
+                    c = proximo_caractere()
+                    if c == ",":
+                        pos += 1
+                        proximo_caractere()
+                    elif c == "]":
+                        pos += 1
+                        break
+                    else:
+                        raise ValueError(f"'{self.arquivo}' está incompleto ou corrompido")
+            if proximo_caractere() != "":
+                raise ValueError(f"'{self.arquivo}' tem conteúdo depois da lista de livros")
+
+
+class GravadorSnapshot:
+    # grava o snapshot numa thread para a interface não esperar o disco;
+    # no máximo uma gravação em andamento, na ordem em que foram pedidas
+    def __init__(self, arquivo, geracoes=3, em_segundo_plano=True, ao_concluir=None):
+        self.arquivo = arquivo
+        self.geracoes = geracoes
+        self.em_segundo_plano = em_segundo_plano
+        self.ao_concluir = ao_concluir
+        self.__thread = None
+        self.__erro = None
+
+    def __gravar(self, conteudo):
+        try:
+            gravar_atomico(self.arquivo, conteudo, self.geracoes)
+        except Exception as e:
+            self.__erro = e
+            return
+        if self.ao_concluir is not None:
+            self.ao_concluir()
+
+    def gravar(self, conteudo):
+        self.aguardar()
+        if not self.em_segundo_plano:
+            self.__gravar(conteudo)
+            self.aguardar()
+            return
+        # thread não-daemon: ao sair do programa a gravação em curso termina
+        self.__thread = threading.Thread(target=self.__gravar, args=(conteudo,), name="gravador-snapshot")
+        self.__thread.start()
+
+    def aguardar(self):
+        # espera a gravação em curso e repassa o erro dela, se houve
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        if self.__erro is not None:
+            erro, self.__erro = self.__erro, None
+            raise erro
@@ -0,0 +1,94 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binario import CatalogoBinario, arquivo_anterior, gravar_catalogo, ler_cabecalho
+from modelo import Biblioteca, Livro, LivroDigital
+
+# Catálogo binário (binario.py): ida e volta dos registros e o que acontece
+# quando o .bib não está legível ao abrir.
+
+LIVROS = [{"titulo": "Memórias Póstumas", "autor": "Machado De Assis", "disponivel": True, "tipo": "Livro", "id": 1},
+          {"titulo": "Ação", "autor": "Ñandú", "disponivel": False, "tipo": "Digital", "id": 4},
+          {"titulo": "Iracema", "autor": "José De Alencar", "disponivel": True, "tipo": "Físico", "id": 9}]
+
+
+class TestCatalogoBinario(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.pasta.name, "biblioteca.bib")
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def test_ida_e_volta(self):
+        self.assertEqual(gravar_catalogo(self.arquivo, LIVROS, proximo_id=20), [1, 4, 9])
+        catalogo = CatalogoBinario(self.arquivo, escrita=True)
+        self.assertEqual([livro for _, livro in catalogo], LIVROS)
+        self.assertEqual(catalogo.proximo_id, 20)
+        catalogo.mudar_status(0, False)
+        catalogo.remover(1)
+        catalogo.acrescentar({"titulo": "Novo", "autor": "Autor", "disponivel": True, "tipo": "Físico", "id": 21})
+        catalogo.fechar()
+        depois = CatalogoBinario(self.arquivo)
+        self.assertEqual([livro["id"] for _, livro in depois], [1, 9, 21])
+        self.assertFalse(depois.registro(0)["disponivel"])
+        self.assertEqual(depois.registro(3)["titulo"], "Novo")
+        self.assertEqual(depois.proximo_id, 22)
+        depois.fechar()
+
+    def test_regravacao_guarda_o_anterior_com_os_textos(self):
+        gravar_catalogo(self.arquivo, LIVROS[:1])
+        gravar_catalogo(self.arquivo, LIVROS)
+        self.assertEqual(ler_cabecalho(arquivo_anterior(self.arquivo))[0], 1)
+        textos = sorted(n for n in os.listdir(self.pasta.name) if ".textos." in n)
+        self.assertEqual(textos, ["biblioteca.bib.textos.1", "biblioteca.bib.textos.2"])
+        gravar_catalogo(self.arquivo, LIVROS[1:])
+        self.assertFalse(os.path.exists(self.arquivo + ".textos.1"))
+        self.assertEqual(ler_cabecalho(arquivo_anterior(self.arquivo))[0], 2)
+
+    def abrir(self):
+        return Biblioteca(self.arquivo, gravar_em_segundo_plano=False)
+
+    def test_bib_corrompido_volta_ao_anterior(self):
+        biblioteca = self.abrir()
+        biblioteca.adicionar_livro(Livro("Dom Casmurro", "Machado De Assis"))
+        biblioteca.salvar_dados()
+        biblioteca.adicionar_livro(LivroDigital("Quincas Borba", "Machado De Assis"))
+        biblioteca.salvar_dados()
+        # acrescentado só ao .bib atual: some com ele
+        biblioteca.adicionar_livro(Livro("Helena", "Machado De Assis"))
+        biblioteca.fechar()
+        with open(self.arquivo, "r+b") as f:
+            f.write(b"lixo")
+        depois = self.abrir()
+        self.assertEqual([l.get_titulo() for l in depois.get_livros()], ["Dom Casmurro", "Quincas Borba"])
+        self.assertTrue(os.path.exists(self.arquivo + ".corrompido"))
+        depois.adicionar_livro(Livro("Iaiá Garcia", "Machado De Assis"))
+        depois.fechar()
+        outra = self.abrir()
+        self.assertEqual(sorted(l.get_titulo() for l in outra.get_livros()),
+                         ["Dom Casmurro", "Iaiá Garcia", "Quincas Borba"])
+        outra.fechar()
+
+    def test_textos_perdidos_voltam_ao_anterior(self):
+        gravar_catalogo(self.arquivo, LIVROS[:1])
+        gravar_catalogo(self.arquivo, LIVROS)
+        os.remove(self.arquivo + ".textos.2")
+        biblioteca = self.abrir()
+        self.assertEqual([l.get_titulo() for l in biblioteca.get_livros()], ["Memórias Póstumas"])
+        biblioteca.fechar()
+
+    def test_corrompido_sem_anterior_nao_abre(self):
+        gravar_catalogo(self.arquivo, LIVROS)
+        with open(self.arquivo, "r+b") as f:
+            f.write(b"lixo")
+        with self.assertRaises(ValueError):
+            self.abrir()
+
+
+if __name__ == "__main__":
+    unittest.main()
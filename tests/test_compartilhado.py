@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from modelo import Biblioteca, Livro
+
+# Catálogo compartilhado entre processos: a trava do arquivo faz emprestar
+# decidir sobre o estado mais recente do disco (compare-and-swap), e o SQLite
+# segue as alterações dos outros pela tabela alteracoes.
+
+PROCESSOS = 6
+
+
+def disputar(arquivo, leitor, barreira, resultados):
+    # roda em outro processo: abre o catálogo, espera todos e tenta emprestar
+    sys.path.insert(0, RAIZ)
+    from modelo import Biblioteca
+
+    biblioteca = Biblioteca(arquivo, compartilhado=True, gravar_em_segundo_plano=False)
+    barreira.wait()
+    sucesso, _ = biblioteca.emprestar(1, leitor)
+    biblioteca.fechar()
+    resultados.put((leitor, sucesso))
+
+
+class TestDisputaDeEmprestimo(unittest.TestCase):
+    def disputar(self, nome):
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, nome)
+            biblioteca = Biblioteca(arquivo, compartilhado=True, gravar_em_segundo_plano=False)
+            biblioteca.adicionar_livro(Livro("Dom Casmurro", "Machado De Assis"))
+            biblioteca.fechar()
+
+            contexto = multiprocessing.get_context("spawn")
+            barreira, resultados = contexto.Barrier(PROCESSOS), contexto.Queue()
+            processos = [contexto.Process(target=disputar, args=(arquivo, f"leitor {n}", barreira, resultados))
+                         for n in range(PROCESSOS)]
+            for processo in processos:
+                processo.start()
+            vencedores = [leitor for leitor, sucesso in (resultados.get(timeout=60) for _ in processos) if sucesso]
+            for processo in processos:
+                processo.join(timeout=60)
+                self.assertEqual(processo.exitcode, 0)
+
+            self.assertEqual(len(vencedores), 1)
+            depois = Biblioteca(arquivo, gravar_em_segundo_plano=False)
+            self.assertFalse(depois.buscar_por_id(1).is_disponivel())
+            self.assertEqual([e.leitor for e in depois.historico_do_livro(1)], vencedores)
+            depois.fechar()
+
+    def test_json(self):
+        self.disputar("biblioteca.json")
+
+    def test_sqlite(self):
+        self.disputar("biblioteca.db")
+
+
+class TestAlteracoesSQLite(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        arquivo = os.path.join(self.pasta.name, "biblioteca.db")
+        self.a = Biblioteca(arquivo, compartilhado=True)
+        self.b = Biblioteca(arquivo, compartilhado=True)
+        self.eventos = []
+        self.b.inscrever(lambda evento, livro: self.eventos.append(evento))
+
+    def tearDown(self):
+        self.a.fechar()
+        self.b.fechar()
+        self.pasta.cleanup()
+
+    def test_aplica_so_as_alteracoes_dos_outros(self):
+        self.a.adicionar_livro(Livro("Dom Casmurro", "Machado De Assis"))
+        self.a.adicionar_livro(Livro("Iracema", "José De Alencar"))
+        self.a.emprestar(1, "Ana")
+        self.a.remover_livro(2)
+        self.b.sincronizar()
+        self.assertEqual(self.eventos, ["sincronizado"])
+        self.assertEqual([l.get_id() for l in self.b.get_livros()], [1])
+        self.assertFalse(self.b.buscar_por_id(1).is_disponivel())
+        # as gravações de b não fazem b reler as próprias alterações
+        self.b.devolver(1)
+        self.a.sincronizar()
+        self.assertTrue(self.a.buscar_por_id(1).is_disponivel())
+        self.eventos.clear()
+        self.b.sincronizar()
+        self.assertEqual(self.eventos, [])
+
+    def test_catalogo_regravado_faz_recarregar(self):
+        self.a.adicionar_livro(Livro("Dom Casmurro", "Machado De Assis"))
+        self.b.sincronizar()
+        self.a.salvar_dados()
+        self.a.adicionar_livro(Livro("Iracema", "José De Alencar"))
+        self.eventos.clear()
+        self.b.sincronizar()
+        self.assertEqual(self.eventos, ["recarregado"])
+        self.assertEqual(self.b.total_livros(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from armazenamento import ArmazenamentoJSON
+from diario import Diario, crc_conteudo
+from modelo import Biblioteca, Livro
+
+# Reprodução do diário (diario.py) e recuperação depois de uma queda no meio
+# da compactação ou de uma escrita.
+
+
+def adicionar(id, titulo):
+    return {"op": "adicionar", "livro": {"titulo": titulo, "autor": "Autor", "disponivel": True,
+                                         "tipo": "Livro", "id": id}}
+
+
+class TestDiario(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.pasta.name, "biblioteca.json")
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def test_reproduz_o_log_do_snapshot(self):
+        diario = Diario(self.snapshot)
+        diario.reiniciar(111)
+        diario.registrar_varios([adicionar(1, "A"), adicionar(2, "B")])
+        self.assertEqual(Diario(self.snapshot).reproduzir(111), [adicionar(1, "A"), adicionar(2, "B")])
+
+    def test_queda_antes_do_snapshot_novo_usa_o_log_anterior(self):
+        # rotacionar() guardou o log em .log.anterior, mas o snapshot novo
+        # nunca chegou ao disco: vale o antigo com os dois logs por cima
+        diario = Diario(self.snapshot)
+        diario.reiniciar(111)
+        diario.registrar(adicionar(1, "A"))
+        diario.rotacionar(222)
+        diario.registrar(adicionar(2, "B"))
+        self.assertTrue(os.path.exists(diario.arquivo_anterior))
+
+        depois = Diario(self.snapshot)
+        self.assertEqual(depois.reproduzir(111), [adicionar(1, "A"), adicionar(2, "B")])
+        # o log foi regravado limpo sobre o snapshot antigo
+        self.assertFalse(os.path.exists(depois.arquivo_anterior))
+        self.assertEqual(Diario(self.snapshot).reproduzir(111), [adicionar(1, "A"), adicionar(2, "B")])
+
+    def test_queda_depois_do_snapshot_novo_descarta_o_log_anterior(self):
+        diario = Diario(self.snapshot)
+        diario.reiniciar(111)
+        diario.registrar(adicionar(1, "A"))
+        diario.rotacionar(222)
+        diario.registrar(adicionar(2, "B"))
+        # o snapshot novo (crc 222) já tem o livro 1: só o log atual se aplica
+        self.assertEqual(Diario(self.snapshot).reproduzir(222), [adicionar(2, "B")])
+
+    def test_log_de_outro_snapshot_e_descartado(self):
+        diario = Diario(self.snapshot)
+        diario.reiniciar(111)
+        diario.registrar(adicionar(1, "A"))
+        depois = Diario(self.snapshot)
+        self.assertEqual(depois.reproduzir(999), [])
+        self.assertEqual(depois.base, 999)
+        self.assertEqual(Diario(self.snapshot).reproduzir(999), [])
+
+    def test_linha_cortada_no_fim_e_ignorada(self):
+        diario = Diario(self.snapshot)
+        diario.reiniciar(111)
+        diario.registrar(adicionar(1, "A"))
+        with open(diario.arquivo, "ab") as f:
+            f.write(b'{"op":"adicionar","livro":{"tit')
+        self.assertEqual(Diario(self.snapshot).reproduzir(111), [adicionar(1, "A")])
+
+    def test_proximo_id_sobrevive_a_compactacao(self):
+        diario = Diario(self.snapshot)
+        diario.reiniciar(111)
+        diario.rotacionar(222, proximo_id=8)
+        diario.confirmar()
+        depois = Diario(self.snapshot)
+        depois.reproduzir(222)
+        self.assertEqual(depois.proximo_id, 8)
+
+
+class TestRecuperacao(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.arquivo = os.path.join(self.pasta.name, "biblioteca.json")
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def abrir(self):
+        return Biblioteca(self.arquivo, gravar_em_segundo_plano=False)
+
+    def test_alteracoes_do_diario_voltam_sem_fechar(self):
+        biblioteca = self.abrir()
+        biblioteca.adicionar_livro(Livro("Dom Casmurro", "Machado De Assis"))
+        biblioteca.compactar()
+        biblioteca.adicionar_livro(Livro("Quincas Borba", "Machado De Assis"))
+        biblioteca.emprestar(1, "Ana")
+        # sem fechar(): o processo "caiu" com as alterações só no diário
+        depois = self.abrir()
+        self.assertEqual(depois.total_livros(), 2)
+        self.assertFalse(depois.buscar_por_id(1).is_disponivel())
+        depois.fechar()
+
+    def test_snapshot_corrompido_cai_para_a_geracao_anterior(self):
+        biblioteca = self.abrir()
+        biblioteca.adicionar_livro(Livro("Dom Casmurro", "Machado De Assis"))
+        biblioteca.compactar()
+        biblioteca.adicionar_livro(Livro("Quincas Borba", "Machado De Assis"))
+        biblioteca.compactar()
+        biblioteca.fechar()
+        with open(self.arquivo, "r+b") as f:
+            f.truncate(os.path.getsize(self.arquivo) // 2)
+        # a geração anterior (.1) tem só o primeiro livro; o diário, que é do
+        # snapshot corrompido, não tem o CRC dela e é descartado
+        armazenamento = ArmazenamentoJSON(self.arquivo, gravar_em_segundo_plano=False)
+        livros = []
+        for livro in armazenamento.carregar(recomecar=livros.clear):
+            livros.append(livro)
+        self.assertEqual([l["titulo"] for l in livros], ["Dom Casmurro"])
+        self.assertEqual(armazenamento.pendentes(), [])
+        with open(self.arquivo + ".1", encoding="utf-8") as f:
+            self.assertEqual(armazenamento.diario.base, crc_conteudo(f.read()))
+        self.assertEqual(json.loads(open(armazenamento.diario.arquivo, encoding="utf-8").readline())["base"],
+                         armazenamento.diario.base)
+        depois = self.abrir()
+        self.assertEqual([l.get_titulo() for l in depois.get_livros()], ["Dom Casmurro"])
+        depois.fechar()
+
+    def test_gravacao_que_falha_nao_perde_a_alteracao(self):
+        erros = []
+        biblioteca = Biblioteca(self.arquivo, gravar_em_segundo_plano=False,
+                                ao_erro=lambda titulo, mensagem: erros.append(mensagem))
+        biblioteca.adicionar_livro(Livro("Um", "Autor"))
+        with mock.patch.object(ArmazenamentoJSON, "registrar_varios", side_effect=OSError("disco cheio")):
+            biblioteca.adicionar_livro(Livro("Dois", "Autor"))
+        self.assertEqual(erros, ["disco cheio"])
+        # a gravação seguinte leva o catálogo inteiro, com o livro que falhou
+        biblioteca.adicionar_livro(Livro("Tres", "Autor"))
+        depois = self.abrir()
+        self.assertEqual(sorted(l.get_titulo() for l in depois.get_livros()), ["Dois", "Tres", "Um"])
+        depois.fechar()
+        biblioteca.fechar()
+
+
+
+if __name__ == "__main__":
+    unittest.main()
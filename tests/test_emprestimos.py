@@ -0,0 +1,98 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo import Biblioteca, Livro
+
+# Um empréstimo que não chega ao histórico não pode deixar o livro emprestado,
+# nem na memória nem no disco, em nenhum dos armazenamentos.
+
+FORMATOS = ("json", "db", "bib")
+
+
+class TestEmprestimos(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def abrir(self, formato):
+        return Biblioteca(os.path.join(self.pasta.name, f"biblioteca.{formato}"), gravar_em_segundo_plano=False)
+
+    def catalogo(self, formato):
+        biblioteca = self.abrir(formato)
+        for titulo in ("Um", "Dois", "Tres"):
+            biblioteca.adicionar_livro(Livro(titulo, "Autor"))
+        return biblioteca
+
+    def assertTodosDisponiveis(self, formato, biblioteca):
+        self.assertTrue(all(l.is_disponivel() for l in biblioteca.get_livros()))
+        self.assertEqual(biblioteca.alteracoes_pendentes(), 0)
+        biblioteca.fechar()
+        depois = self.abrir(formato)
+        self.assertTrue(all(l.is_disponivel() for l in depois.get_livros()))
+        self.assertIsNone(depois.emprestimo_ativo(1))
+        depois.fechar()
+
+    def test_prazo_invalido_nao_empresta(self):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato):
+                biblioteca = self.catalogo(formato)
+                for dias in (10 ** 7, 0, -3, True, "14"):
+                    sucesso, _ = biblioteca.emprestar(1, "Ana", dias)
+                    self.assertFalse(sucesso)
+                self.assertTodosDisponiveis(formato, biblioteca)
+
+    def test_livro_inexistente(self):
+        biblioteca = self.catalogo("json")
+        self.assertEqual(biblioteca.emprestar(99, "Ana"), (False, "Livro 99 não encontrado."))
+        self.assertEqual(biblioteca.devolver(99), (False, "Livro 99 não encontrado."))
+        biblioteca.fechar()
+
+    def test_historico_que_falha_nao_muda_o_livro(self):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato):
+                biblioteca = self.catalogo(formato)
+                historico = os.path.join(self.pasta.name, f"biblioteca.{formato}.historico")
+                os.mkdir(historico)  # a escrita no histórico falha
+                with self.assertRaises(OSError):
+                    biblioteca.emprestar(1, "Ana")
+                os.rmdir(historico)
+                self.assertTodosDisponiveis(formato, biblioteca)
+
+    def test_lote_e_tudo_ou_nada_quando_o_historico_falha(self):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato):
+                biblioteca = self.catalogo(formato)
+                historico = os.path.join(self.pasta.name, f"biblioteca.{formato}.historico")
+                os.mkdir(historico)
+                with self.assertRaises(OSError):
+                    biblioteca.emprestar_varios([1, 2, 3], "Ana")
+                os.rmdir(historico)
+                self.assertTodosDisponiveis(formato, biblioteca)
+
+    def test_devolucao_em_lote_que_falha_deixa_os_livros_emprestados(self):
+        biblioteca = self.catalogo("json")
+        self.assertTrue(biblioteca.emprestar_varios([1, 2, 3], "Ana")[0])
+        historico = os.path.join(self.pasta.name, "biblioteca.json.historico")
+        os.rename(historico, historico + ".tmp")
+        os.mkdir(historico)
+        with self.assertRaises(OSError):
+            biblioteca.devolver_varios([1, 2, 3])
+        os.rmdir(historico)
+        os.rename(historico + ".tmp", historico)
+        self.assertFalse(any(l.is_disponivel() for l in biblioteca.get_livros()))
+        self.assertEqual(biblioteca.alteracoes_pendentes(), 0)
+        biblioteca.fechar()
+        depois = self.abrir("json")
+        self.assertFalse(any(l.is_disponivel() for l in depois.get_livros()))
+        self.assertIsNotNone(depois.emprestimo_ativo(2))
+        depois.fechar()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from importacao import importar_arquivo
+from modelo import Biblioteca
+
+# A importação em paralelo tem de dar o mesmo catálogo, as mesmas recusas e a
+# mesma busca que a serial; as duas entregam à Biblioteca itens já normalizados.
+
+LINHAS = ["titulo;autor;tipo;disponivel"]
+LINHAS += [f"  o alienista {i % 40};  machado de assís {i % 7};{('livro', 'físico', 'Digital')[i % 3]};"
+           f"{'sim' if i % 5 else 'não'}" for i in range(300)]
+LINHAS += [";autor sem título;livro;sim", "Memórias Póstumas;Machado de Assis;revista;sim"]
+
+
+class TestImportacao(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.pasta.name, "parceiro.csv")
+        with open(self.csv, "w", encoding="utf-8") as f:
+            f.write("\n".join(LINHAS) + "\n")
+
+    def tearDown(self):
+        self.pasta.cleanup()
+
+    def importar(self, processos):
+        biblioteca = Biblioteca(os.path.join(self.pasta.name, f"biblioteca{processos}.json"),
+                                gravar_em_segundo_plano=False)
+        try:
+            biblioteca.adicionar_livro(biblioteca.criar_livro({"titulo": "O Alienista 3", "autor": "Machado de Assís 3",
+                                                               "tipo": "Livro"}))
+            resultado = importar_arquivo(biblioteca, self.csv, processos=processos)
+            livros = [livro.to_dict() for livro in biblioteca.pagina(0, biblioteca.total_livros())]
+            busca = [livro.get_id() for livro in biblioteca.buscar("alien assis 2")]
+            return resultado, livros, busca
+        finally:
+            biblioteca.fechar()
+
+    def test_paralela_igual_a_serial(self):
+        serial = self.importar(1)
+        (importados, recusados), livros, busca = serial
+        self.assertEqual(self.importar(3), serial)
+        self.assertEqual(len(livros), importados + 1)
+        # o livro que já estava no catálogo, as linhas repetidas e as inválidas
+        self.assertEqual(len(recusados), 300 - importados + 2)
+        self.assertEqual(livros[1]["titulo"], "O Alienista 0")
+        self.assertEqual(livros[1]["autor"], "Machado De Assís 0")
+        self.assertTrue(busca)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ---------------- TRAVA ENTRE PROCESSOS ---------------- #
+# Várias máquinas podem abrir o mesmo catálogo numa pasta compartilhada. Quem
+# vai gravar pega a trava exclusiva de "<catálogo>.trava" (lockf no Linux/mac,
+# que também vale em NFS; msvcrt.locking no Windows) e só solta depois que a
+# gravação terminou.
+
+
+class TravaArquivo:
+    # reentrante: dentro do processo, a thread que já tem a trava pode pedir
+    # de novo; as outras threads esperam como os outros processos
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.__local = threading.RLock()
+        self.__nivel = 0
+        self.__arquivo = None
+
+    def __enter__(self):
+        self.__local.acquire()
+        if self.__nivel == 0:
+            try:
+                self.__travar()
+            except BaseException:
+                self.__local.release()
+                raise
+        self.__nivel += 1
+        return self
+
+    def __exit__(self, *erro):
+        self.__nivel -= 1
+        try:
+            if self.__nivel == 0:
+                self.__destravar()
+        finally:
+            self.__local.release()
+
+    def __travar(self):
+        f = open(self.caminho, "a+b")
+        try:
+            f.seek(0)
+            if fcntl is not None:
+                fcntl.lockf(f.fileno(), fcntl.LOCK_EX, 1, 0)
+            else:
+                # LK_LOCK desiste depois de ~10 s; tenta de novo até conseguir
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        pass
+        except BaseException:
+            f.close()
+            raise
+        self.__arquivo = f
+
+    def __destravar(self):
+        f, self.__arquivo = self.__arquivo, None
+        try:
+            f.seek(0)
+            if fcntl is not None:
+                fcntl.lockf(f.fileno(), fcntl.LOCK_UN, 1, 0)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()